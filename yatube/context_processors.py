@@ -1,5 +1,9 @@
 import datetime as dt
 
+from django.conf import settings
+
+from posts.notifications import unread_count
+
 
 def year(request):
     now = dt.datetime.now()
@@ -7,3 +11,15 @@ def year(request):
     return {
         'year': year
     }
+
+
+def notifications(request):
+    return {
+        'unread_notifications': unread_count(request.user)
+    }
+
+
+def live(request):
+    return {
+        'live_enabled': settings.LIVE_ENABLED
+    }
@@ -1,28 +1,128 @@
 from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 
-from .models import Comment, Group, Post
+from .changelist import ScalableModelAdmin
+from .deletion import request_deletion
+from .models import Comment, Deletion, Group, Post, TextFingerprint
 
+User = get_user_model()
 
-class PostAdmin(admin.ModelAdmin):
-    list_display = ("text", "pub_date", "author")
+
+class BackgroundDeletionMixin:
+    """Удаление из админки ставит объект в очередь request_deletion.
+
+    Каскад пользователя или поста удаляет process_deletions пачками;
+    страница подтверждения не обходит его целиком.
+    """
+
+    deletion_kind = None
+    actions = ("delete_in_background",)
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        actions.pop("delete_selected", None)
+        return actions
+
+    def get_deleted_objects(self, objs, request):
+        objs = list(objs)
+        return ([str(obj) for obj in objs],
+                {self.model._meta.verbose_name_plural: len(objs)}, set(), [])
+
+    def delete_model(self, request, obj):
+        request_deletion(self.deletion_kind, obj.pk)
+
+    def delete_queryset(self, request, queryset):
+        for object_id in queryset.values_list("pk", flat=True):
+            request_deletion(self.deletion_kind, object_id)
+
+    def delete_in_background(self, request, queryset):
+        object_ids = list(queryset.values_list("pk", flat=True))
+        for object_id in object_ids:
+            request_deletion(self.deletion_kind, object_id)
+        self.message_user(
+            request, f"Поставлено в очередь на удаление: {len(object_ids)}")
+    delete_in_background.short_description = "Удалить в фоне"
+
+
+class PostAdmin(BackgroundDeletionMixin, ScalableModelAdmin):
+    list_display = ("text", "pub_date", "author", "group")
+    list_select_related = ("author", "group")
     search_fields = ("text",)
     list_filter = ("pub_date",)
+    autocomplete_fields = ("author", "group")
     empty_value_display = "-пусто-"
+    keyset_ordering = ("-pub_date", "-id")
+    fts_table = "posts_post_fts"
+    export_fields = {
+        "id": "id",
+        "pub_date": "pub_date",
+        "author": "author__username",
+        "group": "group__slug",
+        "text": "text",
+        "image": "image",
+    }
+    deletion_kind = Deletion.POST
+    actions = ScalableModelAdmin.actions + BackgroundDeletionMixin.actions
 
 
-class GroupAdmin(admin.ModelAdmin):
+class GroupAdmin(ScalableModelAdmin):
     list_display = ("title", "description", "slug")
-    search_fields = ("text",)
+    search_fields = ("title", "slug")
     empty_value_display = "-пусто-"
     prepopulated_fields = {"slug": ("title",)}
+    export_fields = {
+        "id": "id",
+        "title": "title",
+        "slug": "slug",
+        "description": "description",
+    }
 
 
-class CommentAdmin(admin.ModelAdmin):
-    list_display = ("text",)
+class CommentAdmin(ScalableModelAdmin):
+    list_display = ("text", "author", "post", "created")
+    list_select_related = ("author", "post")
     search_fields = ("text",)
+    raw_id_fields = ("post",)
+    autocomplete_fields = ("author",)
     empty_value_display = "-пусто-"
+    fts_table = "posts_comment_fts"
+    export_fields = {
+        "id": "id",
+        "created": "created",
+        "post": "post_id",
+        "post_author": "post__author__username",
+        "author": "author__username",
+        "text": "text",
+    }
+
+
+class TextFingerprintAdmin(admin.ModelAdmin):
+    list_display = ("kind", "object_id", "duplicate_of")
+    list_filter = ("kind",)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).filter(
+            duplicate_of__isnull=False)
+
+
+class UserAdmin(BackgroundDeletionMixin, BaseUserAdmin):
+    deletion_kind = Deletion.USER
+
+
+class DeletionAdmin(admin.ModelAdmin):
+    list_display = ("kind", "object_id", "created", "stage",
+                    "deleted_rows", "total_rows", "finished")
+    list_filter = ("kind", "finished")
+    readonly_fields = ("kind", "object_id", "created", "stage",
+                       "deleted_rows", "total_rows", "finished")
 
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
 admin.site.register(Comment, CommentAdmin)
+admin.site.register(TextFingerprint, TextFingerprintAdmin)
+admin.site.register(Deletion, DeletionAdmin)
+# auth.admin уже зарегистрировал модель: импорт выше выполнил его
+admin.site.unregister(User)
+admin.site.register(User, UserAdmin)
@@ -0,0 +1,170 @@
+import datetime as dt
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Max
+from django.http import Http404
+
+from .models import ArchivedComment, ArchivedPost, Comment, Post
+from .sharding import invalidate_feed_counts, shard_aliases, shard_for
+
+VERSION_KEY = 'archive:version'
+COUNT_TIMEOUT = 60 * 60
+
+
+class ArchiveFallbackList:
+    """Лента из горячей таблицы Post с продолжением в архиве.
+
+    Архивируются только посты старше всех горячих, поэтому архив
+    читается, лишь когда страница уходит за конец горячей части.
+    Число строк в архиве меняется только при archive_posts
+    и кэшируется до следующего запуска (cache_key=None — не кэшировать).
+    """
+
+    def __init__(self, hot, archived, cache_key):
+        self.hot = hot
+        self.archived = archived
+        self.cache_key = cache_key
+        self._hot_count = None
+
+    @property
+    def hot_count(self):
+        if self._hot_count is None:
+            self._hot_count = self.hot.count()
+        return self._hot_count
+
+    def archived_count(self):
+        if self.cache_key is None:
+            return self.archived.count()
+        version = cache.get_or_set(VERSION_KEY, 1, None)
+        key = f'archive:count:{version}:{self.cache_key}'
+        count = cache.get(key)
+        if count is None:
+            count = self.archived.count()
+            cache.set(key, count, COUNT_TIMEOUT)
+        return count
+
+    def count(self):
+        return self.hot_count + self.archived_count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        items = []
+        if start < self.hot_count:
+            items.extend(self.hot[start:min(stop, self.hot_count)])
+        if stop > self.hot_count:
+            items.extend(self.archived[
+                max(start - self.hot_count, 0):stop - self.hot_count])
+        return items
+
+
+def get_post(author_id, post_id):
+    post = Post.objects.using(shard_for(author_id)).filter(
+        id=post_id, author_id=author_id).first()
+    if post is None:
+        post = ArchivedPost.objects.filter(
+            id=post_id, author_id=author_id).first()
+    if post is None:
+        raise Http404
+    return post
+
+
+def reserve_ids(model, last_id, using=DEFAULT_DB_ALIAS):
+    """Не даёт таблице model снова выдать id до last_id включительно.
+
+    Архивная строка сохраняет id горячей, а get_post ищет сначала
+    в Post: новый пост с тем же id закрыл бы архивный по старому
+    адресу. AUTOINCREMENT в SQLite держит счётчик в sqlite_sequence,
+    но пересборка таблицы миграцией сбрасывает его до максимума
+    оставшихся строк.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite' or not last_id:
+        return
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'UPDATE sqlite_sequence SET seq = MAX(seq, %s) WHERE name = %s',
+            [last_id, table])
+        if not cursor.rowcount:
+            cursor.execute(
+                'INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)',
+                [table, last_id])
+
+
+def reserve_archived_ids(using=DEFAULT_DB_ALIAS):
+    for model, archived in ((Post, ArchivedPost), (Comment, ArchivedComment)):
+        reserve_ids(model, archived.objects.using(using).aggregate(
+            last=Max('id'))['last'], using)
+
+
+def _archive_chunk(post_ids, using=DEFAULT_DB_ALIAS):
+    """Копирует пачку в архив основной базы и только потом удаляет
+    её из шарда using.
+
+    Две базы не коммитятся атомарно: при сбое между шагами строки
+    остаются и в архиве, и в шарде. Копия повторяется без ошибок
+    (ignore_conflicts), так что следующий запуск просто доудалит их.
+    """
+    hot_posts = Post.objects.using(using).filter(id__in=post_ids)
+    hot_comments = Comment.objects.using(using).filter(post_id__in=post_ids)
+    with transaction.atomic():
+        ArchivedPost.objects.bulk_create([
+            ArchivedPost(id=post.id, text=post.text, pub_date=post.pub_date,
+                         author_id=post.author_id, group_id=post.group_id,
+                         image=post.image, html=post.html,
+                         excerpt=post.excerpt,
+                         is_truncated=post.is_truncated,
+                         image_width=post.image_width,
+                         image_height=post.image_height,
+                         image_color=post.image_color,
+                         image_placeholder=post.image_placeholder)
+            for post in hot_posts], ignore_conflicts=True)
+        ArchivedComment.objects.bulk_create([
+            ArchivedComment(id=comment.id, post_id=comment.post_id,
+                            author_id=comment.author_id, text=comment.text,
+                            created=comment.created)
+            for comment in hot_comments], ignore_conflicts=True)
+        reserve_archived_ids()
+    with transaction.atomic(using=using):
+        hot_comments.delete()
+        hot_posts.delete()
+
+
+def archive_posts(before=None, chunk_size=500):
+    """Переносит посты старше before вместе с комментариями в архив.
+
+    Каждая пачка — отдельная короткая транзакция, так что прерванный
+    запуск можно просто повторить.
+    """
+    if before is None:
+        before = dt.datetime.now() - dt.timedelta(
+            days=settings.ARCHIVE_AFTER_DAYS)
+    moved = 0
+    for alias in shard_aliases():
+        while True:
+            post_ids = list(Post.objects.using(alias).filter(
+                pub_date__lt=before).order_by('pub_date').values_list(
+                    'id', flat=True)[:chunk_size])
+            if not post_ids:
+                break
+            _archive_chunk(post_ids, alias)
+            moved += len(post_ids)
+    if moved:
+        invalidate_counts()
+    return moved
+
+
+def invalidate_counts():
+    """Сбрасывает закэшированное число постов в лентах и их архивной части."""
+    invalidate_feed_counts()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 2, None)
@@ -0,0 +1,232 @@
+import csv
+import json
+
+from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Max, Min, Q
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
+from django.urls import path
+from django.utils.functional import cached_property
+
+from .search import fts_match
+
+CURSOR_VAR = 'after'
+CURSOR_SEPARATOR = '|'
+# дальше этого фильтрованный список не пересчитывается
+COUNT_LIMIT = 10000
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор без полного COUNT(*).
+
+    Без фильтров число строк оценивается по MIN/MAX первичного ключа —
+    два чтения индекса. С фильтрами считается не больше COUNT_LIMIT строк.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            bounds = queryset.order_by().aggregate(
+                low=Min('pk'), high=Max('pk'))
+            if bounds['low'] is None:
+                return 0
+            return bounds['high'] - bounds['low'] + 1
+        return queryset.order_by()[:COUNT_LIMIT].count()
+
+
+class KeysetChangeList(ChangeList):
+    """Список админки с постраничностью по ключу вместо OFFSET.
+
+    При сортировке по умолчанию следующая страница выбирается условием
+    «после последней показанной строки» по полям keyset_ordering,
+    поэтому далёкие страницы стоят столько же, сколько первая.
+    При сортировке по колонке работает обычная постраничность.
+    """
+
+    def __init__(self, request, *args, **kwargs):
+        self.cursor = request.GET.get(CURSOR_VAR)
+        self.next_cursor = None
+        super().__init__(request, *args, **kwargs)
+
+    @property
+    def keyset_ordering(self):
+        return self.model_admin.keyset_ordering
+
+    @property
+    def keyset(self):
+        return ORDER_VAR not in self.params and not self.show_all
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        new_params = dict(new_params or {})
+        if CURSOR_VAR not in new_params:
+            remove = list(remove or []) + [CURSOR_VAR]
+        return super().get_query_string(new_params, remove)
+
+    def encode_cursor(self, obj):
+        values = []
+        for name in self.keyset_ordering:
+            value = getattr(obj, name.lstrip('-'))
+            values.append(value.isoformat() if hasattr(
+                value, 'isoformat') else str(value))
+        return CURSOR_SEPARATOR.join(values)
+
+    def cursor_filter(self, cursor):
+        raw_values = cursor.split(CURSOR_SEPARATOR)
+        if len(raw_values) != len(self.keyset_ordering):
+            raise IncorrectLookupParameters
+        condition, equal = Q(), {}
+        for name, raw in zip(self.keyset_ordering, raw_values):
+            field_name = name.lstrip('-')
+            field = self.opts.get_field(field_name)
+            try:
+                value = field.to_python(raw)
+            except ValidationError:
+                raise IncorrectLookupParameters
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{field_name}__{lookup}': value})
+            equal[field_name] = value
+        return condition
+
+    def get_results(self, request):
+        if not self.keyset:
+            return super().get_results(request)
+        paginator = self.model_admin.get_paginator(
+            request, self.queryset, self.list_per_page)
+        queryset = self.queryset.order_by(*self.keyset_ordering)
+        if self.cursor:
+            queryset = queryset.filter(self.cursor_filter(self.cursor))
+        rows = list(queryset[:self.list_per_page + 1])
+        if len(rows) > self.list_per_page:
+            rows = rows[:self.list_per_page]
+            self.next_cursor = self.encode_cursor(rows[-1])
+
+        self.result_count = paginator.count
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        self.result_list = rows
+        self.can_show_all = False
+        self.multi_page = bool(self.cursor or self.next_cursor)
+        self.paginator = paginator
+
+    @property
+    def next_page_url(self):
+        return self.get_query_string({CURSOR_VAR: self.next_cursor})
+
+    @property
+    def first_page_url(self):
+        return self.get_query_string(remove=[CURSOR_VAR])
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def iter_csv(columns, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def iter_ndjson(columns, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(columns, row)), ensure_ascii=False,
+                         default=str) + '\n'
+
+
+class ScalableModelAdmin(admin.ModelAdmin):
+    """Админка для таблиц на миллионы строк.
+
+    Оценка числа строк вместо COUNT(*), постраничность по ключу
+    и поиск по FTS5-индексу fts_table, если он есть.
+    export_fields (колонка -> путь ORM) включает потоковую выгрузку
+    выбранных строк и всего отфильтрованного списка в CSV и NDJSON.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    change_list_template = 'admin/keyset_change_list.html'
+    keyset_ordering = ('-id',)
+    fts_table = None
+    export_fields = None
+    actions = ('export_csv', 'export_ndjson')
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        if (self.fts_table and search_term.strip()
+                and connection.vendor == 'sqlite'):
+            return queryset.filter(
+                id__in=fts_match(self.fts_table, search_term)), False
+        return super().get_search_results(request, queryset, search_term)
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        if not self.export_fields:
+            actions.pop('export_csv', None)
+            actions.pop('export_ndjson', None)
+        return actions
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            path('export/', self.admin_site.admin_view(self.export_view),
+                 name='%s_%s_export' % info),
+        ] + super().get_urls()
+
+    def export_response(self, queryset, export_format, columns=None):
+        columns = list(columns or self.export_fields)
+        rows = queryset.order_by('pk').values_list(
+            *(self.export_fields[column] for column in columns)
+        ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        writer = iter_csv if export_format == 'csv' else iter_ndjson
+        response = StreamingHttpResponse(
+            writer(columns, rows),
+            content_type=EXPORT_FORMATS[export_format])
+        response['Content-Disposition'] = (
+            f'attachment; filename="{self.model._meta.model_name}'
+            f'.{export_format}"')
+        return response
+
+    def export_view(self, request):
+        if not self.export_fields or not self.has_view_permission(request):
+            raise PermissionDenied
+        export_format = request.GET.get('format', 'csv')
+        columns = [column for column in request.GET.get(
+            'columns', '').split(',') if column]
+        if (export_format not in EXPORT_FORMATS
+                or set(columns) - set(self.export_fields)):
+            return HttpResponseBadRequest('Неизвестный формат или колонка')
+        # остальные параметры — фильтры и поиск списка изменений
+        params = request.GET.copy()
+        for name in ('format', 'columns'):
+            params.pop(name, None)
+        request.GET = params
+        queryset = self.get_changelist_instance(request).queryset
+        return self.export_response(queryset, export_format, columns)
+
+    def export_csv(self, request, queryset):
+        return self.export_response(queryset, 'csv')
+    export_csv.short_description = 'Выгрузить выбранное в CSV'
+
+    def export_ndjson(self, request, queryset):
+        return self.export_response(queryset, 'ndjson')
+    export_ndjson.short_description = 'Выгрузить выбранное в NDJSON'
@@ -0,0 +1,190 @@
+import heapq
+import re
+import struct
+from hashlib import blake2b
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Comment, Post, TextBand, TextFingerprint
+from .sharding import shard_aliases
+
+# Подписи хранятся в базе: смена этих констант требует
+# пересборки индекса командой build_dedup_index.
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+SIGNATURE_FORMAT = f'<{NUM_PERM}Q'
+MASKS = [int.from_bytes(blake2b(str(number).encode(), digest_size=8,
+                                person=b'minhash').digest(), 'little')
+         for number in range(NUM_PERM)]
+# id в одном запросе — ниже лимита параметров SQLite
+QUERY_CHUNK_SIZE = 500
+MAX_CANDIDATES = 50
+
+
+def normalize(text):
+    return re.sub(r'\W+', ' ', text.lower()).strip()
+
+
+def shingle_hashes(text):
+    text = normalize(text)
+    return {int.from_bytes(blake2b(text[start:start + SHINGLE_SIZE].encode(),
+                                   digest_size=8).digest(), 'little')
+            for start in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def signature(text):
+    """MinHash-подпись текста или None для слишком короткого текста.
+
+    Перестановки — XOR с фиксированными 64-битными масками; минимум
+    по map(mask.__xor__, ...) считается целиком в C, без цикла
+    Python по шинглам.
+    """
+    if len(normalize(text)) < settings.DEDUP_MIN_LENGTH:
+        return None
+    hashes = list(shingle_hashes(text))
+    return tuple(min(map(mask.__xor__, hashes)) for mask in MASKS)
+
+
+def band_buckets(sig):
+    buckets = []
+    for band in range(BANDS):
+        rows = struct.pack(f'<{ROWS}Q', *sig[band * ROWS:(band + 1) * ROWS])
+        digest = blake2b(rows, digest_size=8, person=bytes([band])).digest()
+        buckets.append(int.from_bytes(digest, 'little', signed=True))
+    return buckets
+
+
+def similarity(first, second):
+    """Оценка коэффициента Жаккара по доле совпавших минимумов."""
+    return sum(a == b for a, b in zip(first, second)) / NUM_PERM
+
+
+def _chunks(items, size=QUERY_CHUNK_SIZE):
+    items = iter(items)
+    chunk = list(islice(items, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(items, size))
+
+
+def _stored_candidates(kind, buckets):
+    candidates = {}
+    for chunk in _chunks(set(buckets)):
+        for bucket, object_id in TextBand.objects.filter(
+                kind=kind, bucket__in=chunk).values_list(
+                    'bucket', 'object_id'):
+            candidates.setdefault(bucket, set()).add(object_id)
+    return candidates
+
+
+def _stored_signatures(kind, object_ids):
+    signatures = {}
+    for chunk in _chunks(object_ids):
+        for object_id, raw in TextFingerprint.objects.filter(
+                kind=kind, object_id__in=chunk).values_list(
+                    'object_id', 'signature'):
+            signatures[object_id] = struct.unpack(SIGNATURE_FORMAT, raw)
+    return signatures
+
+
+def detect(kind, rows):
+    """Находит дубликаты для rows — пар (id, подпись) по возрастанию id.
+
+    Кандидаты — объекты, совпавшие с подписью хотя бы в одной полосе
+    LSH: поиск по индексу (kind, bucket), а не перебор таблицы.
+    Сравниваются и с уже проиндексированными, и с более ранними
+    строками той же пачки. Возвращает {id: id похожего или None}.
+    """
+    buckets = {object_id: band_buckets(sig) for object_id, sig in rows}
+    stored = _stored_candidates(
+        kind, (bucket for values in buckets.values() for bucket in values))
+    signatures = _stored_signatures(kind, {
+        object_id for ids in stored.values() for object_id in ids})
+    batch = {}
+    result = {}
+    for object_id, sig in rows:
+        candidates = set()
+        for bucket in buckets[object_id]:
+            candidates |= stored.get(bucket, set())
+            candidates |= batch.get(bucket, set())
+        candidates.discard(object_id)
+        best, best_score = None, 0
+        # при равном сходстве оригиналом считается более ранний
+        for candidate in sorted(candidates)[:MAX_CANDIDATES]:
+            if candidate not in signatures:
+                continue
+            score = similarity(sig, signatures[candidate])
+            if score >= settings.DEDUP_THRESHOLD and score > best_score:
+                best, best_score = candidate, score
+        result[object_id] = best
+        signatures[object_id] = sig
+        for bucket in buckets[object_id]:
+            batch.setdefault(bucket, set()).add(object_id)
+    return result
+
+
+def _store(kind, rows, duplicates):
+    TextFingerprint.objects.bulk_create(
+        TextFingerprint(kind=kind, object_id=object_id,
+                        signature=struct.pack(SIGNATURE_FORMAT, *sig),
+                        duplicate_of=duplicates[object_id])
+        for object_id, sig in rows)
+    TextBand.objects.bulk_create(
+        TextBand(kind=kind, bucket=bucket, object_id=object_id)
+        for object_id, sig in rows for bucket in band_buckets(sig))
+
+
+def find_duplicate(kind, text, exclude_id=None):
+    """id уже опубликованного похожего текста или None."""
+    sig = signature(text)
+    if sig is None:
+        return None
+    return detect(kind, [(exclude_id or 0, sig)])[exclude_id or 0]
+
+
+def index_text(kind, object_id, text):
+    """Индексирует сохранённый текст и помечает его, если он дубликат."""
+    sig = signature(text)
+    with transaction.atomic():
+        TextFingerprint.objects.filter(
+            kind=kind, object_id=object_id).delete()
+        TextBand.objects.filter(kind=kind, object_id=object_id).delete()
+        if sig is None:
+            return None
+        duplicates = detect(kind, [(object_id, sig)])
+        _store(kind, [(object_id, sig)], duplicates)
+    return duplicates[object_id]
+
+
+def build_index(chunk_size=1000):
+    """Пересобирает индекс по всем постам и комментариям пачками.
+
+    Раньше опубликованный текст считается оригиналом.
+    Возвращает {вид: (проиндексировано, дубликатов)}.
+    """
+    TextBand.objects.all().delete()
+    TextFingerprint.objects.all().delete()
+    stats = {}
+    for kind, queryset in ((TextFingerprint.POST, Post.objects),
+                           (TextFingerprint.COMMENT, Comment.objects)):
+        indexed = flagged = 0
+        # шарды сливаются по id, чтобы порядок «кто раньше» был общим
+        texts = heapq.merge(*(
+            queryset.using(alias).order_by('id').values_list(
+                'id', 'text').iterator(chunk_size=chunk_size)
+            for alias in shard_aliases()))
+        for chunk in _chunks(texts, chunk_size):
+            rows = [(object_id, sig) for object_id, sig in (
+                (object_id, signature(text)) for object_id, text in chunk)
+                if sig is not None]
+            with transaction.atomic():
+                duplicates = detect(kind, rows)
+                _store(kind, rows, duplicates)
+            indexed += len(rows)
+            flagged += sum(value is not None for value in duplicates.values())
+        stats[kind] = (indexed, flagged)
+    return stats
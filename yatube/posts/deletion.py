@@ -0,0 +1,217 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .archive import invalidate_counts
+from .changelog import record_follows, record_many
+from .models import (ArchivedComment, ArchivedPost, ChangeEvent, Comment,
+                     Deletion, Follow, Mention, Notification, Post, PostTag,
+                     Recommendation)
+from .sharding import shard_aliases, shard_for
+
+User = get_user_model()
+HIDDEN_KEY = 'deletions:hidden'
+
+
+def hidden_objects():
+    """id пользователей и постов, ожидающих удаления.
+
+    Список короткий и кэшируется на DELETION_HIDDEN_TIMEOUT секунд:
+    с кэшем в памяти процесса другие воркеры скроют объект не сразу.
+    """
+    hidden = cache.get(HIDDEN_KEY)
+    if hidden is None:
+        users, posts = set(), set()
+        for kind, object_id in Deletion.objects.filter(
+                finished__isnull=True).values_list('kind', 'object_id'):
+            (users if kind == Deletion.USER else posts).add(object_id)
+        hidden = (frozenset(users), frozenset(posts))
+        cache.set(HIDDEN_KEY, hidden, settings.DELETION_HIDDEN_TIMEOUT)
+    return hidden
+
+
+def hide_deleted(queryset, author='author_id', post='id'):
+    users, posts = hidden_objects()
+    if users:
+        queryset = queryset.exclude(**{f'{author}__in': users})
+    if posts:
+        queryset = queryset.exclude(**{f'{post}__in': posts})
+    return queryset
+
+
+def is_hidden(author_id, post_id=None):
+    users, posts = hidden_objects()
+    return author_id in users or post_id in posts
+
+
+def _hidden_changed():
+    cache.delete(HIDDEN_KEY)
+    invalidate_counts()
+
+
+def request_deletion(kind, object_id):
+    """Ставит объект в очередь на удаление; из лент он пропадает сразу.
+
+    Удаляемый пользователь сразу теряет возможность войти.
+    """
+    with transaction.atomic():
+        deletion, _ = Deletion.objects.get_or_create(
+            kind=kind, object_id=object_id, finished__isnull=True)
+        if kind == Deletion.USER:
+            User.objects.filter(id=object_id).update(is_active=False)
+    _hidden_changed()
+    return deletion
+
+
+def _post_steps(post_id):
+    # шард поста по id не узнать: у старых постов он не зашит в id
+    shards = shard_aliases()
+    return (
+        *(('comments', Comment.objects.using(alias).filter(post_id=post_id),
+           None) for alias in shards),
+        ('notifications', Notification.objects.filter(post_id=post_id),
+         {'post': None}),
+        # архивный пост каскадом их не удаляет
+        ('tags', PostTag.objects.filter(post_id=post_id), None),
+        ('mentions', Mention.objects.filter(post_id=post_id), None),
+        *(('post', Post.objects.using(alias).filter(id=post_id), None)
+          for alias in shards),
+        ('archived_comments',
+         ArchivedComment.objects.filter(post_id=post_id), None),
+        ('archived_post', ArchivedPost.objects.filter(id=post_id), None),
+    )
+
+
+def _user_steps(user_id):
+    # посты и комментарии к ним — в шарде автора, свои комментарии
+    # пользователь мог оставить в любом шарде; строка пользователя
+    # удаляется последней, и её копии на шардах уже ничего не держат
+    shard = shard_for(user_id)
+    return (
+        *(('comments', Comment.objects.using(alias).filter(
+            author_id=user_id), None) for alias in shard_aliases()),
+        ('post_comments', Comment.objects.using(shard).filter(
+            post__author_id=user_id), None),
+        ('archived_comments',
+         ArchivedComment.objects.filter(author_id=user_id), None),
+        ('archived_post_comments',
+         ArchivedComment.objects.filter(post__author_id=user_id), None),
+        ('notifications',
+         Notification.objects.filter(recipient_id=user_id), None),
+        ('sent_notifications',
+         Notification.objects.filter(actor_id=user_id), None),
+        ('post_notifications',
+         Notification.objects.filter(post__author_id=user_id),
+         {'post': None}),
+        ('following', Follow.objects.filter(user_id=user_id), None),
+        ('followers', Follow.objects.filter(author_id=user_id), None),
+        ('mentions', Mention.objects.filter(user_id=user_id), None),
+        ('post_tags', PostTag.objects.filter(author_id=user_id), None),
+        ('post_mentions', Mention.objects.filter(author_id=user_id), None),
+        ('recommendations', Recommendation.objects.filter(user_id=user_id),
+         None),
+        ('recommended', Recommendation.objects.filter(author_id=user_id),
+         None),
+        ('posts', Post.objects.using(shard).filter(author_id=user_id), None),
+        ('archived_posts', ArchivedPost.objects.filter(author_id=user_id),
+         None),
+        ('user', User.objects.filter(id=user_id), None),
+    )
+
+
+def deletion_steps(deletion):
+    """Шаги (имя, строки, update) от листьев к корню.
+
+    update=None — строки удаляются, иначе обновляются (SET_NULL).
+    Каскад Django на каждом шаге находит лишь то, что не покрыто
+    предыдущими шагами, поэтому объём пачки ограничен.
+    """
+    if deletion.kind == Deletion.USER:
+        return _user_steps(deletion.object_id)
+    return _post_steps(deletion.object_id)
+
+
+def _record_deletes(rows):
+    if rows.model is Post:
+        record_many(ChangeEvent.POST, ChangeEvent.DELETE, (
+            (post_id, {'author': author_id, 'group': group_id})
+            for post_id, author_id, group_id in rows.values_list(
+                'id', 'author_id', 'group_id')))
+    elif rows.model is Comment:
+        record_many(ChangeEvent.COMMENT, ChangeEvent.DELETE, (
+            (comment_id, {'post': post_id, 'author': author_id})
+            for comment_id, post_id, author_id in rows.values_list(
+                'id', 'post_id', 'author_id')))
+    elif rows.model is Follow:
+        record_follows(rows.values_list('user_id', 'author_id'),
+                       ChangeEvent.DELETE)
+
+
+def _run_batch(deletion, name, queryset, update, batch_size):
+    """Одна пачка шага в своей транзакции; число затронутых строк.
+
+    Строки шага могут лежать в шарде: тогда открыты транзакции
+    и шарда, и основной базы с отметкой прогресса.
+    """
+    ids = list(queryset.order_by('pk').values_list(
+        'pk', flat=True)[:batch_size])
+    if not ids:
+        return 0
+    with transaction.atomic(), transaction.atomic(using=queryset.db):
+        rows = queryset.model.objects.using(queryset.db).filter(pk__in=ids)
+        if update is None:
+            _record_deletes(rows)
+            count, _ = rows.delete()
+        else:
+            count = rows.update(**update)
+        Deletion.objects.filter(pk=deletion.pk).update(
+            stage=name, deleted_rows=F('deleted_rows') + count)
+    return count
+
+
+def run_deletion(deletion, batch_size=None, max_batches=None):
+    """Удаляет зависимые строки пачками; возвращает число пачек.
+
+    Каждая пачка — короткая транзакция вместе с отметкой прогресса,
+    так что прерванный запуск продолжается с того же места.
+    Когда шаги пройдены, заполняется deletion.finished.
+    """
+    batch_size = batch_size or settings.DELETION_BATCH_SIZE
+    steps = deletion_steps(deletion)
+    if deletion.total_rows is None:
+        deletion.total_rows = sum(
+            queryset.count() for _, queryset, _ in steps)
+        Deletion.objects.filter(pk=deletion.pk).update(
+            total_rows=deletion.total_rows)
+    batches = 0
+    for name, queryset, update in steps:
+        while True:
+            if max_batches is not None and batches >= max_batches:
+                deletion.refresh_from_db()
+                return batches
+            if not _run_batch(deletion, name, queryset, update, batch_size):
+                break
+            batches += 1
+    Deletion.objects.filter(pk=deletion.pk).update(
+        stage='', finished=timezone.now())
+    deletion.refresh_from_db()
+    _hidden_changed()
+    return batches
+
+
+def process_deletions(batch_size=None, max_batches=None):
+    """Обрабатывает очередь по порядку; max_batches — на весь запуск.
+
+    Возвращает число завершённых удалений.
+    """
+    batches = finished = 0
+    for deletion in Deletion.objects.filter(finished__isnull=True):
+        remaining = None if max_batches is None else max_batches - batches
+        if remaining == 0:
+            break
+        batches += run_deletion(deletion, batch_size, remaining)
+        finished += deletion.finished is not None
+    return finished
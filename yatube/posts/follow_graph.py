@@ -0,0 +1,206 @@
+import json
+import logging
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.db.models import Max
+
+from .models import ChangeEvent, Follow
+
+logger = logging.getLogger(__name__)
+EMPTY = array('I')
+LOAD_CHUNK_SIZE = 10000
+
+
+class FollowGraph:
+    """Граф подписок в памяти процесса.
+
+    Для каждого пользователя хранятся отсортированные массивы id
+    (array('I'), 4 байта на id): на кого он подписан и кто подписан
+    на него. Проверка подписки — бинарный поиск, O(log n), число
+    подписчиков и подписок — длина массива, O(1).
+
+    Память на 10M подписок: рёбра лежат в обоих направлениях,
+    2 × 10M × 4 Б = 80 МБ, плюс около 160 Б на каждый непустой массив
+    (заголовок array, ключ и слот словаря) — ещё ~320 МБ при 1M
+    пользователей с подписками и подписчиками.
+
+    Новый граф строится рядом со старым и подменяет его целиком;
+    подписки и отписки, пришедшие во время загрузки, доигрываются
+    на новом графе. После загрузки граф догоняет журнал изменений
+    (ChangeEvent.FOLLOW) с номера last_seq, взятого перед чтением
+    таблицы Follow.
+    """
+
+    def __init__(self):
+        self._following = {}
+        self._followers = {}
+        self._lock = threading.Lock()
+        self._changes = None
+        self._refreshing = threading.Lock()
+        self.loaded_at = None
+        self.synced_at = None
+        self.last_seq = None
+
+    def load(self, pairs=None):
+        with self._lock:
+            self._changes = []
+        # для переданных пар позиции в журнале нет — догнать его нельзя
+        last_seq = None
+        if pairs is None:
+            # события после last_seq доигрываются поверх прочитанного:
+            # add и remove идемпотентны, так что повтор ничего не портит
+            last_seq = ChangeEvent.objects.aggregate(
+                seq=Max('seq'))['seq'] or 0
+            pairs = Follow.objects.order_by().values_list(
+                'user_id', 'author_id').iterator(chunk_size=LOAD_CHUNK_SIZE)
+        following, followers = {}, {}
+        for user_id, author_id in pairs:
+            following.setdefault(user_id, array('I')).append(author_id)
+            followers.setdefault(author_id, array('I')).append(user_id)
+        for index in (following, followers):
+            for key, ids in index.items():
+                index[key] = array('I', sorted(ids))
+        with self._lock:
+            for change, user_id, author_id in self._changes or ():
+                change(following, user_id, author_id)
+                change(followers, author_id, user_id)
+            self._following, self._followers = following, followers
+            self._changes = None
+            self.last_seq = last_seq
+            self.loaded_at = self.synced_at = time.monotonic()
+
+    def catch_up(self, limit=None):
+        """Доигрывает подписки и отписки из журнала после last_seq.
+
+        Возвращает False, если граф не привязан к журналу или событий
+        больше limit (FOLLOW_GRAPH_CATCH_UP_LIMIT) — тогда дешевле
+        перечитать граф целиком.
+        """
+        if limit is None:
+            limit = settings.FOLLOW_GRAPH_CATCH_UP_LIMIT
+        after = self.last_seq
+        if after is None:
+            return False
+        events = list(ChangeEvent.objects.filter(
+            kind=ChangeEvent.FOLLOW, seq__gt=after).order_by(
+                'seq').values_list('seq', 'action', 'payload')[:limit + 1])
+        if len(events) > limit:
+            return False
+        for seq, action, payload in events:
+            data = json.loads(payload)
+            if action == ChangeEvent.DELETE:
+                self.remove(data['user'], data['author'])
+            else:
+                self.add(data['user'], data['author'])
+        with self._lock:
+            # полная загрузка могла подменить граф, пока шло чтение
+            if self.last_seq == after and events:
+                self.last_seq = events[-1][0]
+            self.synced_at = time.monotonic()
+        return True
+
+    def refresh_in_background(self):
+        """Догоняет журнал в отдельном потоке; не больше одного сразу."""
+        if not self._refreshing.acquire(blocking=False):
+            return None
+        thread = threading.Thread(target=self._refresh, daemon=True,
+                                  name='follow-graph-refresh')
+        thread.start()
+        return thread
+
+    def _refresh(self):
+        try:
+            if not self.catch_up():
+                self.load()
+        except DatabaseError:
+            logger.exception('Граф подписок не перечитан')
+        finally:
+            # соединение потока больше никому не понадобится
+            connection.close()
+            self._refreshing.release()
+
+    def reset(self):
+        with self._lock:
+            self._following, self._followers = {}, {}
+            self.loaded_at = self.synced_at = self.last_seq = None
+
+    @staticmethod
+    def _insert(index, key, value):
+        ids = index.setdefault(key, array('I'))
+        position = bisect_left(ids, value)
+        if position == len(ids) or ids[position] != value:
+            ids.insert(position, value)
+
+    @staticmethod
+    def _remove(index, key, value):
+        ids = index.get(key, EMPTY)
+        position = bisect_left(ids, value)
+        if position < len(ids) and ids[position] == value:
+            del ids[position]
+            if not ids:
+                del index[key]
+
+    def add(self, user_id, author_id):
+        with self._lock:
+            self._insert(self._following, user_id, author_id)
+            self._insert(self._followers, author_id, user_id)
+            if self._changes is not None:
+                self._changes.append((self._insert, user_id, author_id))
+
+    def remove(self, user_id, author_id):
+        with self._lock:
+            self._remove(self._following, user_id, author_id)
+            self._remove(self._followers, author_id, user_id)
+            if self._changes is not None:
+                self._changes.append((self._remove, user_id, author_id))
+
+    def is_following(self, user_id, author_id):
+        ids = self._following.get(user_id, EMPTY)
+        position = bisect_left(ids, author_id)
+        return position < len(ids) and ids[position] == author_id
+
+    def following(self, user_id):
+        return self._following.get(user_id, EMPTY)
+
+    def followers(self, user_id):
+        return self._followers.get(user_id, EMPTY)
+
+    def following_count(self, user_id):
+        return len(self.following(user_id))
+
+    def followers_count(self, user_id):
+        return len(self.followers(user_id))
+
+
+follow_graph = FollowGraph()
+
+
+def get_follow_graph():
+    """Граф процесса; загружается при первом обращении.
+
+    Сигналы Follow обновляют только граф своего процесса, поэтому
+    раз в FOLLOW_GRAPH_SYNC_INTERVAL секунд граф догоняет журнал
+    изменений — в фоне, а запросы тем временем читают прежний граф.
+    Целиком граф перечитывается, только если журнал ушёл далеко вперёд.
+    """
+    synced_at = follow_graph.synced_at
+    if synced_at is None:
+        follow_graph.load()
+    elif (time.monotonic() - synced_at
+          > settings.FOLLOW_GRAPH_SYNC_INTERVAL):
+        follow_graph.refresh_in_background()
+    return follow_graph
+
+
+def preload_follow_graph():
+    try:
+        follow_graph.load()
+    except DatabaseError:
+        # База ещё не создана (например, до migrate) —
+        # граф загрузится при первом запросе.
+        pass
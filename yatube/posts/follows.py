@@ -0,0 +1,81 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from .changelog import record_follows
+from .follow_graph import follow_graph
+from .models import ChangeEvent, Follow, Notification
+from .notifications import notify_many
+
+User = get_user_model()
+CHUNK_SIZE = 500
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def resolve_usernames(usernames):
+    """username -> id одним запросом на каждые CHUNK_SIZE имён."""
+    ids = {}
+    for chunk in _chunks(set(usernames)):
+        ids.update(User.objects.filter(
+            username__in=chunk).values_list('username', 'id'))
+    return ids
+
+
+def _existing(pairs):
+    users = {user_id for user_id, _ in pairs}
+    authors = {author_id for _, author_id in pairs}
+    return set(Follow.objects.filter(
+        user_id__in=users, author_id__in=authors).values_list(
+            'user_id', 'author_id')) & set(pairs)
+
+
+def _add_to_graph(pairs):
+    if follow_graph.loaded_at is not None:
+        for user_id, author_id in pairs:
+            follow_graph.add(user_id, author_id)
+
+
+def create_follows(pairs):
+    """Создаёт подписки (user_id, author_id), пропуская уже существующие.
+
+    Возвращает множество действительно новых пар. bulk_create
+    не посылает post_save, поэтому граф подписок и журнал изменений
+    обновляются здесь же, одним проходом.
+    """
+    pairs = {(user_id, author_id) for user_id, author_id in pairs
+             if user_id != author_id}
+    created = set()
+    for chunk in _chunks(pairs):
+        with transaction.atomic():
+            new = set(chunk) - _existing(chunk)
+            Follow.objects.bulk_create(
+                [Follow(user_id=user_id, author_id=author_id)
+                 for user_id, author_id in new],
+                ignore_conflicts=True)
+            record_follows(new, ChangeEvent.CREATE)
+            transaction.on_commit(lambda new=new: _add_to_graph(new))
+        created |= new
+    return created
+
+
+def follow_authors(user, usernames):
+    ids = resolve_usernames(usernames)
+    created = create_follows(
+        (user.id, author_id) for author_id in ids.values())
+    notify_many({author_id for _, author_id in created},
+                Notification.FOLLOW, user.id)
+    return ids
+
+
+def unfollow_authors(user, usernames):
+    ids = resolve_usernames(usernames)
+    for chunk in _chunks(ids.values()):
+        with transaction.atomic():
+            removed = _existing([(user.id, author_id) for author_id in chunk])
+            Follow.objects.filter(user=user, author_id__in=chunk).delete()
+            record_follows(removed, ChangeEvent.DELETE)
+    return ids
@@ -1,9 +1,27 @@
 from django import forms
+from django.conf import settings
 
-from .models import Comment, Post
+from .dedup import find_duplicate
+from .images import update_image_preview
+from .models import Comment, Post, TextFingerprint
 
 
-class PostForm(forms.ModelForm):
+class DuplicateTextMixin:
+    """При DEDUP_ACTION = 'reject' не пропускает почти повторы."""
+
+    dedup_kind = None
+
+    def clean_text(self):
+        text = self.cleaned_data['text']
+        if (settings.DEDUP_ACTION == 'reject' and find_duplicate(
+                self.dedup_kind, text, self.instance.pk)):
+            raise forms.ValidationError('Похожий текст уже опубликован')
+        return text
+
+
+class PostForm(DuplicateTextMixin, forms.ModelForm):
+    dedup_kind = TextFingerprint.POST
+
     class Meta:
         model = Post
         fields = ("text", "group", "image")
@@ -18,8 +36,15 @@ class PostForm(forms.ModelForm):
             },
         }
 
+    def save(self, commit=True):
+        if 'image' in self.changed_data:
+            update_image_preview(self.instance)
+        return super().save(commit)
+
+
+class CommentForm(DuplicateTextMixin, forms.ModelForm):
+    dedup_kind = TextFingerprint.COMMENT
 
-class CommentForm(forms.ModelForm):
     class Meta:
         model = Comment
         fields = ("text",)
@@ -0,0 +1,47 @@
+import base64
+import io
+
+# Картинка-заглушка растягивается браузером с размытием, поэтому
+# хватает нескольких пикселей: data: URI укладывается в пару сотен байт.
+PLACEHOLDER_SIZE = 8
+PALETTE_SIZE = 4
+EMPTY_PREVIEW = {'image_width': None, 'image_height': None,
+                 'image_color': '', 'image_placeholder': ''}
+
+
+def image_preview(file):
+    """Размеры, преобладающий цвет и крошечная PNG-заглушка картинки.
+
+    Принимает открытый файл или путь. Django здесь не нужен, поэтому
+    функцию можно вызывать в отдельных процессах.
+    """
+    # Pillow нужен не каждому воркеру (WARMUP_LAZY_IMPORTS)
+    from PIL import Image
+
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    with Image.open(file) as image:
+        width, height = image.size
+        # JPEG декодируется сразу в уменьшенном масштабе
+        image.draft('RGB', (PLACEHOLDER_SIZE * 4, PLACEHOLDER_SIZE * 4))
+        small = image.convert('RGB')
+    small.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    palette = small.quantize(colors=PALETTE_SIZE)
+    _, index = max(palette.getcolors())
+    red, green, blue = palette.getpalette()[index * 3:index * 3 + 3]
+    buffer = io.BytesIO()
+    small.save(buffer, 'PNG', optimize=True)
+    return {
+        'image_width': width,
+        'image_height': height,
+        'image_color': f'#{red:02x}{green:02x}{blue:02x}',
+        'image_placeholder': 'data:image/png;base64,'
+                             + base64.b64encode(buffer.getvalue()).decode(),
+    }
+
+
+def update_image_preview(post):
+    """Пересчитывает поля превью по post.image (пустые — без картинки)."""
+    preview = image_preview(post.image) if post.image else EMPTY_PREVIEW
+    for field, value in preview.items():
+        setattr(post, field, value)
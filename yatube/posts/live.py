@@ -0,0 +1,240 @@
+import json
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db.models import Max
+
+from .follow_graph import get_follow_graph
+from .models import Comment, Post
+from .sharding import shard_aliases
+
+POLL_BATCH_SIZE = 500
+# порядок id в паре курсора
+EVENT_TYPES = ('post', 'comment')
+
+
+class Cursor:
+    """Позиция в потоке изменений: последние виденные id поста и комментария.
+
+    id растут монотонно внутри каждого шарда (posts.sharding) и одинаковы
+    для всех процессов, поэтому клиент может переподключиться к любому
+    воркеру с тем же Last-Event-ID. В строке пары «пост:комментарий»
+    шардов разделены «/».
+    """
+
+    def __init__(self, positions=None):
+        self.positions = [list(pair) for pair in (
+            positions or [(0, 0)] * len(shard_aliases()))]
+
+    @classmethod
+    def parse(cls, value):
+        try:
+            positions = [tuple(int(number) for number in part.split(':'))
+                         for part in value.split('/')]
+        except (AttributeError, ValueError):
+            return None
+        if (len(positions) != len(shard_aliases())
+                or any(len(pair) != 2 for pair in positions)):
+            return None
+        return cls(positions)
+
+    def advance(self, event):
+        pair = self.positions[event['shard']]
+        kind = EVENT_TYPES.index(event['type'])
+        pair[kind] = max(pair[kind], event['id'])
+
+    def is_new(self, event):
+        pair = self.positions[event['shard']]
+        return event['id'] > pair[EVENT_TYPES.index(event['type'])]
+
+    def __str__(self):
+        return '/'.join(f'{post_id}:{comment_id}'
+                        for post_id, comment_id in self.positions)
+
+
+class ChangeFeed:
+    """Новые посты и комментарии для SSE-подписчиков процесса.
+
+    Базу опрашивает не каждое соединение, а сам поток изменений:
+    не чаще раза в LIVE_POLL_INTERVAL секунд один запрос на таблицу
+    (id > последнего виденного). Опрос выполняет первое проснувшееся
+    соединение, остальные ждут на условии и читают кольцевой буфер
+    последних LIVE_BUFFER_SIZE событий. Внешний брокер не нужен:
+    записи других процессов видны через ту же базу.
+    """
+
+    def __init__(self, buffer_size=None):
+        self._events = deque(maxlen=buffer_size or settings.LIVE_BUFFER_SIZE)
+        self._changed = threading.Condition()
+        self._poll_lock = threading.Lock()
+        self._polled_at = None
+        self.head = None
+
+    def reset(self):
+        with self._changed:
+            self._events.clear()
+            self._polled_at = None
+            self.head = None
+
+    def poll(self):
+        if self.head is None:
+            self.head = Cursor([
+                tuple(model.objects.using(alias).aggregate(
+                    high=Max('id'))['high'] or 0 for model in (Post, Comment))
+                for alias in shard_aliases()])
+            return []
+        events = []
+        for shard, alias in enumerate(shard_aliases()):
+            last_post, last_comment = self.head.positions[shard]
+            events.extend(
+                {'type': 'post', 'id': post_id, 'author': author_id,
+                 'group': group_id, 'shard': shard}
+                for post_id, author_id, group_id in Post.objects.using(
+                    alias).filter(id__gt=last_post).order_by('id').values_list(
+                        'id', 'author_id', 'group_id')[:POLL_BATCH_SIZE])
+            events.extend(
+                {'type': 'comment', 'id': comment_id, 'post': post_id,
+                 'shard': shard}
+                for comment_id, post_id in Comment.objects.using(
+                    alias).filter(id__gt=last_comment).order_by(
+                        'id').values_list('id', 'post_id')[:POLL_BATCH_SIZE])
+        if events:
+            with self._changed:
+                for event in events:
+                    self.head.advance(event)
+                    self._events.append(event)
+                self._changed.notify_all()
+        return events
+
+    def maybe_poll(self):
+        if not self._poll_lock.acquire(blocking=False):
+            return
+        try:
+            now = time.monotonic()
+            if (self._polled_at is None or now - self._polled_at
+                    >= settings.LIVE_POLL_INTERVAL):
+                self._polled_at = now
+                self.poll()
+        finally:
+            self._poll_lock.release()
+
+    def current(self):
+        self.maybe_poll()
+        return Cursor(self.head and self.head.positions)
+
+    def since(self, cursor):
+        with self._changed:
+            return [event for event in self._events if cursor.is_new(event)]
+
+    def wait(self, cursor, timeout):
+        """События после cursor; ждёт их не дольше timeout секунд."""
+        deadline = time.monotonic() + timeout
+        while True:
+            self.maybe_poll()
+            events = self.since(cursor)
+            remaining = deadline - time.monotonic()
+            if events or remaining <= 0:
+                return events
+            with self._changed:
+                self._changed.wait(
+                    min(remaining, settings.LIVE_POLL_INTERVAL))
+
+
+change_feed = ChangeFeed()
+
+
+class ConnectionLimit:
+    """Счётчик открытых SSE-соединений процесса: общий и на пользователя."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._total = 0
+        self._per_user = {}
+
+    def acquire(self, key):
+        with self._lock:
+            if (self._total >= settings.LIVE_MAX_CONNECTIONS
+                    or self._per_user.get(key, 0)
+                    >= settings.LIVE_MAX_CONNECTIONS_PER_USER):
+                return False
+            self._total += 1
+            self._per_user[key] = self._per_user.get(key, 0) + 1
+            return True
+
+    def release(self, key):
+        with self._lock:
+            self._total -= 1
+            self._per_user[key] -= 1
+            if not self._per_user[key]:
+                del self._per_user[key]
+
+
+connection_limit = ConnectionLimit()
+
+
+def event_filter(stream, user=None, group_id=None, post_id=None):
+    """Какие события интересны странице: лента, подписки, группа, пост."""
+    if stream == 'post':
+        return lambda event: (event['type'] == 'comment'
+                              and event['post'] == post_id)
+    if stream == 'group':
+        return lambda event: (event['type'] == 'post'
+                              and event['group'] == group_id)
+    if stream == 'follow':
+        graph = get_follow_graph()
+        return lambda event: (event['type'] == 'post' and graph.is_following(
+            user.id, event['author']))
+    return lambda event: event['type'] == 'post'
+
+
+def format_event(name, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {name}')
+    lines.append(f'data: {data}')
+    return '\n'.join(lines) + '\n\n'
+
+
+class EventStream:
+    """Поток SSE: события, heartbeat-комментарии, закрытие по LIVE_MAX_AGE.
+
+    Клиент после закрытия переподключается сам с Last-Event-ID,
+    так что долгоживущие соединения периодически перераспределяются.
+    Место в connection_limit освобождается в close(), который сервер
+    вызывает и для потока, не успевшего начаться.
+    """
+
+    def __init__(self, cursor, accepts, key, feed=None):
+        self.cursor = cursor
+        self.accepts = accepts
+        self.key = key
+        self.feed = feed or change_feed
+        self.closed = False
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            connection_limit.release(self.key)
+
+    def __iter__(self):
+        yield f'retry: {settings.LIVE_RETRY_MS}\n\n'
+        deadline = time.monotonic() + settings.LIVE_MAX_AGE
+        while time.monotonic() < deadline:
+            events = self.feed.wait(self.cursor, settings.LIVE_HEARTBEAT)
+            if not events:
+                yield ': ping\n\n'
+                continue
+            counts = {}
+            for event in events:
+                self.cursor.advance(event)
+                if self.accepts(event):
+                    counts[event['type']] = counts.get(event['type'], 0) + 1
+            if not counts:
+                # событие без data не показывается, но сдвигает Last-Event-ID
+                yield f'id: {self.cursor}\n\n'
+            for name, count in counts.items():
+                yield format_event(
+                    name, json.dumps({'count': count}), self.cursor)
@@ -0,0 +1,23 @@
+import datetime as dt
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.archive import archive_posts
+
+
+class Command(BaseCommand):
+    help = "Переносит старые посты и комментарии к ним в архивные таблицы"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=settings.ARCHIVE_AFTER_DAYS,
+            help="Архивировать посты старше стольких дней")
+        parser.add_argument(
+            "--chunk-size", type=int, default=500,
+            help="Постов в одной транзакции")
+
+    def handle(self, *args, **options):
+        before = dt.datetime.now() - dt.timedelta(days=options["days"])
+        moved = archive_posts(before, options["chunk_size"])
+        self.stdout.write(f"Перенесено в архив постов: {moved}")
@@ -0,0 +1,70 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from posts.images import EMPTY_PREVIEW, image_preview
+from posts.models import ArchivedPost, Post
+from posts.sharding import model_querysets
+
+FIELDS = tuple(EMPTY_PREVIEW)
+
+
+def preview_or_none(path):
+    try:
+        return image_preview(path)
+    except (OSError, ValueError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ("Считает размеры, цвет и заглушки картинок постов, "
+            "загруженных до появления этих полей")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size", type=int, default=200,
+            help="Картинок в одной транзакции")
+        parser.add_argument(
+            "--workers", type=int, default=os.cpu_count(),
+            help="Процессов, декодирующих картинки")
+
+    def backfill(self, table, pool, chunk_size):
+        queryset = table.exclude(image="").exclude(
+            image__isnull=True).filter(image_placeholder="").only(
+                "id", "image").order_by("id")
+        done, broken, last_id = 0, 0, 0
+        while True:
+            posts = list(queryset.filter(id__gt=last_id)[:chunk_size])
+            if not posts:
+                return done, broken
+            last_id = posts[-1].id
+            paths = [default_storage.path(post.image.name) for post in posts]
+            updated = []
+            for post, preview in zip(
+                    posts, pool.map(preview_or_none, paths)):
+                if preview is None:
+                    broken += 1
+                    continue
+                for field, value in preview.items():
+                    setattr(post, field, value)
+                updated.append(post)
+            with transaction.atomic(using=table.db):
+                table.bulk_update(updated, FIELDS)
+            done += len(updated)
+
+    def handle(self, *args, **options):
+        # дочерние процессы не должны унаследовать открытое соединение
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options["workers"]) as pool:
+            for model in (Post, ArchivedPost):
+                done = broken = 0
+                for table in model_querysets(model):
+                    counts = self.backfill(table, pool, options["chunk_size"])
+                    done += counts[0]
+                    broken += counts[1]
+                self.stdout.write(
+                    f"{model._meta.verbose_name_plural}: обновлено {done}, "
+                    f"не прочитано {broken}")
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import ArchivedPost, Post
+from posts.sharding import model_querysets
+
+FIELDS = ("html", "excerpt", "is_truncated")
+
+
+class Command(BaseCommand):
+    help = "Заполняет HTML и начало текста у постов, сохранённых до них"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size", type=int, default=500,
+            help="Постов в одной транзакции")
+        parser.add_argument(
+            "--all", action="store_true",
+            help="Пересчитать все посты, а не только незаполненные")
+
+    def backfill(self, table, chunk_size, everything):
+        queryset = table.only("id", "text").order_by("id")
+        if not everything:
+            queryset = queryset.filter(excerpt="").exclude(text="")
+        done, last_id = 0, 0
+        while True:
+            posts = list(queryset.filter(id__gt=last_id)[:chunk_size])
+            if not posts:
+                return done
+            for post in posts:
+                post.render_text()
+            with transaction.atomic(using=table.db):
+                table.bulk_update(posts, FIELDS)
+            done += len(posts)
+            last_id = posts[-1].id
+
+    def handle(self, *args, **options):
+        for model in (Post, ArchivedPost):
+            done = sum(
+                self.backfill(table, options["chunk_size"], options["all"])
+                for table in model_querysets(model))
+            self.stdout.write(
+                f"{model._meta.verbose_name_plural}: обновлено {done}")
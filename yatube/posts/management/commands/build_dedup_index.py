@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from posts.dedup import build_index
+
+
+class Command(BaseCommand):
+    help = "Пересобирает индекс почти повторов постов и комментариев"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size", type=int, default=1000,
+            help="Текстов в одной пачке")
+
+    def handle(self, *args, **options):
+        stats = build_index(options["chunk_size"])
+        for kind, (indexed, flagged) in stats.items():
+            self.stdout.write(
+                f"{kind}: проиндексировано {indexed}, повторов {flagged}")
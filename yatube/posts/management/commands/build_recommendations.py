@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts.recommendations import build_recommendations
+
+
+class Command(BaseCommand):
+    help = "Строит рекомендации авторов по графу подписок"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--top-k", type=int, default=None,
+            help="Сколько рекомендаций хранить на пользователя")
+
+    def handle(self, *args, **options):
+        written = build_recommendations(options["top_k"])
+        self.stdout.write(f"Записано рекомендаций: {written}")
@@ -0,0 +1,25 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import iter_user_export
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ("Выгружает посты, комментарии, подписки и картинки "
+            "пользователя в ZIP")
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+        parser.add_argument("path")
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options["username"]).first()
+        if user is None:
+            raise CommandError(
+                f"Пользователь {options['username']} не найден")
+        with open(options["path"], "wb") as target:
+            for chunk in iter_user_export(user):
+                target.write(chunk)
+        self.stdout.write(f"Данные выгружены в {options['path']}")
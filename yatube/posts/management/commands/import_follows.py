@@ -0,0 +1,71 @@
+import csv
+import json
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.follows import create_follows, resolve_usernames
+
+BATCH_SIZE = 5000
+
+
+def read_rows(path):
+    if path.endswith('.json'):
+        with open(path, encoding='utf-8') as source:
+            for item in json.load(source):
+                if isinstance(item, dict):
+                    yield [item.get('user'), item.get('author')]
+                elif isinstance(item, str):
+                    yield [item]
+                else:
+                    yield list(item)
+        return
+    with open(path, newline='', encoding='utf-8') as source:
+        for row in csv.reader(source):
+            if row and row[0] not in ('user', 'author', 'username'):
+                yield [cell.strip() for cell in row]
+
+
+class Command(BaseCommand):
+    help = ('Импортирует подписки из CSV/JSON: пары «подписчик, автор» '
+            'или, с --user, список авторов для одного пользователя')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--user', default=None,
+            help='Подписать этого пользователя на авторов из файла')
+
+    def handle(self, *args, **options):
+        follower_id = None
+        if options['user']:
+            follower_id = resolve_usernames(
+                [options['user']]).get(options['user'])
+            if follower_id is None:
+                raise CommandError(
+                    f"Пользователь {options['user']} не найден")
+
+        rows = read_rows(options['path'])
+        created = unknown = 0
+        while True:
+            batch = list(islice(rows, BATCH_SIZE))
+            if not batch:
+                break
+            ids = resolve_usernames(
+                name for row in batch for name in row[:2]
+                if isinstance(name, str))
+            pairs = []
+            for row in batch:
+                if follower_id is not None:
+                    pair = (follower_id, ids.get(row[0]))
+                elif len(row) >= 2:
+                    pair = (ids.get(row[0]), ids.get(row[1]))
+                else:
+                    pair = (None, None)
+                if None in pair:
+                    unknown += 1
+                else:
+                    pairs.append(pair)
+            created += len(create_follows(pairs))
+        self.stdout.write(
+            f'Создано подписок: {created}, пропущено: {unknown}')
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.sharding import model_querysets
+from posts.tags import sync_post_tags
+
+
+class Command(BaseCommand):
+    help = "Разбирает теги и упоминания в уже опубликованных постах"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size", type=int, default=500,
+            help="Постов за один запрос")
+
+    def handle(self, *args, **options):
+        done = 0
+        for rows in model_querysets(Post):
+            last_id = 0
+            while True:
+                posts = list(rows.filter(id__gt=last_id).only(
+                    "id", "text", "author_id", "pub_date").order_by(
+                        "id")[:options["chunk_size"]])
+                if not posts:
+                    break
+                for post in posts:
+                    if "#" in post.text or "@" in post.text:
+                        sync_post_tags(post)
+                done += len(posts)
+                last_id = posts[-1].id
+        self.stdout.write(f"Обработано постов: {done}")
@@ -0,0 +1,62 @@
+import json
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# выполняется в отдельном процессе: холодный старт нельзя измерить
+# в уже прогретом
+CHILD = '''
+import json, sys, time
+started = time.perf_counter()
+from django.conf import settings
+for name, value in json.loads(sys.argv[1]).items():
+    setattr(settings, name, value)
+from yatube.wsgi import application
+ready = time.perf_counter()
+from wsgiref.util import setup_testing_defaults
+environ = {"PATH_INFO": sys.argv[2], "HTTP_HOST": sys.argv[3]}
+setup_testing_defaults(environ)
+statuses = []
+body = application(environ, lambda status, headers: statuses.append(status))
+next(iter(body), b"")
+done = time.perf_counter()
+print(json.dumps({"startup": (ready - started) * 1000,
+                  "ttfb": (done - ready) * 1000, "status": statuses[0]}))
+'''
+MODES = (
+    ("без прогрева", {"WARMUP_ENABLED": False}),
+    ("с прогревом", {}),
+    ("с прогревом, Pillow лениво", {"WARMUP_LAZY_IMPORTS": True}),
+)
+
+
+class Command(BaseCommand):
+    help = ("Измеряет запуск воркера и время до первого байта "
+            "первого запроса с прогревом и без")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default="/", help="Первый запрос")
+        parser.add_argument(
+            "--runs", type=int, default=5, help="Запусков на режим")
+
+    def run_child(self, overrides, path):
+        host = next((host.lstrip(".") for host in settings.ALLOWED_HOSTS
+                     if host != "*"), "localhost")
+        output = subprocess.run(
+            [sys.executable, "-c", CHILD, json.dumps(overrides), path, host],
+            cwd=settings.BASE_DIR, capture_output=True, check=True,
+            text=True).stdout
+        return json.loads(output.splitlines()[-1])
+
+    def handle(self, *args, **options):
+        for name, overrides in MODES:
+            results = [self.run_child(overrides, options["path"])
+                       for _ in range(options["runs"])]
+            startup = statistics.median(r["startup"] for r in results)
+            ttfb = statistics.median(r["ttfb"] for r in results)
+            self.stdout.write(
+                f"{name}: запуск {startup:.0f} мс, первый байт {ttfb:.0f} мс, "
+                f"всего {startup + ttfb:.0f} мс ({results[0]['status']})")
@@ -0,0 +1,44 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.deletion import process_deletions, request_deletion
+from posts.models import Deletion
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ("Удаляет пользователей и посты из очереди пачками "
+            "небольших транзакций")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user", action="append", default=[], metavar="USERNAME",
+            help="Поставить пользователя в очередь на удаление")
+        parser.add_argument(
+            "--post", action="append", default=[], type=int,
+            metavar="ID", help="Поставить пост в очередь на удаление")
+        parser.add_argument(
+            "--batch-size", type=int, default=None,
+            help="Строк в одной транзакции")
+        parser.add_argument(
+            "--max-batches", type=int, default=None,
+            help="Остановиться после стольких пачек")
+
+    def handle(self, *args, **options):
+        for username in options["user"]:
+            user_id = User.objects.filter(username=username).values_list(
+                "id", flat=True).first()
+            if user_id is None:
+                raise CommandError(f"Пользователь {username} не найден")
+            request_deletion(Deletion.USER, user_id)
+        for post_id in options["post"]:
+            request_deletion(Deletion.POST, post_id)
+        finished = process_deletions(
+            options["batch_size"], options["max_batches"])
+        self.stdout.write(f"Завершено удалений: {finished}")
+        for deletion in Deletion.objects.filter(finished__isnull=True):
+            self.stdout.write(
+                f"{deletion}: {deletion.progress:.0%}, удалено "
+                f"{deletion.deleted_rows} из {deletion.total_rows}, "
+                f"шаг {deletion.stage or '-'}")
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from posts.media import shard_images, sweep_flat_directory
+from posts.models import ArchivedPost, Post
+
+
+class Command(BaseCommand):
+    help = ("Переносит картинки постов из плоского posts/ в каталоги "
+            "по хэшу содержимого")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size", type=int, default=200,
+            help="Файлов в одной пачке")
+        parser.add_argument(
+            "--no-sweep", action="store_true",
+            help="Не удалять оставшиеся без ссылок файлы из posts/")
+
+    def handle(self, *args, **options):
+        for model in (Post, ArchivedPost):
+            moved, missing = shard_images(model, options["chunk_size"])
+            self.stdout.write(
+                f"{model._meta.verbose_name_plural}: перенесено {moved}, "
+                f"файлов не найдено {missing}")
+        if not options["no_sweep"]:
+            removed = sweep_flat_directory()
+            self.stdout.write(f"Удалено файлов без ссылок: {removed}")
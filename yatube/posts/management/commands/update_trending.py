@@ -0,0 +1,22 @@
+import datetime as dt
+
+from django.core.management.base import BaseCommand
+
+from posts.trending import update_trending
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает рейтинг популярных постов с недавней активностью"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--minutes", type=int, default=None,
+            help="Окно активности в минутах (по умолчанию TRENDING_WINDOW)")
+
+    def handle(self, *args, **options):
+        since = None
+        if options["minutes"] is not None:
+            since = dt.datetime.now() - dt.timedelta(
+                minutes=options["minutes"])
+        updated = update_trending(since)
+        self.stdout.write(f"Обновлено постов: {updated}")
@@ -0,0 +1,84 @@
+import posixpath
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from yatube.storage import content_hash, sharded_name, sharded_pattern
+
+from .models import ArchivedPost, Post
+from .sharding import model_querysets
+
+IMAGE_DIRECTORY = 'posts'
+
+
+def _move(name):
+    """Копирует файл по новому имени; повторный запуск не копирует дважды."""
+    with default_storage.open(name) as file:
+        new_name = sharded_name(IMAGE_DIRECTORY, content_hash(file), name)
+        if not default_storage.exists(new_name):
+            new_name = default_storage.save(new_name, file)
+    return new_name
+
+
+def shard_images(model, chunk_size=200):
+    """Переносит картинки model во всех шардах; (перенесено, не найдено)."""
+    moved = missing = 0
+    for table in model_querysets(model):
+        done, lost = _shard_table_images(table, chunk_size)
+        moved += done
+        missing += lost
+    return moved, missing
+
+
+def _shard_table_images(table, chunk_size):
+    """Переносит картинки строк table в новую раскладку пачками.
+
+    Порядок в пачке: скопировать файлы, одной транзакцией переписать
+    пути, и только потом удалить старые файлы. Прерванный запуск
+    безопасно повторить: строки со старыми путями ссылаются на ещё
+    не удалённые файлы, а уже скопированные файлы не копируются снова.
+    """
+    queryset = table.exclude(image='').exclude(
+        image__isnull=True).exclude(
+            image__regex=sharded_pattern(IMAGE_DIRECTORY)).order_by('id')
+    moved, missing, last_id = 0, 0, 0
+    while True:
+        rows = list(queryset.filter(id__gt=last_id).values_list(
+            'id', 'image')[:chunk_size])
+        if not rows:
+            return moved, missing
+        last_id = rows[-1][0]
+        renamed = {}
+        for row_id, name in rows:
+            if default_storage.exists(name):
+                renamed[row_id] = (name, _move(name))
+            else:
+                missing += 1
+        with transaction.atomic(using=table.db):
+            for row_id, (_, new_name) in renamed.items():
+                table.filter(id=row_id).update(image=new_name)
+        for old_name, _ in renamed.values():
+            default_storage.delete(old_name)
+        moved += len(renamed)
+
+
+def sweep_flat_directory(prefix=IMAGE_DIRECTORY, chunk_size=500):
+    """Удаляет файлы плоского каталога, на которые больше никто не ссылается.
+
+    Подбирает старые копии, оставшиеся после прерванного shard_images.
+    """
+    _, files = default_storage.listdir(prefix)
+    removed = 0
+    for start in range(0, len(files), chunk_size):
+        names = [posixpath.join(prefix, name)
+                 for name in files[start:start + chunk_size]]
+        used = set()
+        for model in (Post, ArchivedPost):
+            for table in model_querysets(model):
+                used.update(table.filter(image__in=names).values_list(
+                    'image', flat=True))
+        for name in names:
+            if name not in used:
+                default_storage.delete(name)
+                removed += 1
+    return removed
@@ -0,0 +1,49 @@
+# Generated by Django 2.2.6 on 2026-10-19 03:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0015_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='notification_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('unread', models.PositiveIntegerField(default=0, verbose_name='Непрочитанных')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('verb', models.CharField(choices=[('comment', 'Комментарий'), ('follow', 'Подписка')], max_length=16, verbose_name='Событие')),
+                ('count', models.PositiveIntegerField(default=1, verbose_name='Число событий')),
+                ('created', models.DateTimeField(verbose_name='Последнее событие')),
+                ('is_read', models.BooleanField(default=False, verbose_name='Прочитано')),
+                ('digested', models.BooleanField(default=False, verbose_name='Отправлено в дайджесте')),
+                ('actor', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Последний инициатор')),
+                ('post', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='posts.Post', verbose_name='Пост')),
+                ('recipient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to=settings.AUTH_USER_MODEL, verbose_name='Получатель')),
+            ],
+            options={
+                'ordering': ['-created'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient', '-created'], name='notification_recipient'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['digested', 'recipient'], name='notification_digest'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 2.2.6 on 2026-10-19 03:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_notification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeCheckpoint',
+            fields=[
+                ('consumer', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='Потребитель')),
+                ('seq', models.BigIntegerField(default=0, verbose_name='Последний обработанный номер')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ChangeEvent',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False, verbose_name='Номер')),
+                ('kind', models.CharField(choices=[('post', 'Пост'), ('comment', 'Комментарий'), ('follow', 'Подписка')], max_length=16, verbose_name='Объект')),
+                ('action', models.CharField(choices=[('create', 'Создание'), ('update', 'Изменение'), ('delete', 'Удаление')], max_length=16, verbose_name='Действие')),
+                ('object_id', models.PositiveIntegerField(verbose_name='id объекта')),
+                ('payload', models.TextField(default='{}', verbose_name='Данные')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Время')),
+            ],
+            options={
+                'ordering': ['seq'],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 2.2.6 on 2026-10-19 03:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_changelog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TextBand',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('post', 'Пост'), ('comment', 'Комментарий')], max_length=16, verbose_name='Объект')),
+                ('bucket', models.BigIntegerField(verbose_name='Корзина LSH')),
+                ('object_id', models.PositiveIntegerField(verbose_name='id объекта')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TextFingerprint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('post', 'Пост'), ('comment', 'Комментарий')], max_length=16, verbose_name='Объект')),
+                ('object_id', models.PositiveIntegerField(verbose_name='id объекта')),
+                ('signature', models.BinaryField(verbose_name='MinHash-подпись')),
+                ('duplicate_of', models.PositiveIntegerField(blank=True, null=True, verbose_name='Похож на')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='textfingerprint',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_fingerprint'),
+        ),
+        migrations.AddIndex(
+            model_name='textband',
+            index=models.Index(fields=['kind', 'bucket'], name='textband_bucket'),
+        ),
+        migrations.AddIndex(
+            model_name='textband',
+            index=models.Index(fields=['kind', 'object_id'], name='textband_object'),
+        ),
+    ]
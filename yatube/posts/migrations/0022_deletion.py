@@ -0,0 +1,29 @@
+# Generated by Django 2.2.6 on 2026-10-19 03:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_image_preview'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Deletion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('user', 'Пользователь'), ('post', 'Пост')], max_length=16, verbose_name='Объект')),
+                ('object_id', models.PositiveIntegerField(verbose_name='id объекта')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('finished', models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Завершено')),
+                ('stage', models.CharField(blank=True, max_length=32, verbose_name='Текущий шаг')),
+                ('total_rows', models.BigIntegerField(blank=True, null=True, verbose_name='Строк к удалению')),
+                ('deleted_rows', models.BigIntegerField(default=0, verbose_name='Удалено строк')),
+            ],
+            options={
+                'ordering': ['created', 'id'],
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+import posts.models
+
+
+def fill_authors(apps, schema_editor):
+    using = schema_editor.connection.alias
+    Post = apps.get_model('posts', 'Post')
+    ArchivedPost = apps.get_model('posts', 'ArchivedPost')
+    for name in ('PostTag', 'Mention'):
+        model = apps.get_model('posts', name)
+        for source in (Post, ArchivedPost):
+            model.objects.using(using).filter(author__isnull=True).update(
+                author_id=Subquery(source.objects.using(using).filter(
+                    id=OuterRef('post_id')).values('author_id')[:1]))
+        # строки удалённых постов, которые раньше убрал бы каскад
+        model.objects.using(using).filter(author__isnull=True).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0023_sharding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mention',
+            name='author',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор поста'),
+        ),
+        migrations.AddField(
+            model_name='posttag',
+            name='author',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор поста'),
+        ),
+        migrations.RunPython(fill_authors, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='mention',
+            name='author',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор поста'),
+        ),
+        migrations.AlterField(
+            model_name='posttag',
+            name='author',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор поста'),
+        ),
+        migrations.AlterField(
+            model_name='mention',
+            name='post',
+            field=models.ForeignKey(db_constraint=False, on_delete=posts.models.keep_archived, related_name='mentions', to='posts.Post', verbose_name='Пост'),
+        ),
+        migrations.AlterField(
+            model_name='posttag',
+            name='post',
+            field=models.ForeignKey(db_constraint=False, on_delete=posts.models.keep_archived, related_name='tags', to='posts.Post', verbose_name='Пост'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.6 on 2026-10-19 04:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0024_index_archived_posts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='changeevent',
+            index=models.Index(fields=['kind', 'seq'], name='changeevent_kind_seq'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.db import migrations
+
+# копия posts.usernames.RESERVED_USERNAMES на момент миграции
+RESERVED_USERNAMES = (
+    'about', 'admin', 'auth', 'export', 'follow', 'group', 'live', 'media',
+    'mentions', 'new', 'notifications', 'static', 'tag', 'trending',
+)
+
+
+def rename_reserved(apps, schema_editor):
+    """Профили с такими именами заслонены страницами сайта — переименовываем."""
+    using = schema_editor.connection.alias
+    app_label, model_name = settings.AUTH_USER_MODEL.split('.')
+    users = apps.get_model(app_label, model_name).objects.using(using)
+    for name in RESERVED_USERNAMES:
+        for user in users.filter(username__iexact=name):
+            username = f'{user.username}_{user.id}'
+            while users.filter(username=username).exists():
+                username += '_'
+            user.username = username
+            user.save(update_fields=['username'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0025_index_change_kind'),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_reserved, migrations.RunPython.noop),
+    ]
@@ -1,13 +1,57 @@
+import json
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.template.defaultfilters import linebreaksbr
+from django.utils.text import Truncator
+
+from .sharding import ShardedManager, ShardedQuerySet
 
 User = get_user_model()
+# в лентах показывается excerpt, полный текст — только на странице поста
+FEED_DEFERRED = ('text', 'html')
+
+
+class RenderedText(models.Model):
+    """Текст поста, заранее превращённый в HTML, и его начало для лент."""
+
+    html = models.TextField("Текст в HTML", blank=True, editable=False)
+    excerpt = models.TextField("Начало текста в HTML", blank=True,
+                               editable=False)
+    is_truncated = models.BooleanField("Текст обрезан", default=False,
+                                       editable=False)
+
+    class Meta:
+        abstract = True
+
+    def render_text(self):
+        short = Truncator(self.text).chars(settings.POST_EXCERPT_LENGTH)
+        self.html = linebreaksbr(self.text)
+        self.excerpt = linebreaksbr(short)
+        self.is_truncated = short != self.text
 
 
-class Post(models.Model):
+class ImagePreview(models.Model):
+    """Размеры картинки и заглушка, которую видно, пока она грузится."""
+
+    image_width = models.PositiveIntegerField(
+        "Ширина картинки", blank=True, null=True, editable=False)
+    image_height = models.PositiveIntegerField(
+        "Высота картинки", blank=True, null=True, editable=False)
+    image_color = models.CharField(
+        "Преобладающий цвет", max_length=7, blank=True, editable=False)
+    image_placeholder = models.TextField(
+        "Заглушка картинки", blank=True, editable=False)
+
+    class Meta:
+        abstract = True
+
+
+class Post(RenderedText, ImagePreview):
     text = models.TextField(verbose_name="Комментарий")
     pub_date = models.DateTimeField("Дата публикации",
-                                    auto_now_add=True)
+                                    auto_now_add=True, db_index=True)
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name="posts", verbose_name="Автор")
     group = models.ForeignKey(
@@ -21,6 +65,14 @@ class Post(models.Model):
         blank=True,
         null=True,
         verbose_name="Изображение")
+    trending_score = models.FloatField(
+        "Рейтинг популярности",
+        blank=True,
+        null=True,
+        db_index=True,
+        editable=False)
+
+    objects = ShardedQuerySet.as_manager()
 
     class Meta:
         ordering = ["-pub_date"]
@@ -28,6 +80,10 @@ class Post(models.Model):
     def __str__(self):
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        self.render_text()
+        super().save(*args, **kwargs)
+
 
 class Group(models.Model):
     title = models.CharField(max_length=200)
@@ -38,6 +94,79 @@ class Group(models.Model):
         return self.title
 
 
+class Tag(models.Model):
+    name = models.CharField("Название", max_length=50, unique=True)
+
+    def __str__(self):
+        return self.name
+
+
+def keep_archived(collector, field, sub_objs, using):
+    """CASCADE, который не трогает строки архивируемых постов.
+
+    Архивная копия сохраняет id поста, поэтому тег или упоминание
+    по тому же post_id продолжают вести на неё.
+    """
+    archived = set(ArchivedPost.objects.using(using).filter(
+        id__in={row.post_id for row in sub_objs}).values_list(
+            'id', flat=True))
+    models.CASCADE(collector, field, [
+        row for row in sub_objs if row.post_id not in archived], using)
+
+
+class PostTag(models.Model):
+    """Тег поста; pub_date повторяет пост, чтобы лента тега шла по индексу.
+
+    post — горячий или архивный пост с этим id, поэтому без
+    ограничения в базе; author повторяет автора поста для hide_deleted.
+    """
+
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE,
+                            related_name="post_tags", verbose_name="Тег")
+    post = models.ForeignKey(Post, on_delete=keep_archived,
+                             db_constraint=False, related_name="tags",
+                             verbose_name="Пост")
+    author = models.ForeignKey(User, on_delete=models.CASCADE,
+                               related_name="+", db_index=False,
+                               verbose_name="Автор поста")
+    pub_date = models.DateTimeField("Дата публикации")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tag', 'post'],
+                                    name='unique_post_tag'),
+        ]
+        indexes = [
+            models.Index(fields=['tag', '-pub_date', '-post'],
+                         name='posttag_feed'),
+        ]
+
+
+class Mention(models.Model):
+    """Упоминание пользователя; post и author — как у PostTag."""
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name="mentions",
+                             verbose_name="Упомянутый")
+    post = models.ForeignKey(Post, on_delete=keep_archived,
+                             db_constraint=False, related_name="mentions",
+                             verbose_name="Пост")
+    author = models.ForeignKey(User, on_delete=models.CASCADE,
+                               related_name="+", db_index=False,
+                               verbose_name="Автор поста")
+    pub_date = models.DateTimeField("Дата публикации")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_mention'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='mention_feed'),
+        ]
+
+
 class Comment(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE,
                              related_name='comments', null=True,
@@ -48,6 +177,8 @@ class Comment(models.Model):
     text = models.TextField(verbose_name="Текст")
     created = models.DateTimeField(auto_now_add=True)
 
+    objects = ShardedManager()
+
 
 class Follow(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE,
@@ -62,3 +193,229 @@ class Follow(models.Model):
             models.UniqueConstraint(
                 fields=['user', 'author'], name='unique_follow')
         ]
+
+
+class Recommendation(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name="recommendations",
+                             verbose_name="Пользователь")
+    author = models.ForeignKey(User, on_delete=models.CASCADE,
+                               related_name="recommended_to",
+                               verbose_name="Рекомендуемый автор")
+    score = models.FloatField("Оценка")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_recommendation')
+        ]
+        indexes = [
+            models.Index(fields=['user', '-score'],
+                         name='recommendation_user_score'),
+        ]
+
+
+class ArchivedPost(RenderedText, ImagePreview):
+    """Пост старше ARCHIVE_AFTER_DAYS, перенесённый archive_posts."""
+
+    is_archived = True
+
+    id = models.IntegerField(primary_key=True)
+    text = models.TextField(verbose_name="Комментарий")
+    pub_date = models.DateTimeField("Дата публикации", db_index=True)
+    author = models.ForeignKey(User, on_delete=models.CASCADE,
+                               related_name="archived_posts",
+                               verbose_name="Автор")
+    group = models.ForeignKey(
+        Group, on_delete=models.SET_NULL,
+        related_name="archived_posts",
+        blank=True,
+        null=True,
+        verbose_name="Группа")
+    image = models.ImageField(
+        upload_to='posts/',
+        blank=True,
+        null=True,
+        verbose_name="Изображение")
+
+    class Meta:
+        ordering = ["-pub_date"]
+
+    def __str__(self):
+        return self.text[:15]
+
+
+class ArchivedComment(models.Model):
+    id = models.IntegerField(primary_key=True)
+    post = models.ForeignKey(ArchivedPost, on_delete=models.CASCADE,
+                             related_name='comments', null=True,
+                             verbose_name="Пост")
+    author = models.ForeignKey(User, on_delete=models.CASCADE,
+                               related_name="archived_comments", null=True,
+                               verbose_name="Автор")
+    text = models.TextField(verbose_name="Текст")
+    created = models.DateTimeField()
+
+
+class Notification(models.Model):
+    COMMENT = "comment"
+    FOLLOW = "follow"
+    VERBS = (
+        (COMMENT, "Комментарий"),
+        (FOLLOW, "Подписка"),
+    )
+
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE,
+                                  related_name="notifications",
+                                  verbose_name="Получатель")
+    actor = models.ForeignKey(User, on_delete=models.CASCADE,
+                              related_name="+", null=True,
+                              verbose_name="Последний инициатор")
+    verb = models.CharField("Событие", max_length=16, choices=VERBS)
+    # пост может лежать в другом шарде (posts.sharding)
+    post = models.ForeignKey(Post, on_delete=models.SET_NULL,
+                             related_name="+", null=True, blank=True,
+                             db_constraint=False, verbose_name="Пост")
+    count = models.PositiveIntegerField("Число событий", default=1)
+    created = models.DateTimeField("Последнее событие")
+    is_read = models.BooleanField("Прочитано", default=False)
+    digested = models.BooleanField("Отправлено в дайджесте", default=False)
+
+    class Meta:
+        ordering = ["-created"]
+        indexes = [
+            models.Index(fields=['recipient', '-created'],
+                         name='notification_recipient'),
+            models.Index(fields=['digested', 'recipient'],
+                         name='notification_digest'),
+        ]
+
+
+class NotificationCounter(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name="notification_counter")
+    unread = models.PositiveIntegerField("Непрочитанных", default=0)
+
+
+class ChangeEvent(models.Model):
+    POST = "post"
+    COMMENT = "comment"
+    FOLLOW = "follow"
+    KINDS = (
+        (POST, "Пост"),
+        (COMMENT, "Комментарий"),
+        (FOLLOW, "Подписка"),
+    )
+    CREATE = "create"
+    UPDATE = "update"
+    DELETE = "delete"
+    ACTIONS = (
+        (CREATE, "Создание"),
+        (UPDATE, "Изменение"),
+        (DELETE, "Удаление"),
+    )
+
+    seq = models.BigAutoField("Номер", primary_key=True)
+    kind = models.CharField("Объект", max_length=16, choices=KINDS)
+    action = models.CharField("Действие", max_length=16, choices=ACTIONS)
+    object_id = models.PositiveIntegerField("id объекта")
+    payload = models.TextField("Данные", default="{}")
+    created = models.DateTimeField("Время", auto_now_add=True)
+
+    class Meta:
+        ordering = ["seq"]
+        indexes = [
+            models.Index(fields=['kind', 'seq'], name='changeevent_kind_seq'),
+        ]
+
+    @property
+    def data(self):
+        return json.loads(self.payload)
+
+
+class ChangeCheckpoint(models.Model):
+    consumer = models.CharField("Потребитель", max_length=64,
+                                primary_key=True)
+    seq = models.BigIntegerField("Последний обработанный номер", default=0)
+    updated = models.DateTimeField("Обновлено", auto_now=True)
+
+
+class TextFingerprint(models.Model):
+    POST = "post"
+    COMMENT = "comment"
+    KINDS = (
+        (POST, "Пост"),
+        (COMMENT, "Комментарий"),
+    )
+
+    kind = models.CharField("Объект", max_length=16, choices=KINDS)
+    object_id = models.PositiveIntegerField("id объекта")
+    signature = models.BinaryField("MinHash-подпись")
+    duplicate_of = models.PositiveIntegerField(
+        "Похож на", null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'],
+                                    name='unique_fingerprint'),
+        ]
+
+
+class TextBand(models.Model):
+    kind = models.CharField("Объект", max_length=16,
+                            choices=TextFingerprint.KINDS)
+    bucket = models.BigIntegerField("Корзина LSH")
+    object_id = models.PositiveIntegerField("id объекта")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['kind', 'bucket'], name='textband_bucket'),
+            models.Index(fields=['kind', 'object_id'],
+                         name='textband_object'),
+        ]
+
+
+class Deletion(models.Model):
+    """Пользователь или пост, которые удаляются в фоне пачками.
+
+    Пока finished пусто, объект скрыт из лент (posts.deletion).
+    """
+
+    USER = "user"
+    POST = "post"
+    KINDS = (
+        (USER, "Пользователь"),
+        (POST, "Пост"),
+    )
+
+    kind = models.CharField("Объект", max_length=16, choices=KINDS)
+    object_id = models.PositiveIntegerField("id объекта")
+    created = models.DateTimeField("Создано", auto_now_add=True)
+    finished = models.DateTimeField("Завершено", null=True, blank=True,
+                                    db_index=True)
+    stage = models.CharField("Текущий шаг", max_length=32, blank=True)
+    total_rows = models.BigIntegerField("Строк к удалению", null=True,
+                                        blank=True)
+    deleted_rows = models.BigIntegerField("Удалено строк", default=0)
+
+    class Meta:
+        ordering = ["created", "id"]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.object_id}"
+
+    @property
+    def progress(self):
+        if self.finished:
+            return 1.0
+        if not self.total_rows:
+            return 0.0
+        return min(self.deleted_rows / self.total_rows, 1.0)
+
+
+class ShardSequence(models.Model):
+    """Счётчик глобальных id модели в одном шарде (posts.sharding)."""
+
+    name = models.CharField("Модель", max_length=100, primary_key=True)
+    value = models.BigIntegerField("Последний номер")
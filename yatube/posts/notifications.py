@@ -0,0 +1,158 @@
+import datetime as dt
+from itertools import groupby
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+
+from .models import Notification, NotificationCounter
+from .tags import load_posts
+
+DIGEST_BATCH_SIZE = 100
+
+
+def _bump_unread(user_ids):
+    NotificationCounter.objects.bulk_create(
+        [NotificationCounter(user_id=user_id) for user_id in user_ids],
+        ignore_conflicts=True)
+    NotificationCounter.objects.filter(user_id__in=user_ids).update(
+        unread=F('unread') + 1)
+
+
+def _mergeable(verb, post_id, now):
+    window_start = now - dt.timedelta(
+        seconds=settings.NOTIFICATIONS_DEDUPE_WINDOW)
+    return Notification.objects.filter(
+        verb=verb, post_id=post_id, is_read=False,
+        created__gte=window_start)
+
+
+def _merge(queryset, actor_id, now):
+    return queryset.update(count=F('count') + 1, actor_id=actor_id,
+                           created=now, digested=False)
+
+
+def notify(recipient_id, verb, actor_id=None, post_id=None):
+    """Добавляет уведомление или сливает его с недавним таким же.
+
+    Серия событий одного вида (комментарии к одному посту, новые
+    подписчики) в пределах NOTIFICATIONS_DEDUPE_WINDOW — одна строка
+    с растущим count, а не тысячи вставок.
+    """
+    if recipient_id == actor_id:
+        return
+    now = dt.datetime.now()
+    with transaction.atomic():
+        merged = _merge(_mergeable(verb, post_id, now).filter(
+            recipient_id=recipient_id), actor_id, now)
+        if not merged:
+            Notification.objects.create(
+                recipient_id=recipient_id, verb=verb, actor_id=actor_id,
+                post_id=post_id, created=now)
+            _bump_unread([recipient_id])
+
+
+def notify_many(recipient_ids, verb, actor_id):
+    """Одно событие для многих получателей — пачки запросов, а не цикл.
+
+    Как и notify, сливает событие с непрочитанным уведомлением
+    из окна; новые строки — только для остальных получателей.
+    """
+    recipient_ids = set(recipient_ids) - {actor_id}
+    if not recipient_ids:
+        return
+    now = dt.datetime.now()
+    with transaction.atomic():
+        mergeable = _mergeable(verb, None, now).filter(
+            recipient_id__in=recipient_ids)
+        merged = set(mergeable.values_list('recipient_id', flat=True))
+        if merged:
+            _merge(mergeable, actor_id, now)
+        new = recipient_ids - merged
+        Notification.objects.bulk_create(
+            Notification(recipient_id=recipient_id, verb=verb,
+                         actor_id=actor_id, created=now)
+            for recipient_id in new)
+        if new:
+            _bump_unread(new)
+
+
+def unread_count(user):
+    if not user.is_authenticated:
+        return 0
+    return NotificationCounter.objects.filter(user=user).values_list(
+        'unread', flat=True).first() or 0
+
+
+def mark_all_read(user):
+    with transaction.atomic():
+        Notification.objects.filter(
+            recipient=user, is_read=False).update(is_read=True)
+        NotificationCounter.objects.filter(user=user).update(unread=0)
+
+
+def attach_posts(notifications):
+    """Подставляет уведомлениям посты из шардов (posts.sharding).
+
+    О комментарии узнаёт автор поста, поэтому шард поста — шард
+    получателя; архивный пост подставляется вместо удалённого из шарда.
+    """
+    field = Notification._meta.get_field('post')
+    posts = load_posts([(notification.post_id, notification.recipient_id)
+                        for notification in notifications
+                        if notification.post_id is not None], deferred=())
+    for notification in notifications:
+        field.set_cached_value(notification, posts.get(notification.post_id))
+    return notifications
+
+
+def describe(notification):
+    actor = notification.actor.username if notification.actor else 'кто-то'
+    if notification.verb == Notification.COMMENT:
+        text = f'@{actor} прокомментировал ваш пост'
+        if notification.post is not None:
+            text += f' «{notification.post}»'
+    else:
+        text = f'@{actor} подписался на вас'
+    if notification.count > 1:
+        text += f' и ещё {notification.count - 1}'
+    return text
+
+
+def _digest_message(recipient, notifications):
+    lines = [describe(notification) for notification in notifications]
+    return EmailMessage(
+        subject=f'Yatube: {len(lines)} новых уведомлений',
+        body='\n'.join(lines),
+        to=[recipient.email])
+
+
+def send_digests():
+    """Собирает неотправленные уведомления и шлёт по письму на получателя.
+
+    Письма уходят пачками через одно соединение с почтовым сервером.
+    """
+    pending = Notification.objects.filter(
+        digested=False, is_read=False, recipient__email__gt='',
+    ).select_related('recipient', 'actor').order_by(
+        'recipient_id', 'created').iterator(chunk_size=1000)
+    connection = get_connection()
+    messages, digested_ids, sent = [], [], 0
+    for _, group in groupby(pending, key=lambda item: item.recipient_id):
+        notifications = attach_posts(list(group))
+        messages.append(
+            _digest_message(notifications[0].recipient, notifications))
+        digested_ids.extend(notification.id for notification in notifications)
+        if len(messages) >= DIGEST_BATCH_SIZE:
+            sent += _flush_digests(connection, messages, digested_ids)
+            messages, digested_ids = [], []
+    if messages:
+        sent += _flush_digests(connection, messages, digested_ids)
+    return sent
+
+
+def _flush_digests(connection, messages, digested_ids):
+    sent = connection.send_messages(messages) or 0
+    Notification.objects.filter(id__in=digested_ids).update(digested=True)
+    return sent
@@ -0,0 +1,66 @@
+from django.db.models.expressions import RawSQL
+
+# Полнотекстовые индексы SQLite FTS5 по тексту постов и комментариев.
+# Таблицы-индексы ссылаются на исходные (content=...), триггеры держат
+# их в актуальном состоянии. SQLite пересоздаёт таблицу при AlterField
+# и AddField и теряет триггеры, поэтому индексы проверяются после
+# каждого migrate (см. signals.py), а не создаются миграцией.
+FTS_TABLES = {
+    'posts_post_fts': 'posts_post',
+    'posts_comment_fts': 'posts_comment',
+}
+
+TRIGGERS = (
+    ('ai', 'AFTER INSERT ON {source}',
+     'INSERT INTO {fts}(rowid, text) VALUES (new.id, new.text);'),
+    ('ad', 'AFTER DELETE ON {source}',
+     "INSERT INTO {fts}({fts}, rowid, text) "
+     "VALUES ('delete', old.id, old.text);"),
+    ('au', 'AFTER UPDATE OF text ON {source}',
+     "INSERT INTO {fts}({fts}, rowid, text) "
+     "VALUES ('delete', old.id, old.text); "
+     'INSERT INTO {fts}(rowid, text) VALUES (new.id, new.text);'),
+)
+
+
+def ensure_fts(connection):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        tables = set(connection.introspection.table_names(cursor))
+        for fts, source in FTS_TABLES.items():
+            if source not in tables:
+                continue
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+                "AND tbl_name = %s", [source])
+            existing = {name for name, in cursor.fetchall()}
+            missing = [trigger for trigger in TRIGGERS
+                       if f'{fts}_{trigger[0]}' not in existing]
+            if not missing and fts in tables:
+                continue
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                f"text, content='{source}', content_rowid='id')")
+            for suffix, event, body in missing:
+                cursor.execute(
+                    f'CREATE TRIGGER IF NOT EXISTS {fts}_{suffix} '
+                    f'{event.format(source=source)} BEGIN '
+                    f'{body.format(fts=fts)} END')
+            # пока триггеров не было, индекс мог разойтись с таблицей
+            cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+class RawSubquery(RawSQL):
+    # Lookup сам оборачивает правую часть в скобки, а SQLite читает
+    # «IN ((SELECT ...))» как скалярный подзапрос и берёт одну строку.
+    def as_sql(self, compiler, connection):
+        return self.sql, self.params
+
+
+def fts_match(fts, search_term):
+    """Подзапрос rowid из индекса fts по всем словам search_term."""
+    words = [word.replace('"', '""') for word in search_term.split()]
+    query = ' '.join(f'"{word}"*' for word in words)
+    return RawSubquery(
+        f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s', (query,))
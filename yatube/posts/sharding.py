@@ -0,0 +1,279 @@
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, models, transaction
+from django.db.models import F, Max
+
+User = get_user_model()
+# пароль на шардах не нужен: вход проверяется только по основной базе
+UNUSABLE_PASSWORD = '!'
+NOT_REPLICATED = {'password', 'last_login'}
+FEED_ORDERING = ('-pub_date', '-id')
+FEED_VERSION_KEY = 'feed:version'
+# страховка от изменений в обход сигналов (update() и т.п.)
+FEED_COUNT_TIMEOUT = 60 * 60
+
+
+def shard_aliases():
+    return tuple(settings.POST_SHARDS)
+
+
+def is_sharded():
+    return len(settings.POST_SHARDS) > 1
+
+
+def shard_for(author_id):
+    """База, где лежат посты автора и комментарии к ним.
+
+    Привязка по остатку от деления: при изменении POST_SHARDS
+    посты нужно переносить.
+    """
+    shards = settings.POST_SHARDS
+    return shards[author_id % len(shards)]
+
+
+class ShardedQuerySet(models.QuerySet):
+    """create() без using() пишет туда, куда укажет роутер."""
+
+    def create(self, **kwargs):
+        obj = self.model(**kwargs)
+        self._for_write = True
+        obj.save(force_insert=True, using=self._db)
+        return obj
+
+
+class ShardedManager(models.Manager):
+    """create() как у ShardedQuerySet, а выборки — обычный QuerySet."""
+
+    def create(self, **kwargs):
+        obj = self.model(**kwargs)
+        obj.save(force_insert=True, using=self._db)
+        return obj
+
+
+def _archived_model(model):
+    from .models import ArchivedComment, ArchivedPost, Comment, Post
+    return {Post: ArchivedPost, Comment: ArchivedComment}.get(model)
+
+
+def _sharded_models():
+    from .models import Comment, Post
+    return (Post, Comment)
+
+
+def _cached_post(instance):
+    field = instance._meta.get_field('post')
+    return field.get_cached_value(instance, None)
+
+
+class ShardRouter:
+    """Посты и комментарии пишутся в шард автора поста.
+
+    Комментарий идёт за своим постом. Остальные таблицы, в том числе
+    теги и упоминания, живут в основной базе; пользователи и группы
+    копируются на шарды (replicate), чтобы внешние ключи
+    и select_related работали внутри шарда.
+    """
+
+    def _db_for(self, model, instance):
+        from .models import Post
+        if model not in _sharded_models():
+            return DEFAULT_DB_ALIAS
+        if instance is None:
+            return None
+        if isinstance(instance, User) and model is Post:
+            return shard_for(instance.pk)
+        if isinstance(instance, Post):
+            if instance.author_id is None:
+                return None
+            return shard_for(instance.author_id)
+        if isinstance(instance, model) and model is not Post:
+            post = _cached_post(instance)
+            if post is not None:
+                return post._state.db or shard_for(post.author_id)
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._db_for(model, hints.get('instance'))
+
+    def db_for_write(self, model, **hints):
+        return self._db_for(model, hints.get('instance'))
+
+    def allow_relation(self, obj1, obj2, **hints):
+        shards = shard_aliases()
+        if obj1._state.db in shards and obj2._state.db in shards:
+            return True
+        return None
+
+
+def next_id(model, using):
+    """Глобально уникальный id новой строки model в шарде using.
+
+    id = номер из счётчика шарда * число шардов + номер шарда, так что
+    шарды не пересекаются и без общей базы. Счётчик хранится в том же
+    шарде; первый номер выбирается выше всех id, уже лежащих в шардах
+    и в архиве основной базы.
+    """
+    from .models import ShardSequence
+    shards = shard_aliases()
+    name = model._meta.label_lower
+    with transaction.atomic(using=using):
+        sequences = ShardSequence.objects.using(using).filter(name=name)
+        if not sequences.update(value=F('value') + 1):
+            sources = [model.objects.using(alias) for alias in shards]
+            archived = _archived_model(model)
+            if archived is not None:
+                sources.append(archived.objects.using(DEFAULT_DB_ALIAS))
+            highest = max(
+                rows.aggregate(highest=Max('id'))['highest'] or 0
+                for rows in sources)
+            try:
+                with transaction.atomic(using=using):
+                    ShardSequence.objects.using(using).create(
+                        name=name, value=highest // len(shards) + 1)
+            except IntegrityError:
+                sequences.update(value=F('value') + 1)
+        value = sequences.values_list('value', flat=True).get()
+    return value * len(shards) + shards.index(using)
+
+
+def replicate(instance, deleted=False):
+    """Копирует пользователя или группу из основной базы на шарды."""
+    model = type(instance)
+    for alias in shard_aliases():
+        if alias == DEFAULT_DB_ALIAS:
+            continue
+        rows = model._base_manager.using(alias).filter(pk=instance.pk)
+        if deleted:
+            rows.delete()
+            continue
+        values = {field.attname: getattr(instance, field.attname)
+                  for field in model._meta.concrete_fields
+                  if not field.primary_key
+                  and field.attname not in NOT_REPLICATED}
+        if isinstance(instance, User):
+            values['password'] = UNUSABLE_PASSWORD
+        if not rows.update(**values):
+            model._base_manager.using(alias).bulk_create(
+                [model(pk=instance.pk, **values)])
+
+
+def shard_querysets(queryset, author_ids=None, chunk_size=None):
+    """queryset на каждом шарде; author_ids раскладываются по шардам.
+
+    С chunk_size список id шарда режется на части не длиннее
+    chunk_size — по queryset на каждую.
+    """
+    if author_ids is None:
+        return [queryset.using(alias) for alias in shard_aliases()]
+    by_shard = {}
+    for author_id in author_ids:
+        by_shard.setdefault(shard_for(author_id), []).append(author_id)
+    querysets = []
+    for alias, ids in by_shard.items():
+        size = chunk_size or len(ids)
+        querysets.extend(
+            queryset.using(alias).filter(author_id__in=ids[start:start + size])
+            for start in range(0, len(ids), size))
+    return querysets
+
+
+def model_querysets(model):
+    """model.objects в каждой базе, где лежат строки model.
+
+    Для обходов всей таблицы: посты и комментарии — по шардам,
+    остальные модели — одна основная база.
+    """
+    if model in _sharded_models():
+        return shard_querysets(model.objects.all())
+    return [model.objects.all()]
+
+
+class ShardedFeed:
+    """Лента из всех шардов: k-way слияние потоков по ordering.
+
+    Все поля ordering — по убыванию. Для страницы [start:stop] каждый
+    шард отдаёт первые stop ключей (id и поля ordering), heapq.merge
+    сливает их за O(stop * log шардов), а целиком читаются только строки
+    страницы — из тех шардов, где они лежат. Глубокие страницы дороже
+    пропорционально номеру — как у OFFSET.
+
+    Число строк с count_key кэшируется до invalidate_feed_counts(),
+    иначе считается на каждом шарде.
+    """
+
+    def __init__(self, querysets, ordering=FEED_ORDERING, count_key=None):
+        self.querysets = [queryset.order_by(*ordering)
+                          for queryset in querysets]
+        self.fields = [field.lstrip('-') for field in ordering]
+        self.count_key = count_key
+        self._count = None
+
+    def _count_shards(self):
+        return sum(queryset.count() for queryset in self.querysets)
+
+    def count(self):
+        if self._count is None:
+            if self.count_key is None:
+                self._count = self._count_shards()
+            else:
+                version = cache.get_or_set(FEED_VERSION_KEY, 1, None)
+                key = f'feed:count:{version}:{self.count_key}'
+                self._count = cache.get(key)
+                if self._count is None:
+                    self._count = self._count_shards()
+                    cache.set(key, self._count, FEED_COUNT_TIMEOUT)
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def _keys(self, shard, stop):
+        return [(row, shard) for row in self.querysets[shard].values_list(
+            'id', *self.fields)[:stop]]
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        if stop is None:
+            stop = self.count()
+        merged = heapq.merge(
+            *(self._keys(shard, stop) for shard in range(len(self.querysets))),
+            key=lambda item: item[0][1:], reverse=True)
+        page = list(islice(merged, start, stop))
+        ids = {}
+        for (post_id, *_), shard in page:
+            ids.setdefault(shard, []).append(post_id)
+        rows = {}
+        for shard, post_ids in ids.items():
+            rows.update(self.querysets[shard].in_bulk(post_ids))
+        # строка могла пропасть между двумя чтениями
+        return [rows[post_id] for (post_id, *_), _ in page
+                if post_id in rows]
+
+
+def invalidate_feed_counts():
+    """Сбрасывает закэшированное число постов в лентах ShardedFeed."""
+    try:
+        cache.incr(FEED_VERSION_KEY)
+    except ValueError:
+        cache.set(FEED_VERSION_KEY, 2, None)
+
+
+def sharded_feed(queryset, author_ids=None, ordering=FEED_ORDERING,
+                 count_key=None, chunk_size=None):
+    """Лента по всем шардам; без шардирования — сам queryset.
+
+    chunk_size ограничивает длину author_id__in в одном запросе: части
+    одного шарда сливаются так же, как разные шарды.
+    """
+    if not is_sharded():
+        if author_ids is not None:
+            queryset = queryset.filter(author_id__in=list(author_ids))
+        return queryset
+    return ShardedFeed(shard_querysets(queryset, author_ids, chunk_size),
+                       ordering, count_key)
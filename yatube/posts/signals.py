@@ -0,0 +1,122 @@
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models.signals import (post_delete, post_migrate, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+
+from .archive import reserve_archived_ids
+from .follow_graph import follow_graph
+from .live import change_feed
+from .models import Comment, Follow, Group, Post
+from .search import ensure_fts
+from .sharding import (NOT_REPLICATED, invalidate_feed_counts, is_sharded,
+                       next_id, replicate)
+from .tags import drop_post_tags, sync_post_tags
+from .usernames import forget_usernames, username_cache
+
+User = get_user_model()
+
+
+def update_follow_graph(change, user_id, author_id):
+    if follow_graph.loaded_at is not None:
+        change(user_id, author_id)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, using, **kwargs):
+    # откатившаяся подписка не должна остаться в графе
+    if created:
+        transaction.on_commit(lambda: update_follow_graph(
+            follow_graph.add, instance.user_id, instance.author_id), using)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw or (update_fields and 'text' not in update_fields):
+        return
+    sync_post_tags(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, using, **kwargs):
+    # в основной базе строки убирает каскад (keep_archived)
+    if using != DEFAULT_DB_ALIAS:
+        drop_post_tags(instance.id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def feed_changed(sender, using, update_fields=None, **kwargs):
+    # сброс и до, и после коммита: в промежутке другой запрос
+    # мог закэшировать прежнее число постов
+    if update_fields is None or 'group' in update_fields:
+        invalidate_feed_counts()
+        transaction.on_commit(invalidate_feed_counts, using)
+
+
+@receiver(pre_save, sender=Post)
+@receiver(pre_save, sender=Comment)
+def sharded_id(sender, instance, using, raw=False, **kwargs):
+    # автоинкремент шарда даст те же id, что и в соседнем шарде
+    if not raw and instance.pk is None and is_sharded():
+        instance.pk = next_id(sender, using)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Group)
+def replicated_saved(sender, instance, using, update_fields=None, **kwargs):
+    if (not is_sharded() or using != DEFAULT_DB_ALIAS
+            or update_fields and set(update_fields) <= NOT_REPLICATED):
+        return
+    replicate(instance)
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Group)
+def replicated_deleted(sender, instance, using, **kwargs):
+    if is_sharded() and using == DEFAULT_DB_ALIAS:
+        replicate(instance, deleted=True)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, using, **kwargs):
+    transaction.on_commit(lambda: update_follow_graph(
+        follow_graph.remove, instance.user_id, instance.author_id), using)
+
+
+@receiver(pre_save, sender=User)
+def user_renamed(sender, instance, update_fields=None, raw=False, **kwargs):
+    # вход сохраняет только last_login — имя не читаем
+    if raw or (update_fields and 'username' not in update_fields):
+        return
+    names = {instance.username}
+    if instance.pk is not None:
+        names.update(User.objects.filter(pk=instance.pk).values_list(
+            'username', flat=True))
+    forget_usernames(*names)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, update_fields=None, raw=False, **kwargs):
+    # запрос, успевший между pre_save и save закэшировать отсутствие
+    if raw or (update_fields and 'username' not in update_fields):
+        return
+    forget_usernames(instance.username)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    forget_usernames(instance.username)
+
+
+@receiver(post_migrate)
+def database_reset(sender, **kwargs):
+    # migrate и flush меняют таблицы целиком — граф перечитается
+    follow_graph.reset()
+    change_feed.reset()
+    username_cache.clear()
+    if sender.name == 'posts':
+        using = kwargs.get('using', DEFAULT_DB_ALIAS)
+        ensure_fts(connections[using])
+        # миграция могла пересобрать таблицу и сбросить её счётчик id
+        reserve_archived_ids(using)
@@ -0,0 +1,122 @@
+import datetime as dt
+import re
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+
+from .models import (FEED_DEFERRED, ArchivedPost, Mention, Post, PostTag,
+                     Tag)
+from .sharding import shard_for
+
+User = get_user_model()
+TAG_RE = re.compile(r'(?<![\w#])#(\w{1,50})')
+MENTION_RE = re.compile(r'(?<![\w@])@([\w.+-]{1,150})')
+CURSOR_SEPARATOR = '|'
+
+
+def extract_tags(text):
+    return {name.lower() for name in TAG_RE.findall(text)}
+
+
+def extract_mentions(text):
+    # точка в конце — конец предложения, а не часть имени
+    return {name.rstrip('.') for name in MENTION_RE.findall(text)}
+
+
+def _sync(model, post, field, wanted_ids):
+    current = set(model.objects.filter(post_id=post.id).values_list(
+        field, flat=True))
+    model.objects.filter(
+        post_id=post.id, **{f'{field}__in': current - wanted_ids}).delete()
+    model.objects.bulk_create(
+        [model(post_id=post.id, author_id=post.author_id,
+               pub_date=post.pub_date, **{field: value})
+         for value in wanted_ids - current],
+        ignore_conflicts=True)
+
+
+def sync_post_tags(post):
+    """Разбирает #теги и @упоминания текста в таблицы PostTag и Mention.
+
+    Таблицы лежат в основной базе, даже если пост — в другом шарде
+    (posts.sharding): ленты тега и упоминаний читают одну таблицу.
+    """
+    names = extract_tags(post.text)
+    usernames = extract_mentions(post.text)
+    with transaction.atomic():
+        if names:
+            Tag.objects.bulk_create([Tag(name=name) for name in names],
+                                    ignore_conflicts=True)
+        tag_ids = set(Tag.objects.filter(name__in=names).values_list(
+            'id', flat=True)) if names else set()
+        user_ids = set(User.objects.filter(
+            username__in=usernames).exclude(id=post.author_id).values_list(
+                'id', flat=True)) if usernames else set()
+        _sync(PostTag, post, 'tag_id', tag_ids)
+        _sync(Mention, post, 'user_id', user_ids)
+
+
+def drop_post_tags(post_id):
+    """Удаляет строки поста, если у него нет архивной копии.
+
+    Нужна для постов из других шардов: каскад шарда не видит
+    таблиц основной базы.
+    """
+    archived = ArchivedPost.objects.filter(id=post_id)
+    for model in (PostTag, Mention):
+        model.objects.filter(post_id=post_id).exclude(
+            post_id__in=archived.values('id')).delete()
+
+
+def encode_cursor(row):
+    return f'{row.pub_date.isoformat()}{CURSOR_SEPARATOR}{row.post_id}'
+
+
+def parse_cursor(value):
+    try:
+        pub_date, post_id = value.split(CURSOR_SEPARATOR)
+        return dt.datetime.fromisoformat(pub_date), int(post_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def load_posts(pairs, deferred=FEED_DEFERRED):
+    """Посты по парам (id, автор): из шарда автора, недостающие — из архива.
+
+    Словарь {id: пост}; удалённых постов в нём нет.
+    """
+    by_shard = {}
+    for post_id, author_id in pairs:
+        by_shard.setdefault(shard_for(author_id), []).append(post_id)
+    posts = {}
+    for alias, post_ids in by_shard.items():
+        posts.update(Post.objects.using(alias).select_related(
+            'author', 'group').defer(*deferred).in_bulk(post_ids))
+    missing = [post_id for post_id, _ in pairs if post_id not in posts]
+    if missing:
+        posts.update(ArchivedPost.objects.select_related(
+            'author', 'group').defer(*deferred).in_bulk(missing))
+    return posts
+
+
+def keyset_page(queryset, after, size):
+    """Страница постов из PostTag/Mention после курсора after.
+
+    Условие «(pub_date, post) меньше курсора» и сортировка совпадают
+    с индексом таблицы, так что любая страница — один проход по индексу.
+    Посты ищутся и в архиве: архивный пост сохраняет id горячего.
+    Возвращает посты и курсор следующей страницы (или None).
+    """
+    cursor = parse_cursor(after)
+    if cursor is not None:
+        pub_date, post_id = cursor
+        queryset = queryset.filter(
+            Q(pub_date__lt=pub_date)
+            | Q(pub_date=pub_date, post_id__lt=post_id))
+    rows = list(queryset.order_by('-pub_date', '-post_id').only(
+        'pub_date', 'post_id', 'author_id')[:size + 1])
+    next_cursor = encode_cursor(rows[size - 1]) if len(rows) > size else None
+    posts = load_posts([(row.post_id, row.author_id) for row in rows[:size]])
+    return [posts[row.post_id] for row in rows[:size]
+            if row.post_id in posts], next_cursor
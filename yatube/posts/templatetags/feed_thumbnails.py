@@ -0,0 +1,21 @@
+from django import template
+
+from posts.thumbnails import prefetch_thumbnails as prefetch
+from posts.thumbnails import thumbnail_size
+
+register = template.Library()
+
+
+@register.simple_tag
+def prefetch_thumbnails(posts):
+    prefetch(posts)
+    return ''
+
+
+@register.simple_tag
+def feed_image_size(post, im):
+    """(ширина, высота) миниатюры из размеров, сохранённых при загрузке."""
+    if post.image_width and post.image_height:
+        return thumbnail_size(post.image_width, post.image_height)
+    # пост ещё без превью (до backfill_image_previews)
+    return im.width, im.height
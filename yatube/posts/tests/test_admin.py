@@ -0,0 +1,146 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(POST_SHARDS=('default',))
+class AdminChangelistTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username="admin", email="admin@mail.com", password="Pass12345")
+        cls.urls = {
+            Post: reverse('admin:posts_post_changelist'),
+            Comment: reverse('admin:posts_comment_changelist'),
+            Group: reverse('admin:posts_group_changelist'),
+        }
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def add_rows(self, count):
+        start = Post.objects.count()
+        for i in range(start, start + count):
+            author = User.objects.create_user(username=f"user{i}")
+            group = Group.objects.create(
+                title=f"Группа {i}", slug=f"group-{i}")
+            post = Post.objects.create(
+                text=f"Пост номер {i}", author=author, group=group)
+            Comment.objects.create(post=post, author=author,
+                                   text=f"Комментарий {i}")
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        """Число запросов страницы админки не зависит от числа строк."""
+        self.add_rows(5)
+        before = {model: self.count_queries(url)
+                  for model, url in self.urls.items()}
+        self.add_rows(20)
+        for model, url in self.urls.items():
+            with self.subTest(model=model.__name__):
+                self.assertEqual(self.count_queries(url), before[model])
+
+    def test_keyset_paging(self):
+        """Страницы идут по ключу и не повторяют строк."""
+        self.add_rows(150)
+        url = self.urls[Post]
+        first = self.client.get(url).context['cl']
+        self.assertEqual(len(first.result_list), 100)
+        self.assertIsNone(first.full_result_count)
+        second = self.client.get(url + first.next_page_url).context['cl']
+        self.assertEqual(len(second.result_list), 50)
+        self.assertIsNone(second.next_cursor)
+        ids = {post.id for post in first.result_list}
+        ids.update(post.id for post in second.result_list)
+        self.assertEqual(len(ids), 150)
+
+    def test_broken_cursor(self):
+        """Испорченный курсор не роняет страницу."""
+        response = self.client.get(self.urls[Post] + '?after=abc')
+        self.assertEqual(response.status_code, 302)
+
+    def test_fts_search(self):
+        """Поиск идёт по полнотекстовому индексу, включая правки."""
+        self.add_rows(3)
+        post = Post.objects.get(text="Пост номер 1")
+        post.text = "Совсем другой текст"
+        post.save()
+        response = self.client.get(self.urls[Post] + '?q=другой')
+        self.assertEqual(
+            [row.id for row in response.context['cl'].result_list],
+            [post.id])
+        response = self.client.get(self.urls[Post] + '?q=номер')
+        self.assertEqual(len(response.context['cl'].result_list), 2)
+        response = self.client.get(self.urls[Comment] + '?q=коммент')
+        self.assertEqual(len(response.context['cl'].result_list), 3)
+
+    def test_group_search_fields(self):
+        """Поиск групп идёт по существующим полям."""
+        self.add_rows(2)
+        response = self.client.get(self.urls[Group] + '?q=group-1')
+        self.assertEqual(len(response.context['cl'].result_list), 1)
+
+
+class AdminExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username="admin", email="admin@mail.com", password="Pass12345")
+        cls.group = Group.objects.create(title="Группа", slug="group")
+        Post.objects.bulk_create(
+            Post(text=f"Пост {i}", author=cls.admin,
+                 group=cls.group if i % 2 else None)
+            for i in range(10))
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def test_filtered_export_view_streams_csv(self):
+        """Выгрузка учитывает поиск и выбранные колонки."""
+        url = reverse('admin:posts_post_export')
+        response = self.client.get(
+            url, {'format': 'csv', 'columns': 'id,author,group', 'q': '3'})
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        post = Post.objects.get(text="Пост 3")
+        self.assertEqual(lines, ['id,author,group',
+                                 f'{post.id},admin,group'])
+
+    def test_export_action_ndjson(self):
+        """Действие выгружает выбранные строки в NDJSON."""
+        ids = list(Post.objects.values_list('id', flat=True)[:3])
+        response = self.client.post(
+            reverse('admin:posts_post_changelist'),
+            {'action': 'export_ndjson', '_selected_action': ids})
+        rows = [json.loads(line) for line in
+                b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(sorted(row['id'] for row in rows), sorted(ids))
+        self.assertEqual(rows[0]['author'], 'admin')
+
+    def test_export_rejects_unknown_column(self):
+        """Неизвестная колонка даёт 400."""
+        response = self.client.get(
+            reverse('admin:posts_group_export'), {'columns': 'password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_requires_staff(self):
+        """Без прав администратора выгрузка недоступна."""
+        response = Client().get(reverse('admin:posts_comment_export'))
+        self.assertEqual(response.status_code, 302)
@@ -0,0 +1,125 @@
+import datetime as dt
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.db.models import QuerySet
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..archive import archive_posts
+from ..models import ArchivedComment, ArchivedPost, Comment, Post
+
+User = get_user_model()
+
+
+@override_settings(POST_SHARDS=('default',))
+class ArchiveTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="name")
+        Post.objects.bulk_create(
+            Post(text=f'Старый пост {i}', author=cls.user)
+            for i in range(12))
+        Post.objects.update(
+            pub_date=dt.datetime.now() - dt.timedelta(days=400))
+        cls.old_post = Post.objects.order_by('id').first()
+        Comment.objects.create(
+            post=cls.old_post, author=cls.user, text='Комментарий')
+        Post.objects.bulk_create(
+            Post(text=f'Новый пост {i}', author=cls.user) for i in range(5))
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_archive_moves_old_posts_in_chunks(self):
+        """Старые посты и комментарии переезжают в архив пачками."""
+        call_command('archive_posts', chunk_size=5, stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 5)
+        self.assertEqual(ArchivedPost.objects.count(), 12)
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(
+            ArchivedComment.objects.get().post_id, self.old_post.id)
+        self.assertEqual(archive_posts(), 0)
+
+    def test_failed_delete_is_finished_by_next_run(self):
+        """Сбой после копии не теряет строки и не ломает повторный запуск."""
+        with mock.patch.object(QuerySet, 'delete',
+                               side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                archive_posts(chunk_size=5)
+        self.assertEqual(ArchivedPost.objects.count(), 5)
+        self.assertEqual(Post.objects.count(), 17)
+        self.assertEqual(archive_posts(chunk_size=5), 12)
+        self.assertEqual(Post.objects.count(), 5)
+        self.assertEqual(ArchivedPost.objects.count(), 12)
+        self.assertEqual(ArchivedComment.objects.count(), 1)
+
+    def test_feed_falls_through_to_archive(self):
+        """Страницы после горячей части берутся из архива."""
+        archive_posts()
+        for url in (reverse('posts:index'),
+                    reverse('posts:profile', args=[self.user.username])):
+            with self.subTest(url=url):
+                first = self.guest_client.get(url).context['page']
+                self.assertEqual(first.paginator.count, 17)
+                self.assertEqual(
+                    {post.text for post in first[:5]},
+                    {f'Новый пост {i}' for i in range(5)})
+                self.assertIsInstance(first[5], ArchivedPost)
+                second = self.guest_client.get(url + '?page=2')
+                self.assertEqual(len(second.context['page']), 7)
+
+    def test_archived_post_page(self):
+        """Архивный пост открывается, но не редактируется."""
+        archive_posts()
+        url = reverse('posts:post_view',
+                      args=[self.user.username, self.old_post.id])
+        response = self.guest_client.get(url)
+        self.assertEqual(response.context['post'].id, self.old_post.id)
+        self.assertContains(response, 'Комментарий')
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(reverse(
+            'posts:post_edit', args=[self.user.username, self.old_post.id]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_archived_ids_are_not_reused(self):
+        """Новый пост не получает id архивного, даже после пересборки."""
+        archive_posts(before=dt.datetime.now() + dt.timedelta(days=1))
+        last_id = ArchivedPost.objects.order_by('-id').first().id
+        # пересборка таблицы миграцией сбрасывает счётчик AUTOINCREMENT
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "DELETE FROM sqlite_sequence WHERE name = 'posts_post'")
+        call_command('migrate', verbosity=0)
+        post = Post.objects.create(text='После архива', author=self.user)
+        self.assertGreater(post.id, last_id)
+        response = self.guest_client.get(reverse(
+            'posts:post_view', args=[self.user.username, last_id]))
+        self.assertIsInstance(response.context['post'], ArchivedPost)
+
+    def test_archived_post_keeps_tags_and_mentions(self):
+        """Архивный пост остаётся в лентах тега и упоминаний."""
+        reader = User.objects.create_user(username='reader')
+        post = Post.objects.create(text='#старое для @reader',
+                                   author=self.user)
+        Post.objects.filter(id=post.id).update(
+            pub_date=dt.datetime.now() - dt.timedelta(days=400))
+        archive_posts()
+        self.assertTrue(ArchivedPost.objects.filter(id=post.id).exists())
+        response = self.guest_client.get(
+            reverse('posts:tag_posts', args=['старое']))
+        self.assertEqual([item.id for item in response.context['posts']],
+                         [post.id])
+        self.assertIsInstance(response.context['posts'][0], ArchivedPost)
+        client = Client()
+        client.force_login(reader)
+        response = client.get(reverse('posts:mentions'))
+        self.assertEqual([item.id for item in response.context['posts']],
+                         [post.id])
@@ -0,0 +1,83 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..changelog import consume, get_checkpoint, read_batch
+from ..follow_graph import follow_graph
+from ..models import ChangeEvent, Post
+
+User = get_user_model()
+
+
+@override_settings(POST_SHARDS=('default',))
+class ChangeLogTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="reader")
+        cls.author = User.objects.create_user(username="author")
+
+    def setUp(self):
+        follow_graph.load()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def events(self):
+        return [(event.kind, event.action) for event in read_batch()]
+
+    def test_views_append_events(self):
+        self.client.post(reverse('posts:new_post'), {'text': 'Пост'})
+        post = Post.objects.get()
+        self.client.post(
+            reverse('posts:post_edit', args=['author', post.id]),
+            {'text': 'Правка'})
+        self.client.force_login(self.user)
+        self.client.post(
+            reverse('posts:add_comment', args=['author', post.id]),
+            {'text': 'Комментарий'})
+        self.client.get(reverse('posts:profile_follow', args=['author']))
+        self.client.get(reverse('posts:profile_follow', args=['author']))
+        self.client.get(reverse('posts:profile_unfollow', args=['author']))
+        self.client.get(reverse('posts:profile_unfollow', args=['author']))
+        self.assertEqual(self.events(), [
+            ('post', 'create'), ('post', 'update'), ('comment', 'create'),
+            ('follow', 'create'), ('follow', 'delete'),
+        ])
+        self.assertEqual(read_batch()[-1].data,
+                         {'user': self.user.id, 'author': self.author.id})
+
+    def test_batch_follow_logs_only_changes(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('posts:profile_follow', args=['author']))
+        self.client.post(
+            reverse('posts:follow_batch'), {'follow': ['author', 'reader']},
+            content_type='application/json')
+        self.client.post(
+            reverse('posts:follow_batch'), {'unfollow': ['author']},
+            content_type='application/json')
+        self.assertEqual(self.events(), [
+            ('follow', 'create'), ('follow', 'delete')])
+
+    def test_consumer_catches_up_in_batches(self):
+        for number in range(5):
+            self.client.post(reverse('posts:new_post'),
+                             {'text': f'Пост {number}'})
+        seen = []
+        processed = consume(
+            'test', lambda events: seen.append(len(events)),
+            batch_size=2, max_batches=2)
+        self.assertEqual((processed, seen), (4, [2, 2]))
+        self.assertEqual(get_checkpoint('test'), read_batch()[3].seq)
+        self.assertEqual(consume('test', seen.append), 1)
+        self.assertEqual(consume('test', seen.append), 0)
+
+    def test_failed_handler_keeps_checkpoint(self):
+        self.client.post(reverse('posts:new_post'), {'text': 'Пост'})
+
+        def fail(events):
+            raise RuntimeError
+
+        with self.assertRaises(RuntimeError):
+            consume('test', fail)
+        self.assertEqual(get_checkpoint('test'), 0)
+        self.assertEqual(ChangeEvent.objects.count(), 1)
@@ -0,0 +1,81 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..dedup import find_duplicate, signature, similarity
+from ..models import Comment, Post, TextBand, TextFingerprint
+
+User = get_user_model()
+
+SPAM = ('Лучшие кредиты без справок и поручителей, одобрение за пять '
+        'минут, пишите нам прямо сейчас в личные сообщения')
+SPAM_VARIANT = ('ЛУЧШИЕ кредиты без справок и поручителей!!! одобрение '
+                'за 5 минут, пишите нам прямо сейчас в личные сообщения')
+OTHER = ('Сегодня гуляли по набережной и смотрели, как ледоход медленно '
+         'уносит льдины к заливу, было очень красиво')
+
+
+@override_settings(POST_SHARDS=('default',))
+class DedupTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="spammer")
+
+    def setUp(self):
+        caches['ratelimit'].clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_signature_similarity(self):
+        self.assertGreater(similarity(signature(SPAM),
+                                      signature(SPAM_VARIANT)), 0.6)
+        self.assertLess(similarity(signature(SPAM), signature(OTHER)), 0.2)
+        self.assertIsNone(signature('Спасибо!'))
+
+    def test_new_post_is_flagged(self):
+        self.client.post(reverse('posts:new_post'), {'text': SPAM})
+        self.client.post(reverse('posts:new_post'), {'text': SPAM})
+        self.client.post(reverse('posts:new_post'), {'text': OTHER})
+        first, second, other = Post.objects.order_by('id')
+        flags = dict(TextFingerprint.objects.values_list(
+            'object_id', 'duplicate_of'))
+        self.assertEqual(flags, {first.id: None, second.id: first.id,
+                                 other.id: None})
+
+    def test_edit_does_not_match_itself(self):
+        self.client.post(reverse('posts:new_post'), {'text': SPAM})
+        post = Post.objects.get()
+        self.client.post(reverse('posts:post_edit', args=['spammer', post.id]),
+                         {'text': SPAM_VARIANT})
+        fingerprint = TextFingerprint.objects.get()
+        self.assertIsNone(fingerprint.duplicate_of)
+        self.assertEqual(TextBand.objects.count(), 16)
+
+    @override_settings(DEDUP_ACTION='reject', DEDUP_THRESHOLD=0.5)
+    def test_reject_mode(self):
+        post = Post.objects.create(text='Пост', author=self.user)
+        url = reverse('posts:add_comment', args=['spammer', post.id])
+        self.client.post(url, {'text': SPAM})
+        self.client.post(url, {'text': SPAM_VARIANT})
+        self.assertEqual(Comment.objects.count(), 1)
+        self.client.post(reverse('posts:new_post'), {'text': SPAM})
+        response = self.client.post(reverse('posts:new_post'),
+                                    {'text': SPAM_VARIANT})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].errors)
+
+    @override_settings(DEDUP_THRESHOLD=0.6)
+    def test_build_index(self):
+        for text in (SPAM, OTHER, SPAM, 'Коротко'):
+            Post.objects.create(text=text, author=self.user)
+        out = StringIO()
+        call_command('build_dedup_index', chunk_size=2, stdout=out)
+        self.assertIn('post: проиндексировано 3, повторов 1', out.getvalue())
+        spam = Post.objects.filter(text=SPAM).order_by('id')
+        self.assertEqual(find_duplicate(TextFingerprint.POST, SPAM_VARIANT),
+                         spam[0].id)
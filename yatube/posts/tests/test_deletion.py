@@ -0,0 +1,189 @@
+import datetime as dt
+import logging
+import os
+import time
+import unittest
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+
+from ..deletion import (HIDDEN_KEY, _run_batch, deletion_steps,
+                        request_deletion, run_deletion)
+from ..models import (ChangeEvent, Comment, Deletion, Follow, Group,
+                      Notification, Post)
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+
+@override_settings(POST_SHARDS=('default',))
+class DeletionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.group = Group.objects.create(title='Группа', slug='group',
+                                          description='')
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.posts = [Post.objects.create(text=f'Пост {number}',
+                                          author=self.author,
+                                          group=self.group)
+                      for number in range(3)]
+        self.other_post = Post.objects.create(text='Чужой пост',
+                                              author=self.reader)
+        for post in self.posts:
+            for number in range(2):
+                Comment.objects.create(post=post, author=self.reader,
+                                       text=f'Комментарий {number}')
+        Comment.objects.create(post=self.other_post, author=self.author,
+                               text='Комментарий автора')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Notification.objects.create(recipient=self.author,
+                                    verb=Notification.COMMENT,
+                                    actor=self.reader, post=self.posts[0],
+                                    created=dt.datetime.now())
+        Notification.objects.create(recipient=self.reader,
+                                    verb=Notification.FOLLOW,
+                                    actor=self.author,
+                                    created=dt.datetime.now())
+        self.client = Client()
+
+    def tearDown(self):
+        cache.delete(HIDDEN_KEY)
+
+    def test_tombstoned_post_is_hidden(self):
+        post = self.posts[0]
+        request_deletion(Deletion.POST, post.id)
+        response = self.client.get(
+            reverse('posts:group_posts', args=[self.group.slug]))
+        self.assertNotIn(post, response.context['page'])
+        self.assertEqual(len(response.context['page']), 2)
+        response = self.client.get(
+            reverse('posts:post_view', args=['author', post.id]))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse('posts:profile',
+                                           args=['author']))
+        self.assertNotIn(post, response.context['page'])
+        self.assertEqual(len(response.context['page']), 2)
+
+    def test_admin_deletes_in_background(self):
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@mail.com', password='Pass12345')
+        self.client.force_login(admin)
+        post = self.posts[0]
+        for model, object_id, kind in ((Post, post.id, Deletion.POST),
+                                       (User, self.reader.id, Deletion.USER)):
+            info = model._meta.app_label, model._meta.model_name
+            url = reverse('admin:%s_%s_changelist' % info)
+            choices = self.client.get(url).context['action_form'].fields[
+                'action'].choices
+            actions = [name for name, _ in choices]
+            self.assertIn('delete_in_background', actions)
+            self.assertNotIn('delete_selected', actions)
+            self.client.post(
+                reverse('admin:%s_%s_delete' % info, args=[object_id]),
+                {'post': 'yes'})
+            self.assertTrue(model.objects.filter(id=object_id).exists())
+            self.assertTrue(Deletion.objects.filter(
+                kind=kind, object_id=object_id,
+                finished__isnull=True).exists())
+
+    def test_tombstoned_user_is_hidden_and_inactive(self):
+        request_deletion(Deletion.USER, self.author.id)
+        self.author.refresh_from_db()
+        self.assertFalse(self.author.is_active)
+        response = self.client.get(reverse('posts:profile',
+                                           args=['author']))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(
+            reverse('posts:group_posts', args=[self.group.slug]))
+        self.assertEqual(len(response.context['page']), 0)
+
+    def test_user_deletion_in_batches(self):
+        deletion = request_deletion(Deletion.USER, self.author.id)
+        self.assertEqual(run_deletion(deletion, batch_size=2,
+                                      max_batches=2), 2)
+        self.assertIsNone(deletion.finished)
+        self.assertEqual(deletion.deleted_rows, 3)
+        self.assertEqual(deletion.stage, 'post_comments')
+        self.assertEqual(deletion.total_rows, 15)
+
+        run_deletion(deletion, batch_size=2)
+        self.assertIsNotNone(deletion.finished)
+        self.assertEqual(deletion.progress, 1.0)
+        self.assertFalse(User.objects.filter(id=self.author.id).exists())
+        self.assertEqual(list(Post.objects.all()), [self.other_post])
+        self.assertEqual(Comment.objects.count(), 0)
+        self.assertEqual(Follow.objects.count(), 0)
+        self.assertEqual(Notification.objects.count(), 0)
+        events = ChangeEvent.objects.filter(action=ChangeEvent.DELETE)
+        self.assertEqual(events.filter(kind=ChangeEvent.POST).count(), 3)
+        self.assertEqual(events.filter(kind=ChangeEvent.COMMENT).count(), 7)
+        self.assertEqual(events.filter(kind=ChangeEvent.FOLLOW).count(), 1)
+
+    def test_post_deletion_keeps_notifications(self):
+        post = self.posts[0]
+        call_command('process_deletions', post=[post.id], batch_size=1,
+                     stdout=StringIO())
+        self.assertFalse(Post.objects.filter(id=post.id).exists())
+        self.assertEqual(Comment.objects.count(), 5)
+        self.assertEqual(Notification.objects.filter(
+            verb=Notification.COMMENT, post__isnull=True).count(), 1)
+        deletion = Deletion.objects.get()
+        self.assertIsNotNone(deletion.finished)
+        response = self.client.get(
+            reverse('posts:group_posts', args=[self.group.slug]))
+        self.assertEqual(len(response.context['page']), 2)
+
+    def test_command_reports_progress(self):
+        out = StringIO()
+        call_command('process_deletions', user=['author'], batch_size=1,
+                     max_batches=3, stdout=out)
+        self.assertIn('Завершено удалений: 0', out.getvalue())
+        self.assertIn('удалено 3 из 15', out.getvalue())
+
+
+@unittest.skipUnless(os.environ.get('SCALE_TESTS'),
+                     'SCALE_TESTS=1 для теста на миллионе строк')
+class MillionRowDeletionTests(TransactionTestCase):
+    # без внешней транзакции TestCase каждая пачка — настоящий коммит
+    ROWS = 1_000_000
+    BATCH_SIZE = 5000
+
+    def tearDown(self):
+        cache.delete(HIDDEN_KEY)
+
+    def test_million_comments_in_short_transactions(self):
+        author = User.objects.create_user(username='viral')
+        post = Post.objects.create(text='Популярный пост', author=author)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(
+                'INSERT INTO posts_comment (post_id, author_id, text, '
+                'created) VALUES (%s, %s, %s, CURRENT_TIMESTAMP)',
+                ((post.id, author.id, 'Комментарий')
+                 for _ in range(self.ROWS)))
+        deletion = request_deletion(Deletion.POST, post.id)
+        name, queryset, update = deletion_steps(deletion)[0]
+        slowest = 0
+        started = time.perf_counter()
+        while True:
+            self.assertFalse(connection.in_atomic_block)
+            batch_started = time.perf_counter()
+            if not _run_batch(deletion, name, queryset, update,
+                              self.BATCH_SIZE):
+                break
+            slowest = max(slowest, time.perf_counter() - batch_started)
+        total = time.perf_counter() - started
+        run_deletion(deletion)
+        deletion.refresh_from_db()
+        self.assertEqual(Comment.objects.count(), 0)
+        self.assertEqual(deletion.deleted_rows, self.ROWS + 1)
+        report = (f'{self.ROWS} строк: {total:.1f} с, '
+                  f'самая долгая транзакция {slowest * 1000:.0f} мс')
+        logger.info(report)
+        self.assertLess(slowest, 1, report)
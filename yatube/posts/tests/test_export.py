@@ -0,0 +1,70 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Follow, Post
+
+User = get_user_model()
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(dir=settings.BASE_DIR))
+@override_settings(POST_SHARDS=('default',))
+class ExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="name")
+        cls.author = User.objects.create_user(username="author")
+        cls.post = Post.objects.create(
+            text='Тестовый текст', author=cls.user,
+            image=SimpleUploadedFile('small.gif', b'GIF89a', 'image/gif'))
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.user) for i in range(30))
+        Comment.objects.create(post=cls.post, author=cls.user, text='Ого')
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def check_archive(self, content):
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            posts = [json.loads(line) for line in
+                     archive.read('posts.ndjson').splitlines()]
+            self.assertEqual(len(posts), 31)
+            self.assertEqual(posts[0]['text'], 'Тестовый текст')
+            comments = archive.read('comments.ndjson').splitlines()
+            self.assertEqual(json.loads(comments[0])['text'], 'Ого')
+            self.assertEqual(
+                json.loads(archive.read('follows.ndjson')),
+                {'author': 'author'})
+            self.assertEqual(
+                archive.read(f'images/{self.post.image.name}'), b'GIF89a')
+
+    def test_export_view_streams_zip(self):
+        """Выгрузка отдаётся потоком и содержит все данные."""
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(reverse('posts:export_data'))
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        self.check_archive(b''.join(response.streaming_content))
+
+    def test_export_command(self):
+        """Команда пишет тот же архив в файл."""
+        path = os.path.join(settings.MEDIA_ROOT, 'export.zip')
+        call_command('export_user_data', 'name', path, stdout=StringIO())
+        with open(path, 'rb') as f:
+            self.check_archive(f.read())
@@ -0,0 +1,85 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TransactionTestCase
+from django.urls import reverse
+
+from ..follow_graph import follow_graph
+from ..models import Follow
+
+User = get_user_model()
+
+
+class FollowBatchTests(TransactionTestCase):
+    # граф меняется только после коммита подписки
+    def setUp(self):
+        self.user = User.objects.create_user(username="name")
+        self.authors = [User.objects.create_user(username=f"author{i}")
+                        for i in range(3)]
+        follow_graph.load()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def post_batch(self, data):
+        return self.authorized_client.post(
+            reverse('posts:follow_batch'), json.dumps(data),
+            content_type='application/json')
+
+    def test_batch_follow_and_unfollow(self):
+        """Пакетная подписка и отписка одним запросом."""
+        response = self.post_batch(
+            {'follow': ['author0', 'author1', 'name', 'nobody']})
+        self.assertEqual(response.json(), {
+            'followed': ['author0', 'author1'],
+            'unfollowed': [],
+            'unknown': ['nobody'],
+        })
+        self.assertEqual(Follow.objects.filter(user=self.user).count(), 2)
+        self.assertTrue(follow_graph.is_following(
+            self.user.id, self.authors[0].id))
+
+        self.post_batch({'follow': ['author1', 'author2'],
+                         'unfollow': ['author0']})
+        self.assertEqual(
+            set(Follow.objects.filter(user=self.user).values_list(
+                'author__username', flat=True)),
+            {'author1', 'author2'})
+        self.assertFalse(follow_graph.is_following(
+            self.user.id, self.authors[0].id))
+
+    def test_batch_rejects_bad_requests(self):
+        """GET, кривой JSON и гость не проходят."""
+        url = reverse('posts:follow_batch')
+        self.assertEqual(self.authorized_client.get(url).status_code, 405)
+        response = self.authorized_client.post(
+            url, 'not json', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = Client().post(url, '{}', content_type='application/json')
+        self.assertEqual(response.status_code, 302)
+
+    def test_import_command(self):
+        """Команда импортирует пары из CSV и список авторов из JSON."""
+        directory = tempfile.mkdtemp()
+        csv_path = os.path.join(directory, 'follows.csv')
+        with open(csv_path, 'w') as f:
+            f.write('user,author\nname,author0\nauthor0,author1\n'
+                    'name,ghost\nname,author0\n')
+        json_path = os.path.join(directory, 'follows.json')
+        with open(json_path, 'w') as f:
+            json.dump(['author2', 'ghost'], f)
+
+        call_command('import_follows', csv_path, stdout=StringIO())
+        call_command('import_follows', json_path, user='author1',
+                     stdout=StringIO())
+        self.assertEqual(
+            set(Follow.objects.values_list(
+                'user__username', 'author__username')),
+            {('name', 'author0'), ('author0', 'author1'),
+             ('author1', 'author2')})
+        os.remove(csv_path)
+        os.remove(json_path)
+        os.rmdir(directory)
@@ -0,0 +1,152 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+
+from ..changelog import record_follows
+from ..follow_graph import FollowGraph, follow_graph, get_follow_graph
+from ..models import ChangeEvent, Follow, Post
+
+User = get_user_model()
+
+
+class FollowGraphTests(TestCase):
+    def test_membership_and_degrees(self):
+        """Проверка подписки и счётчики по отсортированным массивам."""
+        graph = FollowGraph()
+        graph.load([(1, 3), (1, 2), (2, 3)])
+        self.assertEqual(list(graph.following(1)), [2, 3])
+        self.assertTrue(graph.is_following(1, 3))
+        self.assertFalse(graph.is_following(3, 1))
+        self.assertEqual(graph.followers_count(3), 2)
+        self.assertEqual(graph.following_count(4), 0)
+
+    def test_add_and_remove_keep_order(self):
+        """Добавление и удаление сохраняют порядок и не дублируют."""
+        graph = FollowGraph()
+        graph.load([])
+        for author_id in (5, 1, 3, 3):
+            graph.add(7, author_id)
+        self.assertEqual(list(graph.following(7)), [1, 3, 5])
+        graph.remove(7, 3)
+        graph.remove(7, 4)
+        self.assertEqual(list(graph.following(7)), [1, 5])
+        self.assertEqual(list(graph.followers(3)), [])
+
+    def test_changes_during_load_survive_swap(self):
+        """Подписка, пришедшая во время загрузки, есть в новом графе."""
+        graph = FollowGraph()
+        graph.load([(1, 2)])
+
+        def pairs():
+            yield 1, 2
+            graph.add(5, 6)
+            graph.remove(1, 2)
+
+        graph.load(pairs())
+        self.assertTrue(graph.is_following(5, 6))
+        self.assertFalse(graph.is_following(1, 2))
+
+    def test_refresh_runs_in_thread(self):
+        graph = FollowGraph()
+        with mock.patch.object(graph, 'load') as load:
+            graph.refresh_in_background().join()
+        load.assert_called_once_with()
+        # блокировка отпущена — следующее обновление снова возможно
+        self.assertTrue(graph._refreshing.acquire(blocking=False))
+
+    def test_catch_up_applies_logged_follows(self):
+        """Подписки другого процесса приходят из журнала, без перечитывания."""
+        user = User.objects.create_user(username="name")
+        author = User.objects.create_user(username="author")
+        graph = FollowGraph()
+        graph.load()
+        # так подписку видит чужой процесс: строка и событие в журнале
+        Follow.objects.create(user=user, author=author)
+        record_follows([(user.id, author.id)], ChangeEvent.CREATE)
+        with mock.patch.object(graph, 'load') as load:
+            with self.assertNumQueries(1):
+                self.assertTrue(graph.catch_up())
+            self.assertTrue(graph.is_following(user.id, author.id))
+            record_follows([(user.id, author.id)], ChangeEvent.DELETE)
+            graph.catch_up()
+        load.assert_not_called()
+        self.assertFalse(graph.is_following(user.id, author.id))
+        self.assertEqual(graph.last_seq, ChangeEvent.objects.last().seq)
+        # журнал прочитан — повтор ничего не делает
+        self.assertTrue(graph.catch_up())
+        self.assertFalse(graph.is_following(user.id, author.id))
+
+    def test_gap_in_log_reloads_graph(self):
+        """Без позиции в журнале или при большом отставании — перезагрузка."""
+        graph = FollowGraph()
+        graph.load([(1, 2)])
+        self.assertFalse(graph.catch_up())
+        graph.load()
+        record_follows([(1, 2), (1, 3)], ChangeEvent.CREATE)
+        with self.settings(FOLLOW_GRAPH_CATCH_UP_LIMIT=1):
+            self.assertFalse(graph.catch_up())
+        self.assertTrue(graph.catch_up(limit=2))
+        self.assertEqual(list(graph.following(1)), [2, 3])
+
+    def test_refresh_reloads_only_after_gap(self):
+        graph = FollowGraph()
+        for caught_up, loads in ((True, 0), (False, 1)):
+            with mock.patch.object(graph, 'catch_up',
+                                   return_value=caught_up), \
+                    mock.patch.object(graph, 'load') as load:
+                graph.refresh_in_background().join()
+            self.assertEqual(load.call_count, loads)
+
+    @override_settings(FOLLOW_GRAPH_SYNC_INTERVAL=-1)
+    def test_stale_graph_is_not_reloaded_in_request(self):
+        follow_graph.load([])
+        with mock.patch.object(follow_graph, 'refresh_in_background') as bg:
+            with self.assertNumQueries(0):
+                self.assertIs(get_follow_graph(), follow_graph)
+        bg.assert_called_once_with()
+
+
+class FollowGraphSignalsTests(TransactionTestCase):
+    # граф меняется только после коммита подписки
+    def setUp(self):
+        self.user = User.objects.create_user(username="name")
+        self.author = User.objects.create_user(username="author")
+        Post.objects.create(text='Тестовый текст', author=self.author)
+        follow_graph.load()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_signals_update_graph(self):
+        """Подписка и отписка сразу видны в графе."""
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        self.assertTrue(follow_graph.is_following(
+            self.user.id, self.author.id))
+        follow.delete()
+        self.assertFalse(follow_graph.is_following(
+            self.user.id, self.author.id))
+
+    def test_rolled_back_follow_is_not_in_graph(self):
+        with transaction.atomic():
+            Follow.objects.create(user=self.user, author=self.author)
+            transaction.set_rollback(True)
+        self.assertFalse(follow_graph.is_following(
+            self.user.id, self.author.id))
+
+    def test_views_use_graph(self):
+        """Профиль и лента подписок читают подписки из графа."""
+        self.authorized_client.get(
+            reverse('posts:profile_follow', args=[self.author.username]))
+        response = self.authorized_client.get(
+            reverse('posts:profile', args=[self.author.username]))
+        self.assertTrue(response.context['following'])
+        self.assertEqual(response.context['followers_count'], 1)
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(len(response.context['page']), 1)
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow', args=[self.author.username]))
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(len(response.context['page']), 0)
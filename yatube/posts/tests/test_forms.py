@@ -1,4 +1,5 @@
 import datetime as dt
+import hashlib
 import shutil
 import tempfile
 
@@ -15,6 +16,7 @@ User = get_user_model()
 
 
 @override_settings(MEDIA_ROOT=tempfile.mkdtemp(dir=settings.BASE_DIR))
+@override_settings(POST_SHARDS=('default',))
 class PostFormTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -68,11 +70,12 @@ class PostFormTests(TestCase):
         )
         self.assertRedirects(response, reverse('posts:index'))
         self.assertEqual(Post.objects.count(), posts_count + 1)
+        digest = hashlib.sha256(small_png).hexdigest()
         self.assertTrue(
             Post.objects.filter(
                 text='Тестовый текст2',
                 group=self.group.id,
-                image='posts/small.png'
+                image=f'posts/{digest[:2]}/{digest[2:4]}/{digest}.png'
             ).exists()
         )
 
@@ -101,6 +104,7 @@ class PostFormTests(TestCase):
         )
 
 
+@override_settings(POST_SHARDS=('default',))
 class SubscriptionsFormTest(TestCase):
     @classmethod
     def setUpClass(cls):
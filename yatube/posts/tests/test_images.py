@@ -0,0 +1,102 @@
+import io
+import shutil
+import tempfile
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from ..forms import PostForm
+from ..images import image_preview
+from ..models import Post
+
+User = get_user_model()
+
+
+def png(width, height, color='red'):
+    buffer = io.BytesIO()
+    image = Image.new('RGB', (width, height), color)
+    # полоса другого цвета не должна стать преобладающим цветом
+    image.paste('blue', (0, 0, width // 4, height))
+    image.save(buffer, 'PNG')
+    return SimpleUploadedFile('picture.png', buffer.getvalue(), 'image/png')
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(dir=settings.BASE_DIR))
+@override_settings(POST_SHARDS=('default',))
+class ImagePreviewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="author")
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        caches['ratelimit'].clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_preview(self):
+        preview = image_preview(png(120, 40))
+        self.assertEqual((preview['image_width'], preview['image_height']),
+                         (120, 40))
+        self.assertEqual(preview['image_color'], '#ff0000')
+        self.assertTrue(preview['image_placeholder'].startswith(
+            'data:image/png;base64,'))
+        self.assertLess(len(preview['image_placeholder']), 400)
+
+    def test_form_stores_preview(self):
+        """Превью считается при сохранении формы с картинкой."""
+        form = PostForm(data={'text': 'С картинкой'},
+                        files={'image': png(64, 48)})
+        self.assertTrue(form.is_valid())
+        form.instance.author = self.user
+        post = form.save()
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (64, 48))
+        self.assertEqual(post.image_color, '#ff0000')
+
+        form = PostForm(data={'text': 'Без картинки', 'image-clear': 'on'},
+                        instance=post)
+        self.assertTrue(form.is_valid())
+        post = form.save()
+        self.assertIsNone(post.image_width)
+        self.assertEqual(post.image_placeholder, '')
+
+    def test_feed_emits_lazy_image_with_sizes(self):
+        self.client.post(reverse('posts:new_post'),
+                         {'text': 'Пост с картинкой', 'image': png(64, 48)})
+        post = Post.objects.get(text='Пост с картинкой')
+        # размеры берутся из сохранённых полей, а не из миниатюры
+        thumbnail = SimpleNamespace(url='/media/cache/x.jpg')
+        with mock.patch('sorl.thumbnail.templatetags.thumbnail.get_thumbnail',
+                        return_value=thumbnail):
+            response = self.client.get(
+                reverse('posts:profile', args=[self.user.username]))
+        self.assertContains(response, 'loading="lazy"')
+        self.assertContains(response, 'width="960" height="339"')
+        self.assertContains(response, post.image_placeholder)
+
+    def test_backfill_command(self):
+        post = Post.objects.create(text='Старый', author=self.user,
+                                   image=png(30, 20))
+        broken = Post.objects.create(text='Битый', author=self.user)
+        Post.objects.filter(id=broken.id).update(image='posts/missing.png')
+        out = StringIO()
+        call_command('backfill_image_previews', workers=1, stdout=out)
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (30, 20))
+        self.assertEqual(post.image_color, '#ff0000')
+        self.assertIn('обновлено 1, не прочитано 1', out.getvalue())
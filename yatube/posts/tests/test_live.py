@@ -0,0 +1,110 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..follow_graph import follow_graph
+from ..live import ChangeFeed, Cursor, change_feed
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(LIVE_ENABLED=True, LIVE_POLL_INTERVAL=0, LIVE_HEARTBEAT=0,
+                   LIVE_MAX_AGE=0.05)
+class LiveUpdatesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="reader")
+        cls.author = User.objects.create_user(username="author")
+        cls.group = Group.objects.create(title="Группа", slug="group")
+        cls.post = Post.objects.create(text="Текст", author=cls.author)
+
+    def setUp(self):
+        follow_graph.load()
+        change_feed.reset()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def read_stream(self, query, last_event_id=None):
+        headers = {}
+        if last_event_id is not None:
+            headers['HTTP_LAST_EVENT_ID'] = last_event_id
+        response = self.client.get(reverse('posts:live'), query, **headers)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join(response.streaming_content).decode()
+        response.close()
+        return body
+
+    def test_feed_polls_new_rows_once(self):
+        feed = ChangeFeed()
+        self.assertEqual(feed.poll(), [])
+        cursor = feed.current()
+        new_post = Post.objects.create(text="Новый", author=self.author)
+        Comment.objects.create(post=self.post, author=self.user, text="К")
+        events = feed.wait(cursor, 0)
+        self.assertEqual([event['type'] for event in events],
+                         ['post', 'comment'])
+        self.assertEqual(events[0]['id'], new_post.id)
+        self.assertEqual(feed.poll(), [])
+
+    def test_stream_reports_events_since_last_id(self):
+        cursor = change_feed.current()
+        Post.objects.create(text="Новый", author=self.author)
+        Post.objects.create(text="Ещё", author=self.author)
+        body = self.read_stream({'stream': 'index'}, str(cursor))
+        self.assertIn('event: post\ndata: {"count": 2}', body)
+        self.assertIn(': ping', body)
+
+    def test_streams_filter_events(self):
+        cursor = change_feed.current()
+        Post.objects.create(text="В группе", author=self.author,
+                            group=self.group)
+        Comment.objects.create(post=self.post, author=self.user, text="К")
+        self.assertNotIn('event: post', self.read_stream(
+            {'stream': 'follow'}, str(cursor)))
+        Follow.objects.create(user=self.user, author=self.author)
+        # в TestCase коммита нет — граф перечитывается явно
+        follow_graph.load()
+        self.assertIn('event: post', self.read_stream(
+            {'stream': 'follow'}, str(cursor)))
+        self.assertIn('event: post', self.read_stream(
+            {'stream': 'group', 'group': self.group.id}, str(cursor)))
+        body = self.read_stream(
+            {'stream': 'post', 'post': self.post.id}, str(cursor))
+        self.assertIn('event: comment', body)
+        self.assertNotIn('event: post', body)
+
+    def test_bad_last_event_id_starts_from_head(self):
+        Post.objects.create(text="Старый", author=self.author)
+        self.assertNotIn('event: post', self.read_stream(
+            {'stream': 'index'}, 'garbage'))
+
+    @override_settings(LIVE_MAX_CONNECTIONS_PER_USER=1)
+    def test_connection_limit(self):
+        first = self.client.get(reverse('posts:live'))
+        second = self.client.get(reverse('posts:live'))
+        self.assertEqual(second.status_code, 503)
+        first.close()
+        third = self.client.get(reverse('posts:live'))
+        self.assertEqual(third.status_code, 200)
+        third.close()
+
+    def test_anonymous_follow_stream_forbidden(self):
+        response = Client().get(reverse('posts:live'), {'stream': 'follow'})
+        self.assertEqual(response.status_code, 403)
+
+    def test_disabled_by_default(self):
+        with self.settings(LIVE_ENABLED=False):
+            response = self.client.get(reverse('posts:live'))
+            self.assertEqual(response.status_code, 204)
+            page = self.client.get(reverse('posts:index'))
+            self.assertNotContains(page, 'EventSource')
+        self.assertContains(self.client.get(reverse('posts:index')),
+                            'EventSource')
+
+    @override_settings(POST_SHARDS=('default',))
+    def test_cursor_parse(self):
+        self.assertEqual(str(Cursor.parse('3:7')), '3:7')
+        self.assertIsNone(Cursor.parse('3'))
+        self.assertIsNone(Cursor.parse(None))
@@ -0,0 +1,92 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from ..media import shard_images
+from ..models import Post
+
+User = get_user_model()
+GIF = b'GIF89a'
+DIGEST = hashlib.sha256(GIF).hexdigest()
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(dir=settings.BASE_DIR))
+@override_settings(POST_SHARDS=('default',))
+class ShardedMediaTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="author")
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+
+    def legacy_file(self, filename, content):
+        # так файлы лежали до раскладки по каталогам
+        path = os.path.join(settings.MEDIA_ROOT, 'posts', filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(content)
+
+    def legacy_post(self, filename, content=GIF):
+        self.legacy_file(filename, content)
+        post = Post.objects.create(text='Старый', author=self.user)
+        Post.objects.filter(id=post.id).update(image=f'posts/{filename}')
+        return post
+
+    def test_upload_goes_to_hash_directory(self):
+        post = Post.objects.create(
+            text='Текст', author=self.user,
+            image=SimpleUploadedFile('Small.GIF', GIF, 'image/gif'))
+        self.assertEqual(post.image.name,
+                         f'posts/{DIGEST[:2]}/{DIGEST[2:4]}/{DIGEST}.gif')
+        self.assertEqual(post.image.read(), GIF)
+
+    def test_other_directories_are_not_sharded(self):
+        name = default_storage.save('cache/ab/thumb.jpg', ContentFile(GIF))
+        self.assertEqual(name, 'cache/ab/thumb.jpg')
+
+    def test_command_moves_files_and_sweeps_leftovers(self):
+        post = self.legacy_post('one.gif')
+        other = self.legacy_post('two.png', b'PNG')
+        self.legacy_file('orphan.gif', b'x')
+        out = StringIO()
+        call_command('shard_media', chunk_size=1, stdout=out)
+        post.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(post.image.name,
+                         f'posts/{DIGEST[:2]}/{DIGEST[2:4]}/{DIGEST}.gif')
+        self.assertEqual(other.image.read(), b'PNG')
+        self.assertEqual(default_storage.listdir('posts')[1], [])
+        self.assertIn('перенесено 2', out.getvalue())
+        self.assertIn('без ссылок: 1', out.getvalue())
+
+    def test_interrupted_run_resumes(self):
+        post = self.legacy_post('one.gif')
+        with mock.patch('posts.media.default_storage.delete',
+                        side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                shard_images(Post)
+        post.refresh_from_db()
+        self.assertTrue(post.image.name.startswith(f'posts/{DIGEST[:2]}/'))
+        self.assertTrue(default_storage.exists('posts/one.gif'))
+        self.assertEqual(shard_images(Post), (0, 0))
+        call_command('shard_media', stdout=StringIO())
+        self.assertFalse(default_storage.exists('posts/one.gif'))
+        self.assertEqual(post.image.read(), GIF)
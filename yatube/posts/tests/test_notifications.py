@@ -0,0 +1,107 @@
+import datetime as dt
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..follow_graph import follow_graph
+from ..models import Notification, NotificationCounter, Post
+from ..notifications import notify, notify_many, send_digests, unread_count
+
+User = get_user_model()
+
+
+class NotificationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username="author", email="author@example.com")
+        cls.readers = [User.objects.create_user(username=f"reader{i}")
+                       for i in range(3)]
+        cls.post = Post.objects.create(text="Текст", author=cls.author)
+
+    def setUp(self):
+        follow_graph.load()
+        self.client = Client()
+        self.client.force_login(self.readers[0])
+
+    def test_comments_burst_is_one_row(self):
+        """Серия комментариев к посту — одно уведомление с count."""
+        for reader in self.readers:
+            self.client.force_login(reader)
+            self.client.post(
+                reverse('posts:add_comment',
+                        args=[self.author.username, self.post.id]),
+                {'text': 'Комментарий'})
+        notification = Notification.objects.get(recipient=self.author)
+        self.assertEqual(notification.count, 3)
+        self.assertEqual(notification.actor, self.readers[-1])
+        self.assertEqual(unread_count(self.author), 1)
+
+    def test_old_notification_is_not_merged(self):
+        notify(self.author.id, Notification.COMMENT,
+               self.readers[0].id, self.post.id)
+        Notification.objects.update(
+            created=dt.datetime.now() - dt.timedelta(days=1))
+        notify(self.author.id, Notification.COMMENT,
+               self.readers[1].id, self.post.id)
+        self.assertEqual(Notification.objects.count(), 2)
+        self.assertEqual(unread_count(self.author), 2)
+
+    def test_self_comment_is_silent(self):
+        notify(self.author.id, Notification.COMMENT,
+               self.author.id, self.post.id)
+        self.assertFalse(Notification.objects.exists())
+
+    def test_follow_notifies_once(self):
+        url = reverse('posts:profile_follow', args=[self.author.username])
+        self.client.get(url)
+        self.client.get(url)
+        self.assertEqual(Notification.objects.filter(
+            recipient=self.author, verb=Notification.FOLLOW).count(), 1)
+
+    def test_batch_follow_notifies_new_authors(self):
+        self.client.post(
+            reverse('posts:follow_batch'),
+            {'follow': ['author', 'reader1', 'reader0']},
+            content_type='application/json')
+        self.assertEqual(
+            set(Notification.objects.values_list('recipient', flat=True)),
+            {self.author.id, self.readers[1].id})
+        self.assertEqual(NotificationCounter.objects.get(
+            user=self.readers[1]).unread, 1)
+
+    def test_batch_notification_merges_with_unread(self):
+        """Пакетная подписка сливается с недавним уведомлением."""
+        notify(self.author.id, Notification.FOLLOW, self.readers[1].id)
+        notify_many({self.author.id, self.readers[2].id},
+                    Notification.FOLLOW, self.readers[0].id)
+        row = Notification.objects.get(recipient=self.author)
+        self.assertEqual(row.count, 2)
+        self.assertEqual(row.actor, self.readers[0])
+        self.assertEqual(NotificationCounter.objects.get(
+            user=self.author).unread, 1)
+        self.assertTrue(Notification.objects.filter(
+            recipient=self.readers[2]).exists())
+
+    def test_page_marks_read(self):
+        notify(self.readers[0].id, Notification.FOLLOW, self.author.id)
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.context['unread_notifications'], 1)
+        response = self.client.get(reverse('posts:notifications'))
+        self.assertEqual(len(response.context['page']), 1)
+        self.assertEqual(unread_count(self.readers[0]), 0)
+
+    def test_digest_groups_by_recipient(self):
+        for reader in self.readers:
+            notify(self.author.id, Notification.FOLLOW, reader.id)
+        notify(self.author.id, Notification.COMMENT,
+               self.readers[0].id, self.post.id)
+        notify(self.readers[0].id, Notification.FOLLOW, self.author.id)
+        self.assertEqual(send_digests(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["author@example.com"])
+        self.assertIn("и ещё 2", mail.outbox[0].body)
+        self.assertEqual(send_digests(), 0)
@@ -0,0 +1,90 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Follow, Recommendation
+from ..recommendations import (FollowMatrix, build_recommendations,
+                               recommended_authors)
+
+User = get_user_model()
+
+
+class FollowMatrixTests(TestCase):
+    def test_csr_rows_and_two_hop_scores(self):
+        """Друзья друзей получают оценку, свои подписки исключаются."""
+        matrix = FollowMatrix([(1, 2), (1, 3), (2, 4), (3, 4), (3, 5),
+                               (2, 1)])
+        self.assertEqual(list(matrix.ids), [1, 2, 3, 4, 5])
+        self.assertEqual(list(matrix.row(0)), [1, 2])
+        self.assertEqual(matrix.in_degree[3], 2)
+        top = [matrix.ids[j] for j, _ in matrix.top_k(0, 10)]
+        self.assertEqual(top, [4, 5])
+
+    def test_fan_out_is_limited(self):
+        """Подписки хаба берутся выборкой, число рёбер ограничено."""
+        hub = [(2, author) for author in range(10, 20)]
+        matrix = FollowMatrix([(1, 2), (1, 3), (3, 30), (4, 2)] + hub)
+        scores = matrix.two_hop_scores(0, max_degree=2, max_edges=100)
+        self.assertEqual(
+            sorted(matrix.ids[j] for j in scores), [10, 15, 30])
+        # вклад выборки умножен на шаг: 5 / log2(2 + 2 подписчика)
+        self.assertAlmostEqual(scores[matrix.ids.index(10)], 2.5)
+        # у автора 3 меньше подписчиков — его рёбра просматриваются первыми
+        scores = matrix.two_hop_scores(0, max_degree=100, max_edges=4)
+        self.assertEqual(
+            sorted(matrix.ids[j] for j in scores), [10, 11, 12, 30])
+
+    def test_empty_graph(self):
+        """Пустой граф строится без ошибок."""
+        self.assertEqual(len(FollowMatrix([])), 0)
+
+
+class RecommendationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="name")
+        cls.friend = User.objects.create_user(username="friend")
+        cls.author = User.objects.create_user(username="author")
+        Follow.objects.create(user=cls.user, author=cls.friend)
+        Follow.objects.create(user=cls.friend, author=cls.author)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_build_stores_top_k(self):
+        """Команда сохраняет рекомендации для каждого пользователя."""
+        call_command('build_recommendations', stdout=StringIO())
+        self.assertEqual(
+            list(recommended_authors(self.user)), [self.author])
+
+    def test_rebuild_replaces_rows(self):
+        """Повторная сборка не дублирует и удаляет устаревшие строки."""
+        build_recommendations()
+        build_recommendations()
+        self.assertEqual(Recommendation.objects.count(), 1)
+        Follow.objects.all().delete()
+        build_recommendations()
+        self.assertFalse(Recommendation.objects.exists())
+
+    def test_followed_author_is_hidden(self):
+        """Автор, на которого уже подписались, не показывается."""
+        build_recommendations()
+        Follow.objects.create(user=self.user, author=self.author)
+        self.assertFalse(recommended_authors(self.user).exists())
+
+    def test_panel_in_profile_and_follow_index(self):
+        """Панель рекомендаций есть в профиле и ленте подписок."""
+        build_recommendations()
+        for url in (reverse('posts:follow_index'),
+                    reverse('posts:profile', args=[self.friend.username])):
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertEqual(
+                    list(response.context['recommended_authors']),
+                    [self.author])
+                self.assertContains(response, 'Рекомендуемые авторы')
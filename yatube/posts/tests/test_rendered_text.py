@@ -0,0 +1,86 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Post
+
+User = get_user_model()
+
+
+@override_settings(POST_EXCERPT_LENGTH=20)
+@override_settings(POST_SHARDS=('default',))
+class RenderedTextTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="author")
+
+    def setUp(self):
+        caches['ratelimit'].clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_rendered_on_save(self):
+        post = Post.objects.create(
+            text="Первая строка <b>\nвторая строка и ещё много слов",
+            author=self.user)
+        self.assertEqual(
+            post.html,
+            "Первая строка &lt;b&gt;<br>вторая строка и ещё много слов")
+        self.assertEqual(post.excerpt, "Первая строка &lt;b&gt;<br>в…")
+        self.assertTrue(post.is_truncated)
+        post.text = "Коротко"
+        post.save()
+        self.assertEqual((post.html, post.excerpt, post.is_truncated),
+                         ("Коротко", "Коротко", False))
+
+    def test_feed_shows_excerpt_and_post_shows_full_text(self):
+        self.client.post(reverse('posts:new_post'),
+                         {'text': 'Начало поста и длинное продолжение'})
+        post = Post.objects.get()
+        response = self.client.get(reverse('posts:profile', args=['author']))
+        self.assertContains(response, 'Начало поста и длин…')
+        self.assertNotContains(response, 'продолжение')
+        self.assertContains(response, 'Читать дальше')
+        response = self.client.get(
+            reverse('posts:post_view', args=['author', post.id]))
+        self.assertContains(response, 'длинное продолжение')
+
+    def test_feed_does_not_load_text(self):
+        Post.objects.create(text="Текст", author=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('posts:profile', args=['author']))
+        selects = [query['sql'] for query in queries
+                   if 'FROM "posts_post"' in query['sql']
+                   and '"posts_post"."excerpt"' in query['sql']]
+        self.assertTrue(selects)
+        self.assertTrue(all('"posts_post"."text"' not in sql
+                            for sql in selects))
+
+    def test_feed_without_excerpt_does_not_load_text(self):
+        """Пост без excerpt (до backfill) не дочитывает text по одному."""
+        for number in range(3):
+            Post.objects.create(text=f"Старый пост {number}", author=self.user)
+        Post.objects.update(html="", excerpt="")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('posts:profile', args=['author']))
+        self.assertNotContains(response, 'Старый пост')
+        self.assertFalse([query for query in queries
+                          if '"posts_post"."text"' in query['sql']])
+
+    def test_backfill(self):
+        post = Post.objects.create(text="Старый длинный текст поста",
+                                   author=self.user)
+        Post.objects.filter(id=post.id).update(html="", excerpt="")
+        out = StringIO()
+        call_command('backfill_post_html', chunk_size=1, stdout=out)
+        post.refresh_from_db()
+        self.assertEqual(post.excerpt, "Старый длинный текс…")
+        self.assertIn("обновлено 1", out.getvalue())
@@ -0,0 +1,325 @@
+import datetime as dt
+import json
+import zipfile
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..archive import archive_posts
+from ..deletion import request_deletion, run_deletion
+from ..export import iter_user_export
+from ..follow_graph import follow_graph
+from ..live import ChangeFeed, Cursor
+from ..models import (ArchivedComment, ArchivedPost, Comment, Deletion, Follow,
+                      Group, Post, PostTag, ShardSequence)
+from ..sharding import (ShardedFeed, shard_for, shard_querysets,
+                        sharded_feed)
+from ..notifications import send_digests
+from ..trending import update_trending
+from ..usernames import username_cache
+
+User = get_user_model()
+SHARDS = ('default', 'shard1', 'shard2')
+
+
+@override_settings(POST_SHARDS=('default',))
+class ShardForTests(TestCase):
+    @override_settings(POST_SHARDS=SHARDS)
+    def test_author_is_pinned_to_shard(self):
+        self.assertEqual(shard_for(3), 'default')
+        self.assertEqual(shard_for(4), 'shard1')
+        self.assertEqual(shard_for(5), 'shard2')
+
+    @override_settings(POST_SHARDS=SHARDS)
+    def test_author_ids_are_chunked_per_shard(self):
+        querysets = shard_querysets(Post.objects.all(), [3, 6, 9, 4],
+                                    chunk_size=2)
+        self.assertEqual(
+            [(queryset.db, queryset.query.where.children[0].rhs)
+             for queryset in querysets],
+            [('default', [3, 6]), ('default', [9]), ('shard1', [4])])
+
+    def test_single_shard_keeps_queryset(self):
+        queryset = Post.objects.all()
+        self.assertIs(sharded_feed(queryset), queryset)
+
+
+@override_settings(POST_SHARDS=('default',))
+class ShardedFeedTests(TestCase):
+    def setUp(self):
+        first = User.objects.create_user(username='first')
+        second = User.objects.create_user(username='second')
+        start = timezone.now()
+        for number in range(10):
+            post = Post.objects.create(
+                text=f'Пост {number}', author=(first, second)[number % 3 == 0])
+            Post.objects.filter(id=post.id).update(
+                pub_date=start - dt.timedelta(minutes=number // 2))
+        # два «шарда» в одной базе: посты каждого автора — свой поток
+        self.feed = ShardedFeed([Post.objects.filter(author=first),
+                                 Post.objects.filter(author=second)])
+        self.expected = list(Post.objects.order_by('-pub_date', '-id'))
+
+    def test_merge_matches_single_query(self):
+        self.assertEqual(self.feed.count(), 10)
+        self.assertEqual(self.feed[0:10], self.expected)
+        self.assertEqual(self.feed[3:7], self.expected[3:7])
+        self.assertEqual(self.feed[9], self.expected[9])
+
+    def test_page_reads_keys_then_winning_rows(self):
+        """С шардов читаются ключи, целиком — только строки страницы."""
+        with CaptureQueriesContext(connection) as queries:
+            page = self.feed[4:6]
+        self.assertEqual(page, self.expected[4:6])
+        # оба поста страницы — одного автора: строки читаются с одного шарда
+        self.assertEqual(len(queries), 3)
+        self.assertNotIn('"text"', queries[0]['sql'])
+
+    def test_count_is_cached_until_posts_change(self):
+        cache.clear()
+        feed = ShardedFeed(self.feed.querysets, count_key='test')
+        self.assertEqual(feed.count(), 10)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                ShardedFeed(self.feed.querysets, count_key='test').count(),
+                10)
+        Post.objects.create(text='Новый', author=User.objects.get(
+            username='first'))
+        self.assertEqual(
+            ShardedFeed(self.feed.querysets, count_key='test').count(), 11)
+
+
+@skipUnless(len(settings.POST_SHARDS) > 1,
+            'нужны шарды: DJANGO_SETTINGS_MODULE=yatube.settings_sharded')
+class ShardedViewsTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        caches['ratelimit'].clear()
+        username_cache.clear()
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        self.authors = [User.objects.create_user(username=f'author{number}')
+                        for number in range(len(settings.POST_SHARDS))]
+        self.posts = [Post.objects.create(
+            text=f'Пост #шард {author.username}', author=author,
+            group=self.group) for author in self.authors]
+        self.client = Client()
+        self.client.force_login(self.authors[0])
+
+    def test_posts_live_in_author_shard(self):
+        shards = set()
+        for author, post in zip(self.authors, self.posts):
+            shard = shard_for(author.id)
+            shards.add(shard)
+            self.assertEqual(post._state.db, shard)
+            self.assertTrue(Post.objects.using(shard).filter(
+                id=post.id).exists())
+            self.assertTrue(PostTag.objects.filter(post_id=post.id).exists())
+        self.assertEqual(shards, set(settings.POST_SHARDS))
+
+    def test_tag_and_mention_feeds_read_shards(self):
+        response = self.client.get(reverse('posts:tag_posts', args=['шард']))
+        self.assertEqual({post.id for post in response.context['posts']},
+                         {post.id for post in self.posts})
+        reader = self.authors[0]
+        mentioning = [Post.objects.create(
+            text=f'Привет, @{reader.username}', author=author)
+            for author in self.authors[1:]]
+        response = self.client.get(reverse('posts:mentions'))
+        self.assertEqual({post.id for post in response.context['posts']},
+                         {post.id for post in mentioning})
+
+    def test_deleted_shard_post_leaves_no_tags(self):
+        post = self.posts[1]
+        post.delete()
+        self.assertFalse(PostTag.objects.filter(post_id=post.id).exists())
+        self.assertTrue(PostTag.objects.filter(
+            post_id=self.posts[0].id).exists())
+
+    def test_user_deletion_cleans_shards(self):
+        author, other = self.authors[1], self.authors[2]
+        self.posts[1].comments.create(author=other, text='Ему')
+        self.posts[2].comments.create(author=author, text='Мой')
+        deletion = request_deletion(Deletion.USER, author.id)
+        posts = Post.objects.using(shard_for(author.id)).filter(
+            author=author.id)
+        while User.objects.filter(id=author.id).exists():
+            # к удалению строки пользователя его посты в шарде уже убраны
+            left = posts.exists()
+            run_deletion(deletion, batch_size=1, max_batches=1)
+        self.assertFalse(left)
+        run_deletion(deletion)
+        self.assertIsNotNone(deletion.finished)
+        for shard in settings.POST_SHARDS:
+            self.assertFalse(Post.objects.using(shard).filter(
+                author=author.id).exists())
+            self.assertFalse(Comment.objects.using(shard).filter(
+                author=author.id).exists())
+            self.assertFalse(User.objects.using(shard).filter(
+                id=author.id).exists())
+        self.assertFalse(PostTag.objects.filter(author=author.id).exists())
+        self.assertTrue(Post.objects.using(shard_for(other.id)).filter(
+            id=self.posts[2].id).exists())
+
+    def test_archive_moves_posts_from_every_shard(self):
+        self.posts[1].comments.create(author=self.authors[0], text='Ему')
+        moved = archive_posts(before=dt.datetime.now() + dt.timedelta(days=1))
+        self.assertEqual(moved, len(self.posts))
+        self.assertEqual(
+            set(ArchivedPost.objects.values_list('id', flat=True)),
+            {post.id for post in self.posts})
+        self.assertEqual(ArchivedComment.objects.count(), 1)
+        for shard in settings.POST_SHARDS:
+            self.assertFalse(Post.objects.using(shard).exists())
+            self.assertFalse(Comment.objects.using(shard).exists())
+        # архивный пост сохраняет теги, а новый пост — новый id,
+        # даже если счётчики шардов заводятся заново
+        self.assertEqual(PostTag.objects.count(), len(self.posts))
+        for shard in settings.POST_SHARDS:
+            ShardSequence.objects.using(shard).all().delete()
+        post = Post.objects.create(text='Новый', author=self.authors[1])
+        self.assertGreater(post.id, max(old.id for old in self.posts))
+
+    def test_trending_merges_shards(self):
+        for post in self.posts:
+            Follow.objects.create(user=self.authors[0], author=post.author)
+        update_trending()
+        response = self.client.get(reverse('posts:trending'))
+        self.assertEqual({post.id for post in response.context['page']},
+                         {post.id for post in self.posts})
+
+    def test_export_reads_author_shard(self):
+        author = self.authors[1]
+        self.posts[2].comments.create(author=author, text='Мой')
+        with zipfile.ZipFile(BytesIO(b''.join(
+                iter_user_export(author)))) as archive:
+            posts = archive.read('posts.ndjson').decode().splitlines()
+            comments = archive.read('comments.ndjson').decode().splitlines()
+        self.assertEqual([json.loads(row)['id'] for row in posts],
+                         [self.posts[1].id])
+        self.assertEqual(len(comments), 1)
+
+    def test_backfill_commands_walk_every_shard(self):
+        PostTag.objects.all().delete()
+        for post in self.posts:
+            Post.objects.using(post._state.db).filter(id=post.id).update(
+                excerpt='')
+        call_command('index_post_tags', stdout=StringIO())
+        call_command('backfill_post_html', stdout=StringIO())
+        self.assertEqual(
+            set(PostTag.objects.values_list('post_id', flat=True)),
+            {post.id for post in self.posts})
+        for post in self.posts:
+            post.refresh_from_db()
+            self.assertTrue(post.excerpt)
+
+    @override_settings(LIVE_POLL_INTERVAL=0)
+    def test_live_cursor_tracks_each_shard(self):
+        feed = ChangeFeed()
+        feed.poll()
+        cursor = feed.current()
+        self.assertEqual(len(str(cursor).split('/')), len(self.authors))
+        # в шарде с меньшими id новый пост всё равно виден
+        new_posts = [Post.objects.create(text='Новый', author=author)
+                     for author in self.authors]
+        events = feed.wait(cursor, 0)
+        self.assertEqual({event['id'] for event in events},
+                         {post.id for post in new_posts})
+        for event in events:
+            cursor.advance(event)
+        self.assertEqual(str(Cursor.parse(str(cursor))), str(cursor))
+        self.assertEqual(feed.since(cursor), [])
+
+    def test_ids_are_globally_unique(self):
+        more = [Post.objects.create(text='Ещё', author=author)
+                for author in self.authors for _ in range(3)]
+        ids = [post.id for post in self.posts + more]
+        self.assertEqual(len(set(ids)), len(ids))
+
+    def test_users_and_groups_are_replicated(self):
+        for shard in settings.POST_SHARDS[1:]:
+            copy = User.objects.using(shard).get(id=self.authors[1].id)
+            self.assertFalse(copy.has_usable_password())
+            self.assertTrue(Group.objects.using(shard).filter(
+                slug='group').exists())
+        self.group.delete()
+        for shard in settings.POST_SHARDS[1:]:
+            self.assertFalse(Group.objects.using(shard).exists())
+
+    def test_global_feeds_merge_shards(self):
+        expected = {post.id for post in self.posts}
+        for url in (reverse('posts:index'),
+                    reverse('posts:group_posts', args=['group'])):
+            page = self.client.get(url).context['page']
+            self.assertEqual({post.id for post in page}, expected)
+        for author in self.authors[1:]:
+            Follow.objects.create(user=self.authors[0], author=author)
+        # граф подписок обновляется после коммита, а тест — одна транзакция
+        follow_graph.load()
+        page = self.client.get(reverse('posts:follow_index')).context['page']
+        self.assertEqual({post.id for post in page},
+                         {post.id for post in self.posts[1:]})
+
+    def test_long_follow_list_is_chunked(self):
+        """Подписки режутся на части по MAX_FOLLOWING_IN_QUERY id."""
+        neighbour = User.objects.create_user(username='neighbour')
+        while shard_for(neighbour.id) != shard_for(self.authors[1].id):
+            neighbour = User.objects.create_user(
+                username=f'neighbour{neighbour.id}')
+        post = Post.objects.create(text='Сосед', author=neighbour)
+        for author in (*self.authors[1:], neighbour):
+            Follow.objects.create(user=self.authors[0], author=author)
+        follow_graph.load()
+        with mock.patch('posts.views.MAX_FOLLOWING_IN_QUERY', 1):
+            page = self.client.get(
+                reverse('posts:follow_index')).context['page']
+        self.assertEqual({item.id for item in page},
+                         {item.id for item in self.posts[1:]} | {post.id})
+
+    def test_author_pages_read_their_shard(self):
+        author, post = self.authors[1], self.posts[1]
+        response = self.client.get(
+            reverse('posts:profile', args=[author.username]))
+        self.assertEqual([item.id for item in response.context['page']],
+                         [post.id])
+        response = self.client.post(
+            reverse('posts:add_comment', args=[author.username, post.id]),
+            {'text': 'Комментарий'})
+        comment = Comment.objects.using(shard_for(author.id)).get()
+        self.assertEqual(comment.post_id, post.id)
+        response = self.client.get(
+            reverse('posts:post_view', args=[author.username, post.id]))
+        self.assertEqual(list(response.context['comments']), [comment])
+
+    def test_notifications_link_shard_posts(self):
+        author = User.objects.get(id=self.authors[1].id)
+        author.email = 'author@example.com'
+        author.save()
+        post = self.posts[1]
+        self.client.post(
+            reverse('posts:add_comment', args=[author.username, post.id]),
+            {'text': 'Комментарий'})
+        send_digests()
+        self.assertIn(f'«{post}»', mail.outbox[0].body)
+        self.client.force_login(author)
+        response = self.client.get(reverse('posts:notifications'))
+        self.assertContains(response, reverse(
+            'posts:post_view', args=[author.username, post.id]))
+
+    def test_new_post_goes_to_author_shard(self):
+        author = self.authors[0]
+        self.client.post(reverse('posts:new_post'), {'text': 'Новый'})
+        post = Post.objects.using(shard_for(author.id)).get(text='Новый')
+        self.assertEqual(post.author_id, author.id)
@@ -0,0 +1,88 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Mention, Post, PostTag
+from ..tags import extract_mentions, extract_tags
+
+User = get_user_model()
+
+
+class TagTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="author")
+        cls.reader = User.objects.create_user(username="reader.one")
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_extract(self):
+        self.assertEqual(extract_tags('#Django и #питон, но не a#b или ##x'),
+                         {'django', 'питон'})
+        self.assertEqual(extract_mentions('Привет, @reader.one. и @b-2'),
+                         {'reader.one', 'b-2'})
+
+    def test_save_and_edit_sync_tables(self):
+        post = Post.objects.create(
+            text='#один #два привет @reader.one и @author', author=self.author)
+        self.assertEqual(
+            set(post.tags.values_list('tag__name', flat=True)),
+            {'один', 'два'})
+        self.assertEqual(list(Mention.objects.values_list('user', flat=True)),
+                         [self.reader.id])
+        post.text = '#два #три'
+        post.save()
+        self.assertEqual(
+            set(post.tags.values_list('tag__name', flat=True)),
+            {'два', 'три'})
+        self.assertFalse(Mention.objects.exists())
+
+    def test_tag_feed_keyset_pages(self):
+        posts = [Post.objects.create(text=f'#лента пост {number}',
+                                     author=self.author)
+                 for number in range(12)]
+        Post.objects.create(text='без тега', author=self.author)
+        response = self.client.get(reverse('posts:tag_posts',
+                                           args=['Лента']))
+        first = response.context['posts']
+        self.assertEqual(len(first), 10)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('posts:tag_posts', args=['лента']),
+                {'after': response.context['next_cursor']})
+        second = response.context['posts']
+        self.assertEqual({post.id for post in first + second},
+                         {post.id for post in posts})
+        self.assertIsNone(response.context['next_cursor'])
+        self.assertFalse(any('LIKE' in query['sql'] for query in queries))
+
+    def test_tag_404(self):
+        response = self.client.get(reverse('posts:tag_posts', args=['нет']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_mentions_feed(self):
+        post = Post.objects.create(text='Смотри, @reader.one',
+                                   author=self.author)
+        response = self.client.get(reverse('posts:mentions'))
+        self.assertEqual(response.context['posts'], [post])
+
+    def test_backfill(self):
+        post = Post.objects.create(text='#старый', author=self.author)
+        PostTag.objects.all().delete()
+        call_command('index_post_tags', stdout=StringIO())
+        self.assertEqual(post.tags.get().tag.name, 'старый')
+
+    def test_deleted_post_leaves_no_rows(self):
+        post = Post.objects.create(text='#удалю @reader.one',
+                                   author=self.author)
+        post.delete()
+        self.assertFalse(PostTag.objects.exists())
+        self.assertFalse(Mention.objects.exists())
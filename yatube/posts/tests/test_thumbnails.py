@@ -0,0 +1,83 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from ..models import Post
+from ..thumbnails import FEED_GEOMETRY, FEED_OPTIONS, prefetch_thumbnails
+from ..thumbnails import thumbnail_name, thumbnail_size
+
+User = get_user_model()
+
+
+@override_settings(POST_SHARDS=('default',))
+class ThumbnailPrefetchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="author")
+        for number in range(3):
+            post = Post.objects.create(text=f'Пост {number}', author=cls.user)
+            Post.objects.filter(id=post.id).update(
+                image=f'posts/picture{number}.jpg')
+        Post.objects.create(text='Без картинки', author=cls.user)
+
+    def setUp(self):
+        default.kvstore.cache.clear()
+        self.posts = list(Post.objects.order_by('id'))
+        # миниатюры уже созданы для двух первых картинок
+        for post in self.posts[:2]:
+            thumbnail = ImageFile(
+                thumbnail_name(post.image, FEED_GEOMETRY, FEED_OPTIONS),
+                default.storage)
+            thumbnail.set_size((960, 339))
+            default.kvstore.set(thumbnail)
+        default.kvstore.cache.clear()
+
+    def test_names_match_sorl(self):
+        """Предвычисленное имя совпадает с тем, что найдёт {% thumbnail %}."""
+        post = self.posts[0]
+        found = default.backend.get_thumbnail(
+            post.image, FEED_GEOMETRY, **FEED_OPTIONS)
+        self.assertEqual(
+            found.name,
+            thumbnail_name(post.image, FEED_GEOMETRY, FEED_OPTIONS))
+
+    def test_one_query_for_cold_cache_and_none_for_warm(self):
+        with self.assertNumQueries(1):
+            prefetch_thumbnails(self.posts)
+        first, second, missing, without_image = self.posts
+        self.assertEqual((first.thumbnail.width, first.thumbnail.height),
+                         (960, 339))
+        self.assertTrue(second.thumbnail.url.startswith('/media/cache/'))
+        self.assertFalse(hasattr(missing, 'thumbnail'))
+        self.assertFalse(hasattr(without_image, 'thumbnail'))
+
+        posts = list(Post.objects.order_by('id'))
+        with self.assertNumQueries(0):
+            prefetch_thumbnails(posts)
+        self.assertEqual(posts[0].thumbnail.url, first.thumbnail.url)
+
+    def test_feed_uses_prefetched_urls(self):
+        response = Client().get(
+            reverse('posts:profile', args=[self.user.username]))
+        for post in self.posts[:2]:
+            self.assertContains(response, thumbnail_name(
+                post.image, FEED_GEOMETRY, FEED_OPTIONS))
+
+
+class ThumbnailSizeTests(TestCase):
+    def test_size_follows_sorl_geometry(self):
+        """Размеры миниатюры считаются так же, как их получит sorl."""
+        self.assertEqual(thumbnail_size(64, 48), (960, 339))
+        self.assertEqual(thumbnail_size(4000, 3000), (960, 339))
+        crop = {'crop': 'center'}
+        self.assertEqual(thumbnail_size(640, 200, '960x339', crop),
+                         (640, 200))
+        self.assertEqual(thumbnail_size(2000, 500, '960x339', crop),
+                         (960, 339))
+        self.assertEqual(thumbnail_size(2000, 500, '960x339', {}),
+                         (960, 240))
+        self.assertEqual(thumbnail_size(200, 100, '960x339', {}),
+                         (200, 100))
@@ -0,0 +1,62 @@
+import datetime as dt
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Follow, Post
+from ..trending import update_trending
+
+User = get_user_model()
+
+
+@override_settings(POST_SHARDS=('default',))
+class TrendingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="name")
+        cls.reader = User.objects.create_user(username="reader")
+        two_days_ago = dt.datetime.now() - dt.timedelta(days=2)
+        cls.discussed = Post.objects.create(
+            text='Обсуждаемый пост', author=cls.user)
+        cls.fresh = Post.objects.create(
+            text='Свежий пост', author=cls.user)
+        cls.forgotten = Post.objects.create(
+            text='Забытый пост', author=cls.user)
+        Post.objects.filter(id__in=[cls.discussed.id, cls.forgotten.id]
+                            ).update(pub_date=two_days_ago)
+        Comment.objects.bulk_create(
+            Comment(post=cls.discussed, author=cls.reader, text='Ого')
+            for _ in range(5))
+
+    def test_comment_velocity_beats_recency(self):
+        """Пост со свежими комментариями выше нового поста без них."""
+        update_trending()
+        scores = dict(Post.objects.values_list('id', 'trending_score'))
+        self.assertGreater(scores[self.discussed.id], scores[self.fresh.id])
+
+    def test_only_active_posts_are_recomputed(self):
+        """Посты без недавней активности не пересчитываются."""
+        self.assertEqual(update_trending(), 2)
+        self.assertIsNone(
+            Post.objects.get(id=self.forgotten.id).trending_score)
+
+    def test_follower_reach_raises_score(self):
+        """Подписчики автора повышают рейтинг поста."""
+        update_trending()
+        before = Post.objects.get(id=self.fresh.id).trending_score
+        Follow.objects.create(user=self.reader, author=self.user)
+        update_trending()
+        after = Post.objects.get(id=self.fresh.id).trending_score
+        self.assertGreater(after, before)
+
+    def test_trending_page_order(self):
+        """Страница /trending/ отдаёт посты по убыванию рейтинга."""
+        call_command('update_trending', stdout=StringIO())
+        response = Client().get(reverse('posts:trending'))
+        self.assertEqual(
+            [post.id for post in response.context['page']],
+            [self.discussed.id, self.fresh.id])
@@ -1,13 +1,14 @@
 from http import HTTPStatus
 
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 
 from ..models import Group, Post
 
 User = get_user_model()
 
 
+@override_settings(POST_SHARDS=('default',))
 class PostURLTests(TestCase):
     @classmethod
     def setUpClass(cls):
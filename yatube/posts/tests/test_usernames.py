@@ -0,0 +1,111 @@
+from importlib import import_module
+from types import SimpleNamespace
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import URLResolver, get_resolver, reverse
+
+from users.forms import CreationForm
+
+from ..models import Post
+from ..usernames import (RESERVED_USERNAMES, UsernameCache, get_user_id,
+                         username_cache)
+
+User = get_user_model()
+
+
+class UsernameCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        username_cache.clear()
+        self.user = User.objects.create_user(username='author')
+
+    def test_resolved_once(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(get_user_id('author'), self.user.id)
+            self.assertEqual(get_user_id('author'), self.user.id)
+        # другой процесс берёт id из общего кэша
+        username_cache.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user_id('author'), self.user.id)
+
+    def test_unknown_username_is_cached(self):
+        with self.assertNumQueries(1):
+            self.assertIsNone(get_user_id('ghost'))
+            self.assertIsNone(get_user_id('ghost'))
+
+    def test_new_user_replaces_negative_entry(self):
+        self.assertIsNone(get_user_id('ghost'))
+        ghost = User.objects.create_user(username='ghost')
+        self.assertEqual(get_user_id('ghost'), ghost.id)
+
+    def test_rename_and_delete(self):
+        self.assertEqual(get_user_id('author'), self.user.id)
+        self.user.username = 'writer'
+        self.user.save()
+        self.assertIsNone(get_user_id('author'))
+        self.assertEqual(get_user_id('writer'), self.user.id)
+        self.user.delete()
+        self.assertIsNone(get_user_id('writer'))
+
+    @override_settings(USERNAME_LOCAL_SIZE=2)
+    def test_local_cache_is_bounded(self):
+        local = UsernameCache()
+        for number, name in enumerate(('a', 'b', 'c'), 1):
+            local.set(name, number)
+        self.assertIsNone(local.get('a'))
+        self.assertEqual(local.get('c'), 3)
+
+    def test_views_use_cached_id(self):
+        post = Post.objects.create(text='Текст', author=self.user)
+        client = Client()
+        url = reverse('posts:post_view', args=['author', post.id])
+        self.assertEqual(client.get(url).status_code, 200)
+        self.user.username = 'writer'
+        self.user.save()
+        self.assertEqual(client.get(url).status_code, 404)
+        self.assertEqual(client.get(
+            reverse('posts:profile', args=['writer'])).status_code, 200)
+
+
+def first_segments(patterns):
+    """Постоянные первые сегменты адресов; пустой префикс раскрывается."""
+    for pattern in patterns:
+        route = str(pattern.pattern).lstrip('^')
+        if isinstance(pattern, URLResolver) and not route:
+            yield from first_segments(pattern.url_patterns)
+            continue
+        segment = route.split('/')[0]
+        if segment and not segment.startswith(('<', '(')):
+            yield segment
+
+
+class ReservedUsernameTests(TestCase):
+    def test_every_site_prefix_is_reserved(self):
+        """Имя, совпадающее с адресом страницы, нельзя занять."""
+        self.assertLessEqual(set(first_segments(get_resolver().url_patterns)),
+                             RESERVED_USERNAMES)
+
+    def test_signup_rejects_reserved_name(self):
+        data = {'username': 'Trending', 'password1': 'Sup3r-secret!',
+                'password2': 'Sup3r-secret!'}
+        form = CreationForm(data)
+        self.assertFalse(form.is_valid())
+        self.assertIn('username', form.errors)
+        self.assertTrue(CreationForm({**data, 'username': 'trender'})
+                        .is_valid())
+
+    def test_migration_renames_existing_accounts(self):
+        taken = User.objects.create_user(username='live')
+        User.objects.create_user(username=f'live_{taken.id}')
+        other = User.objects.create_user(username='reader')
+        migration = import_module(
+            'posts.migrations.0026_rename_reserved_usernames')
+        migration.rename_reserved(apps, SimpleNamespace(
+            connection=SimpleNamespace(alias='default')))
+        taken.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(taken.username, f'live_{taken.id}_')
+        self.assertEqual(other.username, 'reader')
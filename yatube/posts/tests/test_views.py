@@ -17,6 +17,7 @@ User = get_user_model()
 
 
 @override_settings(MEDIA_ROOT=tempfile.mkdtemp(dir=settings.BASE_DIR))
+@override_settings(POST_SHARDS=('default',))
 class PostPagesTests(TestCase):
     @classmethod
     def setUpClass(cls):
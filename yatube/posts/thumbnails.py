@@ -0,0 +1,91 @@
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.kvstores.cached_db_kvstore import \
+    KVStore as CachedDbKVStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+# те же размеры и опции, что у {% thumbnail %} в includes/post_item.html
+FEED_GEOMETRY = '960x339'
+FEED_OPTIONS = {'crop': 'center', 'upscale': True}
+
+
+def thumbnail_name(image, geometry, options):
+    """Имя файла миниатюры; сами файлы при этом не открываются.
+
+    Опции дополняются так же, как в ThumbnailBackend.get_thumbnail,
+    иначе имя не совпадёт с тем, под которым sorl её сохранил.
+    """
+    backend = default.backend
+    source = ImageFile(image)
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return backend._get_thumbnail_filename(source, geometry, options)
+
+
+def thumbnail_size(width, height, geometry=FEED_GEOMETRY,
+                   options=FEED_OPTIONS):
+    """Размеры миниатюры по сохранённым размерам исходной картинки.
+
+    Повторяет масштабирование и обрезку sorl, так что для атрибутов
+    width и height не нужно ни открывать файл, ни искать миниатюру.
+    """
+    frame_width, frame_height = (int(side) for side in geometry.split('x'))
+    ratios = (frame_width / width, frame_height / height)
+    scale = max(ratios) if options.get('crop') else min(ratios)
+    if not options.get('upscale'):
+        scale = min(scale, 1)
+    width, height = round(width * scale), round(height * scale)
+    if options.get('crop'):
+        width, height = min(width, frame_width), min(height, frame_height)
+    return width, height
+
+
+def thumbnail_key(image, geometry, options):
+    name = thumbnail_name(image, geometry, options)
+    return add_prefix(ImageFile(name, default.storage).key)
+
+
+def prefetch_thumbnails(posts, geometry=FEED_GEOMETRY, options=FEED_OPTIONS):
+    """Находит миниатюры всех постов страницы одним get_many из кэша.
+
+    Промахи кэша добираются одним запросом к таблице sorl и кладутся
+    в кэш. Найденная миниатюра записывается в post.thumbnail; для
+    остальных шаблон вызывает обычный {% thumbnail %}, который её создаст.
+    """
+    kvstore = default.kvstore
+    if not isinstance(kvstore, CachedDbKVStore):
+        return
+    keys = {}
+    for post in posts:
+        if post.image:
+            key = thumbnail_key(post.image, geometry, options)
+            keys.setdefault(key, []).append(post)
+    if not keys:
+        return
+    values = kvstore.cache.get_many(list(keys))
+    missing = [key for key in keys if key not in values]
+    if missing:
+        stored = dict(KVStoreModel.objects.filter(
+            key__in=missing).values_list('key', 'value'))
+        # отсутствие тоже кэшируется, как в KVStore._get_raw: при
+        # создании миниатюры sorl перезапишет ключ
+        found = {key: stored.get(key, EMPTY_VALUE) for key in missing}
+        kvstore.cache.set_many(found, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(found)
+    for key, value in values.items():
+        if value == EMPTY_VALUE:
+            continue
+        thumbnail = deserialize_image_file(value)
+        for post in keys[key]:
+            post.thumbnail = thumbnail
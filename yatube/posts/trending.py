@@ -0,0 +1,88 @@
+import datetime as dt
+import math
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count
+
+from .models import Comment, Follow, Post
+from .sharding import invalidate_feed_counts, shard_aliases
+
+# Точка отсчёта для «растущего» времени. Вклад события равен
+# w·2^((t - EPOCH) / T), а не w·2^(-(now - t) / T): общий множитель
+# 2^(-(now - EPOCH) / T) одинаков для всех постов и не меняет порядок,
+# поэтому пересчитывать нужно только посты с новыми событиями.
+EPOCH = dt.datetime(2021, 1, 1)
+CHUNK_SIZE = 500
+TRENDING_ORDERING = ("-trending_score", "-id")
+
+
+def _exponent(moment):
+    return (moment - EPOCH).total_seconds() / settings.TRENDING_HALF_LIFE
+
+
+def _log2_sum(exponents):
+    top = max(exponents)
+    return top + math.log2(sum(2 ** (e - top) for e in exponents))
+
+
+def compute_score(pub_date, reach, comment_dates):
+    """Рейтинг поста в log2-шкале.
+
+    Публикация весит тем больше, чем больше подписчиков у автора,
+    каждый комментарий весит 1 и затухает с периодом TRENDING_HALF_LIFE.
+    """
+    post_weight = 1 + settings.TRENDING_REACH_WEIGHT * math.log1p(reach)
+    exponents = [math.log2(post_weight) + _exponent(pub_date)]
+    exponents.extend(_exponent(created) for created in comment_dates)
+    return _log2_sum(exponents)
+
+
+def active_post_ids(since, using=DEFAULT_DB_ALIAS):
+    ids = set(Post.objects.using(using).filter(
+        pub_date__gte=since).values_list("id", flat=True))
+    ids.update(Comment.objects.using(using).filter(
+        created__gte=since, post__isnull=False).values_list(
+        "post_id", flat=True))
+    return sorted(ids)
+
+
+def _update_chunk(post_ids, using=DEFAULT_DB_ALIAS):
+    # подписки лежат в основной базе, посты и комментарии — в шарде
+    posts = list(Post.objects.using(using).filter(id__in=post_ids).only(
+        "id", "pub_date", "author_id"))
+    reach = dict(Follow.objects.filter(
+        author_id__in={post.author_id for post in posts}
+    ).values_list("author_id").annotate(count=Count("id")))
+    comment_dates = {}
+    for post_id, created in Comment.objects.using(using).filter(
+            post_id__in=post_ids).values_list("post_id", "created"):
+        comment_dates.setdefault(post_id, []).append(created)
+    for post in posts:
+        post.trending_score = compute_score(
+            post.pub_date, reach.get(post.author_id, 0),
+            comment_dates.get(post.id, ()))
+    with transaction.atomic(using=using):
+        Post.objects.using(using).bulk_update(posts, ["trending_score"])
+    return len(posts)
+
+
+def update_trending(since=None):
+    """Пересчитывает рейтинг постов с активностью после since."""
+    if since is None:
+        since = dt.datetime.now() - dt.timedelta(
+            seconds=settings.TRENDING_WINDOW)
+    updated = 0
+    for alias in shard_aliases():
+        post_ids = active_post_ids(since, alias)
+        for start in range(0, len(post_ids), CHUNK_SIZE):
+            updated += _update_chunk(post_ids[start:start + CHUNK_SIZE],
+                                     alias)
+    # посты, впервые получившие рейтинг, попадают в ленту trending
+    invalidate_feed_counts()
+    return updated
+
+
+def trending_posts():
+    return Post.objects.filter(
+        trending_score__isnull=False).order_by(*TRENDING_ORDERING)
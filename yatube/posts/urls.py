@@ -7,8 +7,15 @@ app_name = 'posts'
 urlpatterns = [
     path("", views.index, name="index"),
     path("follow/", views.follow_index, name="follow_index"),
+    path("follow/batch/", views.follow_batch, name="follow_batch"),
+    path("trending/", views.trending, name="trending"),
     path("group/<slug:slug>/", views.group_posts, name="group_posts"),
+    path("tag/<str:name>/", views.tag_posts, name="tag_posts"),
+    path("mentions/", views.mentions, name="mentions"),
     path("new/", views.new_post, name="new_post"),
+    path("export/", views.export_data, name="export_data"),
+    path("notifications/", views.notifications, name="notifications"),
+    path("live/", views.live, name="live"),
     path('<str:username>/', views.profile, name='profile'),
     path('<str:username>/<int:post_id>/', views.post_view, name='post_view'),
     path('<str:username>/<int:post_id>/edit/', views.post_edit,
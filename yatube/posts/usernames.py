@@ -0,0 +1,106 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import Http404
+
+User = get_user_model()
+# id пользователей начинаются с 1, 0 — «такого имени нет»
+MISSING = 0
+# первые сегменты адресов сайта: профиль с таким именем не открылся бы
+RESERVED_USERNAMES = frozenset({
+    'about', 'admin', 'auth', 'export', 'follow', 'group', 'live', 'media',
+    'mentions', 'new', 'notifications', 'static', 'tag', 'trending',
+})
+
+
+def _cache_key(username):
+    return f'username:{username}'
+
+
+class UsernameCache:
+    """username -> id в памяти процесса, поверх общего кэша.
+
+    Запись в процессе живёт USERNAME_LOCAL_TTL секунд: сигналы
+    сбрасывают её только в своём процессе, остальные воркеры увидят
+    переименование через это время. Размер ограничен
+    USERNAME_LOCAL_SIZE, вытесняются давно не использованные имена.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, username):
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None:
+                return None
+            if entry[1] < time.monotonic():
+                del self._entries[username]
+                return None
+            self._entries.move_to_end(username)
+            return entry[0]
+
+    def set(self, username, user_id):
+        with self._lock:
+            self._entries[username] = (
+                user_id, time.monotonic() + settings.USERNAME_LOCAL_TTL)
+            self._entries.move_to_end(username)
+            while len(self._entries) > settings.USERNAME_LOCAL_SIZE:
+                self._entries.popitem(last=False)
+
+    def forget(self, username):
+        with self._lock:
+            self._entries.pop(username, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+username_cache = UsernameCache()
+
+
+def get_user_id(username):
+    """id пользователя по имени или None.
+
+    Отсутствие имени тоже кэшируется — на USERNAME_MISSING_TIMEOUT,
+    чтобы перебор несуществующих адресов не доходил до базы.
+    """
+    user_id = username_cache.get(username)
+    if user_id is None:
+        user_id = cache.get(_cache_key(username))
+        if user_id is None:
+            user_id = User.objects.filter(username=username).values_list(
+                'id', flat=True).first() or MISSING
+            cache.set(_cache_key(username), user_id,
+                      settings.USERNAME_CACHE_TIMEOUT if user_id
+                      else settings.USERNAME_MISSING_TIMEOUT)
+        username_cache.set(username, user_id)
+    return user_id or None
+
+
+def get_user_id_or_404(username):
+    user_id = get_user_id(username)
+    if user_id is None:
+        raise Http404
+    return user_id
+
+
+def forget_usernames(*usernames):
+    """Сбрасывает имена после создания, переименования или удаления.
+
+    Изменения через QuerySet.update() сигналов не шлют — после них
+    имена нужно сбросить вручную.
+    """
+    cache.delete_many([_cache_key(username) for username in usernames])
+    for username in usernames:
+        username_cache.forget(username)
+
+
+def is_reserved_username(username):
+    return username.lower() in RESERVED_USERNAMES
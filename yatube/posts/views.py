@@ -1,26 +1,88 @@
+import json
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Q
+from django.http import (Http404, HttpResponse, HttpResponseBadRequest,
+                         JsonResponse, StreamingHttpResponse)
 from django.shortcuts import get_object_or_404, redirect, render
+from django.views.decorators.http import require_POST
+
+from yatube.ratelimit import ratelimit
 
+from .archive import ArchiveFallbackList, get_post
+from .changelog import record, record_follows, record_post
+from .dedup import index_text
+from .deletion import hide_deleted, is_hidden
+from .export import iter_user_export
+from .follow_graph import get_follow_graph
+from .follows import follow_authors, unfollow_authors
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post
+from .live import (Cursor, EventStream, change_feed, connection_limit,
+                   event_filter)
+from .models import (FEED_DEFERRED, ArchivedPost, ChangeEvent, Follow, Group,
+                     Notification, Post, Tag, TextFingerprint)
+from .notifications import attach_posts, mark_all_read, notify
+from .recommendations import recommended_authors
+from .sharding import is_sharded, shard_for, sharded_feed
+from .tags import keyset_page
+from .trending import TRENDING_ORDERING, trending_posts
+from .usernames import get_user_id_or_404
 
 COUNT_POSTS = 10
+# больше id в IN упирается в лимит параметров SQLite
+MAX_FOLLOWING_IN_QUERY = 500
 User = get_user_model()
 
 
 def index(request):
-    posts = Post.objects.all()
+    posts = ArchiveFallbackList(
+        sharded_feed(hide_deleted(Post.objects.defer(*FEED_DEFERRED)),
+                     count_key='index'),
+        hide_deleted(ArchivedPost.objects.defer(*FEED_DEFERRED)), 'index')
     paginator = Paginator(posts, COUNT_POSTS)
     page_number = request.GET.get('page')
     page = paginator.get_page(page_number)
     return render(request, 'posts/index.html', {'page': page})
 
 
+def trending(request):
+    paginator = Paginator(sharded_feed(
+        hide_deleted(trending_posts().defer(*FEED_DEFERRED)),
+        ordering=TRENDING_ORDERING, count_key='trending'), COUNT_POSTS)
+    page_number = request.GET.get('page')
+    page = paginator.get_page(page_number)
+    return render(request, 'posts/trending.html', {'page': page})
+
+
+def tag_posts(request, name):
+    tag = get_object_or_404(Tag, name=name.lower())
+    posts, next_cursor = keyset_page(
+        hide_deleted(tag.post_tags.all(), post='post_id'),
+        request.GET.get('after'), COUNT_POSTS)
+    return render(request, 'posts/tag.html',
+                  {'tag': tag, 'posts': posts, 'next_cursor': next_cursor})
+
+
+@login_required
+def mentions(request):
+    posts, next_cursor = keyset_page(
+        hide_deleted(request.user.mentions.all(), post='post_id'),
+        request.GET.get('after'), COUNT_POSTS)
+    return render(request, 'posts/mentions.html',
+                  {'posts': posts, 'next_cursor': next_cursor})
+
+
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
+    posts = ArchiveFallbackList(
+        sharded_feed(hide_deleted(group.posts.defer(*FEED_DEFERRED)),
+                     count_key=f'group:{group.id}'),
+        hide_deleted(group.archived_posts.defer(*FEED_DEFERRED)),
+        f'group:{group.id}')
     paginator = Paginator(posts, COUNT_POSTS)
     page_number = request.GET.get('page')
     page = paginator.get_page(page_number)
@@ -28,52 +90,86 @@ def group_posts(request, slug):
 
 
 @login_required
+@ratelimit('new_post')
 def new_post(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
-        comment.save()
+        with transaction.atomic(), transaction.atomic(
+                using=shard_for(request.user.id)):
+            comment.save()
+            record_post(comment, ChangeEvent.CREATE)
+            index_text(TextFingerprint.POST, comment.id, comment.text)
         return redirect("posts:index")
     return render(
         request, "posts/new_post.html",
         {"form": form, "is_new": True})
 
 
+def follow_context(user, user_profile):
+    graph = get_follow_graph()
+    return {
+        'following': (user.is_authenticated
+                      and graph.is_following(user.id, user_profile.id)),
+        'followers_count': graph.followers_count(user_profile.id),
+        'following_count': graph.following_count(user_profile.id),
+    }
+
+
 def profile(request, username):
-    user_profile = get_object_or_404(User, username=username)
-    paginator = Paginator(user_profile.posts.all(), COUNT_POSTS)
+    user_id = get_user_id_or_404(username)
+    if is_hidden(user_id):
+        raise Http404
+    user_profile = get_object_or_404(User, id=user_id)
+    posts = ArchiveFallbackList(
+        hide_deleted(Post.objects.using(shard_for(user_id)).filter(
+            author_id=user_id).defer(*FEED_DEFERRED)),
+        hide_deleted(ArchivedPost.objects.filter(
+            author_id=user_id).defer(*FEED_DEFERRED)),
+        f'profile:{user_id}')
+    paginator = Paginator(posts, COUNT_POSTS)
     page_number = request.GET.get('page')
     page = paginator.get_page(page_number)
-    following = (request.user.is_authenticated and Follow.objects.filter(
-        user__username=request.user,
-        author=user_profile).exists())
     return render(
         request, 'posts/profile.html',
         {'page': page, 'user_profile': user_profile,
-         'following': following})
+         **follow_context(request.user, user_profile),
+         'recommended_authors': recommended_authors(request.user)})
 
 
 def post_view(request, username, post_id):
-    post = get_object_or_404(Post, id=post_id, author__username=username)
+    post = get_post(get_user_id_or_404(username), post_id)
+    if is_hidden(post.author_id, post.id):
+        raise Http404
     user_profile = post.author
     comments = post.comments.all()
     form = CommentForm()
     return render(
         request, 'posts/post.html',
         {'post': post, 'user_profile': user_profile, 'form': form,
-         'comments': comments})
+         'comments': comments,
+         **follow_context(request.user, user_profile)})
 
 
 @login_required
 def post_edit(request, username, post_id):
-    post = get_object_or_404(Post, id=post_id, author__username=username)
-    if request.user != post.author:
+    author_id = get_user_id_or_404(username)
+    post = get_object_or_404(
+        Post.objects.using(shard_for(author_id)), id=post_id,
+        author_id=author_id)
+    if is_hidden(post.author_id, post.id):
+        raise Http404
+    if request.user.id != post.author_id:
         return redirect('posts:post_view', username, post_id)
     form = PostForm(
         request.POST or None, files=request.FILES or None, instance=post)
     if form.is_valid():
-        form.save()
+        with transaction.atomic(), transaction.atomic(
+                using=post._state.db):
+            post = form.save()
+            record_post(post, ChangeEvent.UPDATE)
+            index_text(TextFingerprint.POST, post.id, post.text)
         return redirect('posts:post_view', username, post_id)
     return render(
         request, 'posts/new_post.html',
@@ -94,40 +190,161 @@ def server_error(request):
 
 
 @login_required
+@ratelimit('add_comment')
 def add_comment(request, username, post_id):
-    post = get_object_or_404(Post, author__username=username, id=post_id)
+    author_id = get_user_id_or_404(username)
+    post = get_object_or_404(
+        Post.objects.using(shard_for(author_id)), id=post_id,
+        author_id=author_id)
+    if is_hidden(post.author_id, post.id):
+        raise Http404
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic(), transaction.atomic(
+                using=post._state.db):
+            comment.save()
+            record(ChangeEvent.COMMENT, ChangeEvent.CREATE, comment.id,
+                   post=post.id, author=comment.author_id)
+            index_text(TextFingerprint.COMMENT, comment.id, comment.text)
+        notify(post.author_id, Notification.COMMENT, request.user.id, post.id)
     return redirect('posts:post_view', username, post_id)
 
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
+    author_ids = get_follow_graph().following(request.user.id)
+    if len(author_ids) <= MAX_FOLLOWING_IN_QUERY:
+        following = Q(author_id__in=list(author_ids))
+    else:
+        following = Q(author__following__user=request.user)
+    posts = hide_deleted(Post.objects.defer(*FEED_DEFERRED))
+    if is_sharded():
+        # подписки лежат в основной базе — на шарды идут списки id
+        posts = sharded_feed(posts, author_ids,
+                             chunk_size=MAX_FOLLOWING_IN_QUERY)
+    else:
+        posts = posts.filter(following)
+    post_list = ArchiveFallbackList(
+        posts,
+        hide_deleted(ArchivedPost.objects.filter(following).defer(
+            *FEED_DEFERRED)),
+        None)
     paginator = Paginator(post_list, COUNT_POSTS)
     page_number = request.GET.get('page')
     page = paginator.get_page(page_number)
     return render(
         request,
         "posts/follow.html",
-        {'page': page, 'paginator': paginator}
+        {'page': page, 'paginator': paginator,
+         'recommended_authors': recommended_authors(request.user)}
     )
 
 
 @login_required
+@ratelimit('follow', methods=None)
 def profile_follow(request, username):
-    author = get_object_or_404(User, username=username)
-    if author != request.user:
-        Follow.objects.get_or_create(user=request.user, author=author)
+    author_id = get_user_id_or_404(username)
+    if author_id != request.user.id:
+        with transaction.atomic():
+            _, created = Follow.objects.get_or_create(
+                user=request.user, author_id=author_id)
+            if created:
+                record_follows([(request.user.id, author_id)],
+                               ChangeEvent.CREATE)
+        if created:
+            notify(author_id, Notification.FOLLOW, request.user.id)
     return redirect('posts:profile', username=username)
 
 
 @login_required
 def profile_unfollow(request, username):
-    author = get_object_or_404(User, username=username)
-    Follow.objects.filter(author=author, user=request.user).delete()
+    author_id = get_user_id_or_404(username)
+    with transaction.atomic():
+        deleted, _ = Follow.objects.filter(
+            author_id=author_id, user=request.user).delete()
+        if deleted:
+            record_follows([(request.user.id, author_id)],
+                           ChangeEvent.DELETE)
     return redirect('posts:profile', username=username)
+
+
+@login_required
+@require_POST
+@ratelimit('follow_batch')
+def follow_batch(request):
+    try:
+        data = json.loads(request.body)
+        to_follow = [str(name) for name in data.get('follow', [])]
+        to_unfollow = [str(name) for name in data.get('unfollow', [])]
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse({'error': 'Некорректный JSON'}, status=400)
+    if len(to_follow) + len(to_unfollow) > settings.BULK_FOLLOW_LIMIT:
+        return JsonResponse(
+            {'error': f'Не больше {settings.BULK_FOLLOW_LIMIT} имён'},
+            status=400)
+    followed = follow_authors(request.user, to_follow)
+    unfollowed = unfollow_authors(request.user, to_unfollow)
+    unknown = sorted((set(to_follow) - set(followed))
+                     | (set(to_unfollow) - set(unfollowed)))
+    followed.pop(request.user.username, None)
+    return JsonResponse({
+        'followed': sorted(followed),
+        'unfollowed': sorted(unfollowed),
+        'unknown': unknown,
+    })
+
+
+@login_required
+def notifications(request):
+    paginator = Paginator(
+        request.user.notifications.select_related('actor'), COUNT_POSTS)
+    page = paginator.get_page(request.GET.get('page'))
+    page.object_list = attach_posts(list(page.object_list))
+    # список строится до пометки, чтобы новые были видны
+    unread_ids = {item.id for item in page if not item.is_read}
+    mark_all_read(request.user)
+    return render(
+        request,
+        "posts/notifications.html",
+        {'page': page, 'paginator': paginator, 'unread_ids': unread_ids}
+    )
+
+
+def live(request):
+    if not settings.LIVE_ENABLED:
+        # 204 — EventSource не переподключается
+        return HttpResponse(status=204)
+    stream = request.GET.get('stream', 'index')
+    try:
+        group_id = int(request.GET.get('group', 0))
+        post_id = int(request.GET.get('post', 0))
+    except ValueError:
+        return HttpResponseBadRequest('Некорректный id')
+    if stream == 'follow' and not request.user.is_authenticated:
+        return HttpResponse(status=403)
+    key = request.user.id or request.META.get('REMOTE_ADDR')
+    if not connection_limit.acquire(key):
+        response = HttpResponse('Слишком много подключений', status=503)
+        response['Retry-After'] = settings.LIVE_RETRY_MS // 1000
+        return response
+    cursor = (Cursor.parse(request.META.get('HTTP_LAST_EVENT_ID'))
+              or change_feed.current())
+    response = StreamingHttpResponse(
+        EventStream(cursor, event_filter(
+            stream, request.user, group_id, post_id), key),
+        content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@login_required
+def export_data(request):
+    response = StreamingHttpResponse(
+        iter_user_export(request.user), content_type='application/zip')
+    response['Content-Disposition'] = (
+        f'attachment; filename="yatube-{request.user.username}.zip"')
+    return response
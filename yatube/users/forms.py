@@ -1,6 +1,9 @@
+from django import forms
 from django.contrib.auth import get_user_model
 from django.contrib.auth.forms import UserCreationForm
 
+from posts.usernames import is_reserved_username
+
 User = get_user_model()
 
 
@@ -8,3 +11,10 @@ class CreationForm(UserCreationForm):
     class Meta(UserCreationForm.Meta):
         model = User
         fields = ("first_name", "last_name", "username", "email")
+
+    def clean_username(self):
+        username = self.cleaned_data["username"]
+        if is_reserved_username(username):
+            raise forms.ValidationError(
+                "Это имя занято адресом сайта, выберите другое.")
+        return username
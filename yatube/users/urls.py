@@ -1,7 +1,11 @@
+from django.contrib.auth.views import LoginView
 from django.urls import path
 
+from yatube.ratelimit import ratelimit
+
 from . import views
 
 urlpatterns = [
-    path("signup/", views.SignUp.as_view(), name="signup")
+    path("signup/", views.SignUp.as_view(), name="signup"),
+    path("login/", ratelimit('login')(LoginView.as_view()), name="login"),
 ]
@@ -0,0 +1,74 @@
+import gzip
+import io
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class StreamingBuffer(io.BytesIO):
+    def read(self):
+        data = self.getvalue()
+        self.seek(0)
+        self.truncate()
+        return data
+
+
+def gzip_compress(data, level=9, filename=""):
+    buffer = io.BytesIO()
+    # mtime=0 — одинаковый вход даёт побайтно одинаковый результат
+    with gzip.GzipFile(filename=filename, fileobj=buffer, mode="wb",
+                       compresslevel=level, mtime=0) as gz:
+        gz.write(data)
+    return buffer.getvalue()
+
+
+def gzip_stream(chunks, level=6, filename="", flush_size=0):
+    """Сжимает поток кусков; память ограничена буфером zlib.
+
+    Сжатое отдаётся, когда его выдаёт zlib, а Z_SYNC_FLUSH делается
+    только после flush_size несжатых байт: сброс после каждого мелкого
+    куска портит степень сжатия. flush_size=0 — сброс после каждого
+    куска, для событий, которые клиент должен получить сразу.
+    """
+    buffer = StreamingBuffer()
+    pending = 0
+    with gzip.GzipFile(filename=filename, fileobj=buffer, mode="wb",
+                       compresslevel=level, mtime=0) as gz:
+        for chunk in chunks:
+            gz.write(chunk)
+            pending += len(chunk)
+            if pending >= flush_size:
+                gz.flush()
+                pending = 0
+            data = buffer.read()
+            if data:
+                yield data
+    yield buffer.read()
+
+
+def brotli_compress(data, quality=11):
+    return brotli.compress(data, quality=quality)
+
+
+def brotli_stream(chunks, quality=5, flush_size=0):
+    """То же для brotli: сброс после flush_size несжатых байт."""
+    compressor = brotli.Compressor(quality=quality)
+    pending = 0
+    for chunk in chunks:
+        data = compressor.process(chunk)
+        pending += len(chunk)
+        if pending >= flush_size:
+            data += compressor.flush()
+            pending = 0
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def precompressed_encodings():
+    encodings = [(".gz", "gzip", gzip_compress)]
+    if brotli is not None:
+        encodings.insert(0, (".br", "br", brotli_compress))
+    return encodings
@@ -0,0 +1,59 @@
+def accepted_encodings(header):
+    """Кодировки из Accept-Encoding с ненулевым q."""
+    encodings = set()
+    for item in header.split(","):
+        token, _, params = item.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            encodings.add(token)
+    return encodings
+
+
+def parse_range(header, size):
+    """Один диапазон из Range: (начало, конец включительно).
+
+    None — заголовка нет или он не разобран (отдаётся весь файл),
+    False — диапазон вне файла (416). Несколько диапазонов сразу
+    не поддерживаются и тоже дают весь файл.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if not first:
+            length = int(last)
+            if length <= 0:
+                return False
+            return max(size - length, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if last and start > end:
+        return None
+    if start >= size:
+        return False
+    return start, min(end, size - 1)
+
+
+def etag_matches(header, etag):
+    """Совпадает ли etag с одним из тегов If-None-Match (слабое сравнение)."""
+    if header.strip() == "*":
+        return True
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for tag in header.split(","):
+        tag = tag.strip()
+        if (tag[2:] if tag.startswith("W/") else tag) == bare:
+            return True
+    return False
@@ -0,0 +1,97 @@
+import secrets
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from .compression import (brotli, brotli_compress, brotli_stream,
+                          gzip_compress, gzip_stream)
+from .http import accepted_encodings
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Сжимает ответ в br или gzip — что поддерживает клиент.
+
+    Страницы с CSRF-токеном в BREACH-безопасном режиме сжимаются только
+    gzip со случайной длиной заголовка, чтобы размер ответа
+    не выдавал содержимое токена.
+    """
+
+    def process_response(self, request, response):
+        if not self.is_compressible(response):
+            return response
+        patch_vary_headers(response, ("Accept-Encoding",))
+        breach_safe = (settings.COMPRESSION_BREACH_SAFE
+                       and request.META.get("CSRF_COOKIE_USED"))
+        encoding = self.choose_encoding(request, breach_safe)
+        if encoding is None:
+            return response
+        filename = ""
+        if breach_safe:
+            filename = "x" * (1 + secrets.randbelow(
+                settings.COMPRESSION_BREACH_MAX_PADDING))
+
+        if response.streaming:
+            self.compress_stream(response, encoding, filename)
+        elif not self.compress_content(response, encoding, filename):
+            return response
+
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        response["Content-Encoding"] = encoding
+        return response
+
+    def is_compressible(self, response):
+        if response.has_header("Content-Encoding"):
+            return False
+        # сжатый кусок не совпал бы с байтами из Content-Range
+        if response.status_code == 206 or response.has_header(
+                "Content-Range"):
+            return False
+        if "no-transform" in response.get("Cache-Control", ""):
+            return False
+        content_type = response.get("Content-Type", "").split(";")[0]
+        if content_type.strip() not in settings.COMPRESSION_CONTENT_TYPES:
+            return False
+        return (response.streaming
+                or len(response.content) >= settings.COMPRESSION_MIN_SIZE)
+
+    def choose_encoding(self, request, breach_safe):
+        accepted = accepted_encodings(
+            request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if "br" in accepted and brotli is not None and not breach_safe:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    def compress_stream(self, response, encoding, filename):
+        flush_size = settings.COMPRESSION_STREAM_FLUSH_SIZE
+        content_type = response.get("Content-Type", "").split(";")[0]
+        if content_type.strip() in settings.COMPRESSION_FLUSH_CONTENT_TYPES:
+            # каждое событие должно дойти до клиента сразу
+            flush_size = 0
+        if encoding == "br":
+            response.streaming_content = brotli_stream(
+                response.streaming_content,
+                settings.COMPRESSION_BROTLI_QUALITY, flush_size)
+        else:
+            response.streaming_content = gzip_stream(
+                response.streaming_content,
+                settings.COMPRESSION_GZIP_LEVEL, filename, flush_size)
+        del response["Content-Length"]
+
+    def compress_content(self, response, encoding, filename):
+        """Сжимает тело; False — если сжатое вышло не короче исходного."""
+        if encoding == "br":
+            compressed = brotli_compress(
+                response.content, settings.COMPRESSION_BROTLI_QUALITY)
+        else:
+            compressed = gzip_compress(
+                response.content, settings.COMPRESSION_GZIP_LEVEL, filename)
+        if len(compressed) >= len(response.content):
+            return False
+        response.content = compressed
+        response["Content-Length"] = str(len(compressed))
+        return True
@@ -0,0 +1,99 @@
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+# Время в корзинах — целые миллисекунды: incr в memcached и redis
+# работает только с целыми.
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+
+def parse_rate(rate):
+    """'10/m' -> (10, 60): ёмкость корзины и время её полного наполнения."""
+    count, _, period = rate.partition('/')
+    return int(count), PERIODS[period]
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+def take_token(key, rate, cache=None):
+    """Берёт жетон из корзины key; возвращает 0 или сколько секунд ждать.
+
+    Корзина хранится как одно число — момент, когда она снова будет
+    полной (GCRA, эквивалент token bucket). Каждый запрос атомарно
+    сдвигает его incr-ом на интервал между жетонами; если сдвиг
+    вышел за ёмкость, он откатывается decr-ом. Простоявшая корзина
+    подтягивается к текущему времени обычным set — в гонке с ним
+    лишний жетон получат лишь запросы, пришедшие в ту же миллисекунду.
+    Пропавший из кэша ключ означает полную корзину.
+    """
+    cache = cache or caches[settings.RATE_LIMIT_CACHE]
+    capacity, period = parse_rate(rate)
+    interval = period * 1000 // capacity
+    now = _now_ms()
+    try:
+        full_at = cache.incr(key, interval)
+    except ValueError:
+        if cache.add(key, now + interval, period):
+            return 0
+        full_at = cache.incr(key, interval)
+    if full_at - interval < now:
+        cache.set(key, now + interval, period)
+        return 0
+    if full_at - now > period * 1000:
+        cache.decr(key, interval)
+        return (full_at - now - period * 1000) / 1000
+    # ключ должен дожить до момента, когда корзина снова полна
+    cache.touch(key, math.ceil((full_at - now) / 1000) + 1)
+    return 0
+
+
+def _identity(request, scope, name):
+    if scope == 'view':
+        return name
+    if scope == 'user' and request.user.is_authenticated:
+        return f'user:{request.user.id}'
+    return f'ip:{request.META.get("REMOTE_ADDR", "")}'
+
+
+def check_limits(request, name):
+    """Проверяет все правила политики name; 0 или время ожидания."""
+    wait = 0
+    for scope, rate in settings.RATE_LIMITS.get(name, ()):
+        key = f'rl:{name}:{rate}:{_identity(request, scope, name)}'
+        wait = max(wait, take_token(key, rate))
+        if wait:
+            break
+    return wait
+
+
+def too_many_requests(wait):
+    response = HttpResponse('Слишком много запросов, попробуйте позже',
+                            status=429)
+    response['Retry-After'] = str(max(1, math.ceil(wait)))
+    return response
+
+
+def ratelimit(name, methods=('POST',)):
+    """Ограничивает представление по политике RATE_LIMITS[name].
+
+    Правило — пара (область, 'N/период'); область user (для анонима —
+    ip), ip или view — общая корзина представления. Учитываются только
+    запросы с методами из methods; methods=None — все.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (settings.RATE_LIMIT_ENABLED
+                    and (methods is None or request.method in methods)):
+                wait = check_limits(request, name)
+                if wait:
+                    return too_many_requests(wait)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
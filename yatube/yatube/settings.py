@@ -31,6 +31,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'yatube.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -55,6 +56,8 @@ TEMPLATES = [
         'OPTIONS': {
             'context_processors': [
                 'context_processors.year',
+                'context_processors.notifications',
+                'context_processors.live',
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
@@ -78,6 +81,15 @@ DATABASES = {
 }
 
 
+# Шарды постов и комментариев (posts.sharding)
+
+# автор попадает в POST_SHARDS[id % число шардов]; пользователи и группы
+# живут в 'default' и копируются на остальные шарды.
+# Пример с тремя SQLite-файлами — yatube.settings_sharded
+POST_SHARDS = ('default',)
+DATABASE_ROUTERS = ['posts.sharding.ShardRouter']
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -99,7 +111,14 @@ AUTH_PASSWORD_VALIDATORS = [
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    },
+    # корзины ограничения частоты; с несколькими воркерами —
+    # общий для них memcached или redis
+    'ratelimit': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'ratelimit',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
 }
 
 
@@ -117,14 +136,183 @@ USE_L10N = True
 USE_TZ = False
 
 
+# Посты в лентах (posts.models.RenderedText)
+
+# длина начала поста, которое показывается в лентах, символы
+POST_EXCERPT_LENGTH = 500
+
+
+# Популярные посты (posts.trending)
+
+# период полураспада вклада события в рейтинг, секунды
+TRENDING_HALF_LIFE = 6 * 60 * 60
+TRENDING_REACH_WEIGHT = 1.0
+# update_trending пересчитывает посты с активностью за это окно, секунды
+TRENDING_WINDOW = 60 * 60
+
+
+# Рекомендации авторов (posts.recommendations)
+
+RECOMMENDATIONS_TOP_K = 20
+RECOMMENDATIONS_SHOWN = 5
+# сколько подписок промежуточного автора просматривать (выборкой)
+RECOMMENDATIONS_MAX_DEGREE = 1000
+# сколько рёбер графа просматривать на одного пользователя
+RECOMMENDATIONS_MAX_EDGES = 50000
+
+
+# Граф подписок в памяти процесса (posts.follow_graph)
+
+# как часто догонять журнал изменений, чтобы увидеть подписки,
+# сделанные в других процессах (секунды)
+FOLLOW_GRAPH_SYNC_INTERVAL = 1
+# при большем отставании граф перечитывается целиком
+FOLLOW_GRAPH_CATCH_UP_LIMIT = 10000
+# сколько имён можно передать в /follow/batch/ за раз
+BULK_FOLLOW_LIMIT = 1000
+
+
+# Имена пользователей в адресах (posts.usernames)
+
+USERNAME_CACHE_TIMEOUT = 24 * 60 * 60
+# несуществующее имя, секунды
+USERNAME_MISSING_TIMEOUT = 60
+# копия в памяти процесса; переименование в другом воркере
+# становится видно через это время, секунды
+USERNAME_LOCAL_TTL = 60
+USERNAME_LOCAL_SIZE = 10000
+
+
+# Архив старых постов (posts.archive)
+
+ARCHIVE_AFTER_DAYS = 365
+
+
+# Удаление в фоне (posts.deletion)
+
+# строк в одной транзакции удаления
+DELETION_BATCH_SIZE = 500
+# как долго другие воркеры могут не знать о новом удалении, секунды
+DELETION_HIDDEN_TIMEOUT = 60
+
+
+# Уведомления (posts.notifications)
+
+# однотипные события к одной записи за это время сливаются в одно, секунды
+NOTIFICATIONS_DEDUPE_WINDOW = 60 * 60
+
+
+# Живые обновления по SSE (posts.live)
+
+# Каждое открытое SSE-соединение держит поток воркера до LIVE_MAX_AGE.
+# Включать только с потоковыми или асинхронными воркерами, например
+# gunicorn --worker-class gthread --threads 64 или --worker-class gevent:
+# с синхронными воркерами несколько вкладок займут весь пул.
+LIVE_ENABLED = False
+# как часто процесс проверяет новые посты и комментарии, секунды
+LIVE_POLL_INTERVAL = 2
+LIVE_BUFFER_SIZE = 1000
+# комментарий-пинг, если событий нет, секунды
+LIVE_HEARTBEAT = 15
+# после этого соединение закрывается, клиент переподключится, секунды
+LIVE_MAX_AGE = 5 * 60
+LIVE_RETRY_MS = 5000
+# каждое соединение занимает поток воркера
+LIVE_MAX_CONNECTIONS = 100
+LIVE_MAX_CONNECTIONS_PER_USER = 3
+
+
+# Поиск почти повторов (posts.dedup)
+
+# 'flag' — сохранить и пометить, 'reject' — не принимать форму
+DEDUP_ACTION = 'flag'
+# оценка сходства по Жаккару, с которой текст считается повтором
+DEDUP_THRESHOLD = 0.8
+# более короткие тексты («Спасибо!») не сравниваются
+DEDUP_MIN_LENGTH = 40
+
+
+# Ограничение частоты запросов (yatube.ratelimit)
+
+RATE_LIMIT_ENABLED = True
+RATE_LIMIT_CACHE = 'ratelimit'
+# политика -> правила (область, 'запросов/период'), область: user, ip, view
+RATE_LIMITS = {
+    'new_post': (('user', '10/m'), ('user', '200/d')),
+    'add_comment': (('user', '20/m'), ('ip', '60/m')),
+    'follow': (('user', '30/m'),),
+    'follow_batch': (('user', '5/m'),),
+    # каждая попытка — проверка пароля PBKDF2
+    'login': (('ip', '10/m'), ('view', '600/m')),
+}
+
+# Прогрев воркера (yatube.warmup)
+
+WARMUP_ENABLED = True
+# модули, которые иначе импортировались бы на первом запросе
+WARMUP_IMPORTS = (
+    'posts.templatetags.feed_thumbnails',
+    'sorl.thumbnail.templatetags.thumbnail',
+    'users.templatetags.user_filters',
+)
+# Pillow нужен только при загрузке картинок и создании миниатюр
+WARMUP_IMAGE_IMPORTS = ('PIL.Image', 'sorl.thumbnail.engines.pil_engine')
+# True — не импортировать WARMUP_IMAGE_IMPORTS заранее
+WARMUP_LAZY_IMPORTS = False
+WARMUP_PAGES = ('/',)
+# сколько групп с наибольшим числом постов прогреть
+WARMUP_GROUPS = 10
+
+# Сжатие ответов (yatube.middleware.CompressionMiddleware)
+
+COMPRESSION_MIN_SIZE = 200
+COMPRESSION_CONTENT_TYPES = (
+    'text/html',
+    'text/plain',
+    'text/css',
+    'text/csv',
+    'application/javascript',
+    'application/json',
+    'application/x-ndjson',
+    'image/svg+xml',
+    'text/event-stream',
+)
+# потоковый ответ сбрасывается клиенту не чаще, чем раз на столько
+# несжатых байт, — кроме типов, где важен каждый кусок
+COMPRESSION_STREAM_FLUSH_SIZE = 64 * 1024
+COMPRESSION_FLUSH_CONTENT_TYPES = ('text/event-stream',)
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
+# страницы с CSRF-токеном сжимаются только gzip со случайным паддингом
+COMPRESSION_BREACH_SAFE = True
+COMPRESSION_BREACH_MAX_PADDING = 100
+
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/2.2/howto/static-files/
 
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
+# collectstatic кладёт файлы с хэшем в имени и их .gz/.br версии
+STATICFILES_STORAGE = 'yatube.storage.CompressedManifestStaticFilesStorage'
+STATIC_COMPRESS_MIN_SIZE = 256
+# для файлов без хэша в имени
+STATIC_MAX_AGE = 60 * 60
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+DEFAULT_FILE_STORAGE = 'yatube.storage.ShardedFileSystemStorage'
+# загрузки в эти каталоги раскладываются по хэшу содержимого
+MEDIA_SHARDED_DIRS = ('posts',)
+MEDIA_SHARD_DEPTH = 2
+# имена в этих каталогах не переиспользуются (миниатюры sorl)
+MEDIA_IMMUTABLE_PREFIXES = ('cache/',)
+MEDIA_MAX_AGE = 60 * 60
+# None — отдавать файлы самим (os.sendfile через wsgi.file_wrapper),
+# 'nginx' — X-Accel-Redirect на MEDIA_SENDFILE_PREFIX,
+# 'apache' — X-Sendfile с полным путём к файлу
+MEDIA_SENDFILE = None
+MEDIA_SENDFILE_PREFIX = '/protected-media/'
 
 
 LOGIN_URL = "/auth/login/"
@@ -0,0 +1,25 @@
+"""Три шарда постов в отдельных SQLite-файлах — для локальной проверки.
+
+DJANGO_SETTINGS_MODULE=yatube.settings_sharded python manage.py migrate
+--database=shard1 (и shard2, и default). С теми же настройками
+python manage.py test прогоняет все тесты на трёх шардах.
+"""
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES
+
+DATABASES = {
+    **DATABASES,
+    'shard1': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db-shard1.sqlite3'),
+    },
+    'shard2': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db-shard2.sqlite3'),
+    },
+}
+POST_SHARDS = ('default', 'shard1', 'shard2')
+# каждый тест пишет копии пользователей на шарды (yatube.test_runner)
+TEST_RUNNER = 'yatube.test_runner.ShardedTestRunner'
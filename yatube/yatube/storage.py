@@ -0,0 +1,102 @@
+import hashlib
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+
+from .compression import precompressed_encodings
+
+COMPRESSIBLE_EXTENSIONS = (
+    ".css", ".js", ".map", ".svg", ".txt", ".html", ".json", ".xml",
+    ".eot", ".ttf", ".otf", ".ico",
+)
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Хэширует имена статики и кладёт рядом .gz и .br версии."""
+
+    manifest_strict = False
+    _immutable_names = None
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            # Файл не собран collectstatic — отдаём исходное имя,
+            # чтобы шаблоны рендерились и без сборки статики.
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for hashed_name in set(self.hashed_files.values()):
+            if not hashed_name.endswith(COMPRESSIBLE_EXTENSIONS):
+                continue
+            for name, processed in self.compress(hashed_name):
+                yield hashed_name, name, processed
+
+    def compress(self, name):
+        with self.open(name) as original:
+            data = original.read()
+        min_size = getattr(settings, "STATIC_COMPRESS_MIN_SIZE", 256)
+        if len(data) < min_size:
+            return
+        for suffix, _, compressor in precompressed_encodings():
+            compressed = compressor(data)
+            if len(compressed) >= len(data):
+                continue
+            compressed_name = name + suffix
+            if self.exists(compressed_name):
+                self.delete(compressed_name)
+            self._save(compressed_name, ContentFile(compressed))
+            yield compressed_name, True
+
+    def is_immutable(self, name):
+        if self._immutable_names is None:
+            self._immutable_names = frozenset(self.hashed_files.values())
+        return name in self._immutable_names
+
+
+def content_hash(file):
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def sharded_name(directory, digest, filename):
+    """posts/ab/cd/abcd….jpg — по два hex-символа хэша на уровень."""
+    ext = os.path.splitext(filename)[1].lower()
+    levels = [digest[level * 2:level * 2 + 2]
+              for level in range(settings.MEDIA_SHARD_DEPTH)]
+    return posixpath.join(directory, *levels, digest + ext)
+
+
+def sharded_pattern(directory):
+    """Регулярное выражение для имён, уже разложенных по каталогам."""
+    return ("^" + re.escape(directory) + "/"
+            + "[0-9a-f]{2}/" * settings.MEDIA_SHARD_DEPTH + "[0-9a-f]{64}")
+
+
+class ShardedFileSystemStorage(FileSystemStorage):
+    """Раскладывает загрузки в MEDIA_SHARDED_DIRS по хэшу содержимого.
+
+    upload_to у полей не меняется: файл, сохраняемый как
+    posts/cat.jpg, ложится в posts/ab/cd/<sha256>.jpg. При глубине 2
+    в одном каталоге оказывается в 65536 раз меньше файлов,
+    чем в плоском posts/.
+    """
+
+    def save(self, name, content, max_length=None):
+        directory, filename = posixpath.split(name)
+        if directory in settings.MEDIA_SHARDED_DIRS:
+            name = sharded_name(directory, content_hash(content), filename)
+        return super().save(name, content, max_length)
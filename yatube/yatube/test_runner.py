@@ -0,0 +1,25 @@
+from unittest import TestSuite
+
+from django.test.runner import DiscoverRunner
+
+
+def _test_cases(suite):
+    for test in suite:
+        if isinstance(test, TestSuite):
+            yield from _test_cases(test)
+        else:
+            yield test
+
+
+class ShardedTestRunner(DiscoverRunner):
+    """Открывает каждому тесту все базы из DATABASES.
+
+    Копии пользователей и групп пишутся на шарды (posts.sharding.replicate)
+    из любого теста и должны откатываться вместе с его транзакцией.
+    """
+
+    def build_suite(self, *args, **kwargs):
+        suite = super().build_suite(*args, **kwargs)
+        for test in _test_cases(suite):
+            type(test).databases = '__all__'
+        return suite
@@ -0,0 +1,120 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import Client, TestCase, override_settings
+
+MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+CONTENT = bytes(range(256)) * 4
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class MediaServingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(os.path.join(MEDIA_ROOT, 'posts', 'ab', 'cd'))
+        os.makedirs(os.path.join(MEDIA_ROOT, 'avatars'))
+        cls.sharded = 'posts/ab/cd/' + 'abcd' + '0' * 60 + '.jpg'
+        for name in (cls.sharded, 'avatars/me.jpg', 'avatars/notes.txt'):
+            with open(os.path.join(MEDIA_ROOT, name), 'wb') as f:
+                f.write(CONTENT)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = Client()
+        self.url = settings.MEDIA_URL + self.sharded
+
+    def get(self, url=None, **headers):
+        response = self.client.get(url or self.url, **headers)
+        body = b''.join(getattr(response, 'streaming_content', []))
+        return response, body
+
+    def test_full_file_with_validators(self):
+        """Файл целиком: длина, ETag, Accept-Ranges, immutable для хэша."""
+        response, body = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, CONTENT)
+        self.assertEqual(response['Content-Length'], str(len(CONTENT)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_plain_name_is_not_immutable(self):
+        """Имя без хэша кэшируется на MEDIA_MAX_AGE."""
+        response, _ = self.get(settings.MEDIA_URL + 'avatars/me.jpg')
+        self.assertEqual(response['Cache-Control'],
+                         f'public, max-age={settings.MEDIA_MAX_AGE}')
+
+    def test_not_modified(self):
+        """Совпавший ETag в If-None-Match даёт 304."""
+        etag = self.get()[0]['ETag']
+        response, _ = self.get(HTTP_IF_NONE_MATCH=f'"other", W/{etag}')
+        self.assertEqual(response.status_code, 304)
+
+    def test_ranges(self):
+        """Диапазоны с началом и концом, открытые и суффиксные."""
+        size = len(CONTENT)
+        for header, start, end in (('bytes=10-19', 10, 19),
+                                   ('bytes=1000-', 1000, size - 1),
+                                   ('bytes=-4', size - 4, size - 1),
+                                   ('bytes=1020-5000', 1020, size - 1)):
+            with self.subTest(header=header):
+                response, body = self.get(HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(body, CONTENT[start:end + 1])
+                self.assertEqual(response['Content-Range'],
+                                 f'bytes {start}-{end}/{size}')
+                self.assertEqual(response['Content-Length'],
+                                 str(end - start + 1))
+
+    def test_range_is_not_compressed(self):
+        """Диапазон отдаётся как есть, даже если клиент принимает gzip."""
+        response, body = self.get(
+            settings.MEDIA_URL + 'avatars/notes.txt',
+            HTTP_RANGE='bytes=0-9', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 206)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['Content-Range'],
+                         f'bytes 0-9/{len(CONTENT)}')
+        self.assertEqual(body, CONTENT[:10])
+
+    def test_unsatisfiable_range(self):
+        """Диапазон за концом файла даёт 416."""
+        response, _ = self.get(HTTP_RANGE='bytes=5000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(CONTENT)}')
+
+    def test_stale_if_range_returns_whole_file(self):
+        """Устаревший If-Range и несколько диапазонов дают весь файл."""
+        for headers in ({'HTTP_RANGE': 'bytes=0-9',
+                         'HTTP_IF_RANGE': '"stale"'},
+                        {'HTTP_RANGE': 'bytes=0-9,20-29'}):
+            response, body = self.get(**headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(body, CONTENT)
+
+    def test_outside_media_root(self):
+        """Путь за пределами MEDIA_ROOT и отсутствующий файл дают 404."""
+        for path in ('../settings.py', 'posts/missing.jpg'):
+            response = self.client.get(settings.MEDIA_URL + path)
+            self.assertEqual(response.status_code, 404)
+
+    @override_settings(MEDIA_SENDFILE='nginx')
+    def test_nginx_offload(self):
+        """С nginx отдаётся только заголовок X-Accel-Redirect."""
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'],
+                         settings.MEDIA_SENDFILE_PREFIX + self.sharded)
+        self.assertEqual(response.content, b'')
+
+    @override_settings(MEDIA_SENDFILE='apache')
+    def test_apache_offload(self):
+        """С apache отдаётся X-Sendfile с полным путём."""
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Sendfile'],
+                         os.path.join(MEDIA_ROOT, self.sharded))
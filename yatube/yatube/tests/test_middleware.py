@@ -0,0 +1,124 @@
+import gzip
+import unittest
+import zlib
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from ..compression import brotli
+from ..middleware import CompressionMiddleware
+
+PAGE = ('<p>Тестовый текст</p>' * 100).encode()
+
+
+class CompressionMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def process(self, response, accept='gzip, br', **meta):
+        request = self.factory.get('/', HTTP_ACCEPT_ENCODING=accept, **meta)
+        middleware = CompressionMiddleware(lambda request: response)
+        return middleware(request)
+
+    def test_gzip_html(self):
+        """HTML сжимается gzip, если клиент не знает br."""
+        response = self.process(HttpResponse(PAGE), accept='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(response.content), PAGE)
+        self.assertEqual(response['Content-Length'],
+                         str(len(response.content)))
+
+    @unittest.skipIf(brotli is None, 'brotli не установлен')
+    def test_brotli_preferred(self):
+        """При поддержке br выбирается brotli."""
+        response = self.process(HttpResponse(PAGE))
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), PAGE)
+
+    def test_small_response_not_compressed(self):
+        """Короткие ответы не сжимаются."""
+        response = self.process(HttpResponse(b'ok'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_content_type_allowlist(self):
+        """Типы вне списка не сжимаются."""
+        response = self.process(
+            HttpResponse(PAGE, content_type='image/png'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_identity(self):
+        """Без Accept-Encoding ответ не меняется."""
+        response = self.process(HttpResponse(PAGE), accept='')
+        self.assertEqual(response.content, PAGE)
+
+    def test_streaming_is_compressed_lazily(self):
+        """Потоковый ответ сжимается по мере чтения, не целиком."""
+        consumed = []
+
+        def chunks():
+            for i in range(3):
+                consumed.append(i)
+                yield PAGE
+
+        response = self.process(StreamingHttpResponse(chunks()),
+                                accept='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        stream = iter(response.streaming_content)
+        body = next(stream)
+        self.assertEqual(consumed, [0])
+        body += b''.join(stream)
+        self.assertEqual(consumed, [0, 1, 2])
+        self.assertEqual(gzip.decompress(body), PAGE * 3)
+
+    def test_small_chunks_are_not_flushed_one_by_one(self):
+        """Мелкие куски копятся до COMPRESSION_STREAM_FLUSH_SIZE."""
+        chunks = [b'<p>%d</p>' % i for i in range(1000)]
+        response = self.process(StreamingHttpResponse(chunks),
+                                accept='gzip')
+        pieces = [piece for piece in response.streaming_content if piece]
+        self.assertLess(len(pieces), 10)
+        self.assertEqual(gzip.decompress(b''.join(pieces)),
+                         b''.join(chunks))
+
+    def test_event_stream_is_flushed_per_chunk(self):
+        """События сбрасываются клиенту сразу после каждого куска."""
+        events = [b'data: %d\n\n' % i for i in range(3)]
+        response = self.process(
+            StreamingHttpResponse(events, content_type='text/event-stream'),
+            accept='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        stream = iter(response.streaming_content)
+        for event in events:
+            self.assertEqual(decompressor.decompress(next(stream)), event)
+
+    @unittest.skipIf(brotli is None, 'brotli не установлен')
+    def test_event_stream_is_flushed_per_chunk_brotli(self):
+        events = [b'data: %d\n\n' % i for i in range(3)]
+        response = self.process(
+            StreamingHttpResponse(events, content_type='text/event-stream'))
+        self.assertEqual(response['Content-Encoding'], 'br')
+        decompressor = brotli.Decompressor()
+        stream = iter(response.streaming_content)
+        for event in events:
+            self.assertEqual(decompressor.process(next(stream)), event)
+
+    @override_settings(COMPRESSION_BREACH_SAFE=True)
+    def test_breach_safe_mode(self):
+        """Страница с CSRF-токеном сжимается gzip со случайным паддингом."""
+        lengths = set()
+        for _ in range(10):
+            response = self.process(HttpResponse(PAGE),
+                                    CSRF_COOKIE_USED=True)
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(gzip.decompress(response.content), PAGE)
+            lengths.add(len(response.content))
+        self.assertGreater(len(lengths), 1)
+
+    def test_already_encoded_response_is_skipped(self):
+        """Уже сжатый ответ не сжимается повторно."""
+        response = HttpResponse(PAGE)
+        response['Content-Encoding'] = 'gzip'
+        self.assertEqual(self.process(response).content, PAGE)
@@ -0,0 +1,101 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.test import (Client, RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+from django.urls import reverse
+
+from ..ratelimit import parse_rate, ratelimit, take_token
+
+User = get_user_model()
+
+
+class TakeTokenTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = caches['ratelimit']
+        self.cache.clear()
+
+    def take(self, rate, now):
+        with mock.patch('yatube.ratelimit.time.time', return_value=now):
+            return take_token('bucket', rate, self.cache)
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('10/m'), (10, 60))
+        self.assertEqual(parse_rate('1/d'), (1, 86400))
+
+    def test_burst_then_refill(self):
+        """Полная корзина отдаёт ёмкость сразу, дальше — по жетону."""
+        for _ in range(3):
+            self.assertEqual(self.take('3/m', 1000), 0)
+        self.assertAlmostEqual(self.take('3/m', 1000), 20)
+        self.assertAlmostEqual(self.take('3/m', 1010), 10)
+        self.assertEqual(self.take('3/m', 1020), 0)
+        self.assertGreater(self.take('3/m', 1020), 0)
+
+    def test_idle_bucket_does_not_bank_tokens(self):
+        self.take('3/m', 1000)
+        for _ in range(3):
+            self.assertEqual(self.take('3/m', 5000), 0)
+        self.assertGreater(self.take('3/m', 5000), 0)
+
+
+@override_settings(RATE_LIMITS={'test': (('ip', '2/m'), ('view', '3/m'))})
+class RateLimitDecoratorTests(SimpleTestCase):
+    def setUp(self):
+        caches['ratelimit'].clear()
+        self.factory = RequestFactory()
+        self.view = ratelimit('test')(lambda request: HttpResponse('ok'))
+
+    def call(self, method='post', ip='10.0.0.1'):
+        request = getattr(self.factory, method)('/', REMOTE_ADDR=ip)
+        request.user = mock.Mock(is_authenticated=False)
+        return self.view(request)
+
+    def test_ip_and_view_buckets(self):
+        self.assertEqual(self.call().status_code, 200)
+        self.assertEqual(self.call().status_code, 200)
+        response = self.call()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(self.call(ip='10.0.0.2').status_code, 200)
+        self.assertEqual(self.call(ip='10.0.0.3').status_code, 429)
+
+    def test_get_is_not_counted(self):
+        for _ in range(5):
+            self.assertEqual(self.call('get').status_code, 200)
+
+    @override_settings(RATE_LIMIT_ENABLED=False)
+    def test_disabled(self):
+        for _ in range(5):
+            self.assertEqual(self.call().status_code, 200)
+
+
+@override_settings(RATE_LIMITS={'login': (('ip', '2/m'),),
+                                'add_comment': (('user', '1/m'),)})
+class RateLimitedViewsTests(TestCase):
+    def setUp(self):
+        caches['ratelimit'].clear()
+        self.user = User.objects.create_user(username='name',
+                                             password='secret')
+
+    def test_login(self):
+        client = Client()
+        for _ in range(2):
+            response = client.post(reverse('login'),
+                                   {'username': 'name', 'password': 'wrong'})
+            self.assertEqual(response.status_code, 200)
+        response = client.post(reverse('login'),
+                               {'username': 'name', 'password': 'secret'})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    def test_add_comment(self):
+        client = Client()
+        client.force_login(self.user)
+        post = self.user.posts.create(text='Текст')
+        url = reverse('posts:add_comment', args=['name', post.id])
+        self.assertEqual(client.post(url, {'text': 'Раз'}).status_code, 302)
+        self.assertEqual(client.post(url, {'text': 'Два'}).status_code, 429)
+        self.assertEqual(post.comments.count(), 1)
@@ -0,0 +1,96 @@
+import gzip
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import Client, TestCase, override_settings
+
+SOURCE_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+STATIC_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(STATICFILES_DIRS=[SOURCE_DIR], STATIC_ROOT=STATIC_ROOT)
+class StaticPipelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(os.path.join(SOURCE_DIR, 'css'))
+        with open(os.path.join(SOURCE_DIR, 'css', 'site.css'), 'w') as f:
+            f.write('body { margin: 0; }\n' * 100)
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(SOURCE_DIR, ignore_errors=True)
+        shutil.rmtree(STATIC_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = Client()
+        self.hashed_name = staticfiles_storage.stored_name('css/site.css')
+
+    def test_collectstatic_writes_hashed_and_gzip_files(self):
+        """collectstatic создаёт файл с хэшем и его .gz версию."""
+        self.assertNotEqual(self.hashed_name, 'css/site.css')
+        gz_path = os.path.join(STATIC_ROOT, self.hashed_name + '.gz')
+        self.assertTrue(os.path.isfile(gz_path))
+        with gzip.open(gz_path) as f:
+            self.assertTrue(f.read().startswith(b'body { margin: 0; }'))
+
+    def test_static_tag_uses_hashed_name(self):
+        """Тег static отдаёт имя с хэшем."""
+        rendered = Template(
+            "{% load static %}{% static 'css/site.css' %}"
+        ).render(Context())
+        self.assertEqual(rendered, settings.STATIC_URL + self.hashed_name)
+
+    def test_missing_file_falls_back_to_plain_name(self):
+        """Несобранный файл не ломает рендер шаблона."""
+        self.assertEqual(
+            staticfiles_storage.stored_name('missing.css'), 'missing.css')
+
+    def test_precompressed_variant_is_served_immutable(self):
+        """Отдаётся сжатая версия с Cache-Control: immutable."""
+        response = self.client.get(
+            settings.STATIC_URL + self.hashed_name,
+            HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_identity_and_not_modified(self):
+        """Без Accept-Encoding отдаётся исходный файл, по ETag — 304."""
+        url = settings.STATIC_URL + self.hashed_name
+        response = self.client.get(url)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        response = self.client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_not_modified_by_etag_of_compressed_response(self):
+        """Слабый ETag ответа, сжатого на лету, тоже даёт 304."""
+        # у имени без хэша нет готовой .gz версии
+        url = settings.STATIC_URL + 'css/site.css'
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertTrue(response['ETag'].startswith('W/'))
+        response = self.client.get(
+            url, HTTP_ACCEPT_ENCODING='gzip',
+            HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_unhashed_name_is_not_immutable(self):
+        """Файл без хэша кэшируется ненадолго."""
+        response = self.client.get(settings.STATIC_URL + 'css/site.css')
+        self.assertNotIn('immutable', response['Cache-Control'])
+
+    def test_path_traversal_is_rejected(self):
+        """Выход за пределы STATIC_ROOT даёт 404."""
+        response = self.client.get(settings.STATIC_URL + '../manage.py')
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,68 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Group, Post
+
+from .. import warmup
+
+
+class WarmUpTests(TestCase):
+    def test_import_modules_reports_only_new_modules(self):
+        timings = warmup.import_modules(['json', 'yatube.warmup'])
+        self.assertEqual(timings, {})
+
+    def test_compile_templates(self):
+        self.assertGreater(warmup.compile_templates(), 10)
+
+    @override_settings(WARMUP_PAGES=('/', '/trending/'), WARMUP_GROUPS=1)
+    def test_warm_pages_requests_feeds_and_largest_group(self):
+        Group.objects.create(title='Пустая', slug='empty', description='')
+        big = Group.objects.create(title='Большая', slug='big',
+                                   description='')
+        Post.objects.create(
+            text='Пост', group=big,
+            author=get_user_model().objects.create_user(username='author'))
+        statuses = warmup.warm_pages()
+        self.assertEqual(
+            statuses[reverse('posts:group_posts', args=['big'])], 200)
+        self.assertEqual(statuses['/'], 200)
+        self.assertEqual(statuses['/trending/'], 200)
+        self.assertEqual(len(statuses), 3)
+
+    @override_settings(WARMUP_PAGES=('/',), WARMUP_GROUPS=0,
+                       ALLOWED_HOSTS=['.example.com'])
+    def test_warm_pages_uses_worker_handler(self):
+        """Страницы запрашиваются через WSGI-приложение воркера."""
+        handler = mock.Mock(return_value=mock.MagicMock())
+
+        def call(environ, start_response):
+            start_response('200 OK', [])
+            return handler.return_value
+
+        handler.side_effect = call
+        self.assertEqual(warmup.warm_pages(handler), {'/': 200})
+        environ = handler.call_args[0][0]
+        self.assertEqual((environ['PATH_INFO'], environ['HTTP_HOST']),
+                         ('/', 'example.com'))
+        handler.return_value.close.assert_called_once_with()
+
+    @override_settings(WARMUP_LAZY_IMPORTS=True, WARMUP_PAGES=(),
+                       WARMUP_GROUPS=0)
+    def test_lazy_mode_skips_image_imports(self):
+        with mock.patch.object(warmup, 'import_modules',
+                               return_value={}) as import_modules:
+            timings = warmup.warm_up()
+        self.assertEqual(set(timings),
+                         {'imports', 'templates', 'urls', 'pages'})
+        self.assertNotIn('PIL.Image', import_modules.call_args[0][0])
+
+    @override_settings(WARMUP_PAGES=(), WARMUP_GROUPS=0)
+    def test_failed_step_does_not_stop_warm_up(self):
+        with mock.patch.object(warmup, 'populate_resolver',
+                               side_effect=RuntimeError):
+            with self.assertLogs('yatube.warmup', 'ERROR'):
+                timings = warmup.warm_up()
+        self.assertIn('pages', timings)
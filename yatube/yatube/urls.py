@@ -2,10 +2,14 @@ from django.conf import settings
 from django.conf.urls import handler404, handler500
 from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
+
+from . import views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    re_path(r'^static/(?P<path>.*)$', views.serve_static, name='static'),
+    re_path(r'^media/(?P<path>.*)$', views.serve_media, name='media'),
     path("", include("posts.urls", namespace='app_posts')),
     path("auth/", include("users.urls")),
     path("auth/", include("django.contrib.auth.urls")),
@@ -0,0 +1,152 @@
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (FileResponse, Http404, HttpResponse,
+                         HttpResponseNotModified)
+from django.utils._os import safe_join
+from django.utils.http import http_date, quote_etag
+
+from .compression import precompressed_encodings
+from .http import accepted_encodings, etag_matches, parse_range
+from .storage import sharded_pattern
+
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+
+def serve_static(request, path):
+    try:
+        fullpath = safe_join(settings.STATIC_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(fullpath):
+        raise Http404
+
+    content_type, _ = mimetypes.guess_type(fullpath)
+    accepted = accepted_encodings(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+    served_path, content_encoding = fullpath, None
+    for suffix, encoding, _ in precompressed_encodings():
+        if encoding in accepted and os.path.isfile(fullpath + suffix):
+            served_path, content_encoding = fullpath + suffix, encoding
+            break
+
+    stat = os.stat(served_path)
+    etag = quote_etag("%x-%x%s" % (
+        int(stat.st_mtime), stat.st_size,
+        "-" + content_encoding if content_encoding else ""))
+    # CompressionMiddleware делает ETag слабым — сравнение тоже слабое
+    if etag_matches(request.META.get("HTTP_IF_NONE_MATCH", ""), etag):
+        response = HttpResponseNotModified()
+    else:
+        response = FileResponse(
+            open(served_path, "rb"),
+            content_type=content_type or "application/octet-stream")
+        response["Content-Length"] = stat.st_size
+        if content_encoding:
+            response["Content-Encoding"] = content_encoding
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(stat.st_mtime)
+    response["Vary"] = "Accept-Encoding"
+    if staticfiles_storage.is_immutable(path):
+        response["Cache-Control"] = (
+            f"public, max-age={IMMUTABLE_MAX_AGE}, immutable")
+    else:
+        response["Cache-Control"] = (
+            f"public, max-age={settings.STATIC_MAX_AGE}")
+    return response
+
+
+class RangeFile:
+    """Файл, из которого можно прочитать не больше length байт с начала.
+
+    fileno() остаётся доступен: wsgi.file_wrapper сервера (gunicorn,
+    uWSGI) отдаёт его через os.sendfile с текущей позиции, ограничиваясь
+    Content-Length, и байты не проходят через Python.
+    """
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def is_immutable_media(path):
+    """Имена миниатюр и разложенных по хэшу картинок зависят от содержимого."""
+    if path.startswith(settings.MEDIA_IMMUTABLE_PREFIXES):
+        return True
+    return any(re.match(sharded_pattern(directory), path)
+               for directory in settings.MEDIA_SHARDED_DIRS)
+
+
+def sendfile_response(path, fullpath, content_type):
+    response = HttpResponse(content_type=content_type)
+    if settings.MEDIA_SENDFILE == "nginx":
+        response["X-Accel-Redirect"] = (
+            settings.MEDIA_SENDFILE_PREFIX.rstrip("/") + "/" + path)
+    else:
+        response["X-Sendfile"] = fullpath
+    return response
+
+
+def serve_media(request, path):
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(fullpath):
+        raise Http404
+
+    content_type, _ = mimetypes.guess_type(fullpath)
+    content_type = content_type or "application/octet-stream"
+    if settings.MEDIA_SENDFILE:
+        # Range, ETag и кэширование берёт на себя фронтовой сервер
+        return sendfile_response(path, fullpath, content_type)
+
+    stat = os.stat(fullpath)
+    etag = quote_etag("%x-%x" % (int(stat.st_mtime), stat.st_size))
+    if etag_matches(request.META.get("HTTP_IF_NONE_MATCH", ""), etag):
+        response = HttpResponseNotModified()
+    else:
+        byte_range = None
+        if request.META.get("HTTP_IF_RANGE", etag) == etag:
+            byte_range = parse_range(
+                request.META.get("HTTP_RANGE", ""), stat.st_size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{stat.st_size}"
+            return response
+        start, end = byte_range or (0, stat.st_size - 1)
+        length = end - start + 1
+        response = FileResponse(
+            RangeFile(open(fullpath, "rb"), start, length),
+            content_type=content_type)
+        response["Content-Length"] = length
+        if byte_range:
+            response.status_code = 206
+            response["Content-Range"] = (
+                f"bytes {start}-{end}/{stat.st_size}")
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(stat.st_mtime)
+    if is_immutable_media(path):
+        response["Cache-Control"] = (
+            f"public, max-age={IMMUTABLE_MAX_AGE}, immutable")
+    else:
+        response["Cache-Control"] = f"public, max-age={settings.MEDIA_MAX_AGE}"
+    return response
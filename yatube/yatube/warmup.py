@@ -0,0 +1,148 @@
+import importlib
+import logging
+import os
+import sys
+import time
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.db.models import Count
+from django.template import engines
+from django.template.exceptions import TemplateSyntaxError
+from django.urls import URLResolver, get_resolver, reverse
+
+logger = logging.getLogger(__name__)
+
+
+def import_modules(names):
+    """Импортирует модули; возвращает время импорта каждого нового, мс."""
+    timings = {}
+    for name in names:
+        if name in sys.modules:
+            continue
+        started = time.perf_counter()
+        importlib.import_module(name)
+        timings[name] = (time.perf_counter() - started) * 1000
+    return timings
+
+
+def template_names(engine):
+    for directory in engine.template_dirs:
+        for root, _, files in os.walk(directory):
+            for filename in files:
+                if filename.endswith('.html'):
+                    yield os.path.relpath(
+                        os.path.join(root, filename), directory)
+
+
+def compile_templates():
+    """Компилирует все шаблоны: заодно импортируются библиотеки тегов.
+
+    Без DEBUG Django оборачивает загрузчики в cached.Loader, и
+    скомпилированные шаблоны остаются в памяти воркера.
+    """
+    compiled = 0
+    for engine in engines.all():
+        for name in template_names(engine):
+            try:
+                engine.get_template(name)
+            except TemplateSyntaxError:
+                logger.exception('Шаблон %s не компилируется', name)
+                continue
+            compiled += 1
+    return compiled
+
+
+def populate_resolver(resolver=None):
+    """Заполняет обратные словари URL всех вложенных пространств имён."""
+    resolver = resolver or get_resolver()
+    resolver.reverse_dict
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            populate_resolver(pattern)
+
+
+def _environ(path, host):
+    environ = {
+        'PATH_INFO': path,
+        'HTTP_HOST': host,
+        'SERVER_NAME': host,
+        'REMOTE_ADDR': '127.0.0.1',
+    }
+    setup_testing_defaults(environ)
+    return environ
+
+
+def request_page(handler, path, host):
+    """GET path через WSGI-обработчик воркера; возвращает код ответа."""
+    statuses = []
+
+    def start_response(status, headers, exc_info=None):
+        statuses.append(int(status.split()[0]))
+
+    body = handler(_environ(path, host), start_response)
+    try:
+        for _ in body:
+            pass
+    finally:
+        # request_finished: соединения с базой закрываются как после запроса
+        body.close()
+    return statuses[0]
+
+
+def warm_pages(handler=None):
+    """Запрашивает у себя первые страницы лент, как анонимный посетитель.
+
+    Заодно в кэш попадают число постов в лентах, фрагмент главной
+    и метаданные миниатюр. Запросы идут через WSGIHandler — тот же
+    путь, что у настоящих запросов, с middleware.
+    """
+    from posts.models import Group
+
+    handler = handler or WSGIHandler()
+    paths = list(settings.WARMUP_PAGES)
+    groups = Group.objects.annotate(posts_count=Count('posts')).order_by(
+        '-posts_count').values_list('slug', flat=True)
+    paths += [reverse('posts:group_posts', args=[slug])
+              for slug in groups[:settings.WARMUP_GROUPS]]
+    host = next((host.lstrip('.') for host in settings.ALLOWED_HOSTS
+                 if host != '*'), 'localhost')
+    return {path: request_page(handler, path, host) for path in paths}
+
+
+def warm_up(handler=None):
+    """Готовит воркер к первому запросу; возвращает длительность шагов, мс.
+
+    handler — WSGI-приложение воркера; без него страницы запрашиваются
+    через новый WSGIHandler.
+
+    Импорты, шаблоны и URL прогреваются в каждом процессе: с preload
+    в gunicorn их можно сделать один раз в мастере до fork. Подробный
+    профиль импорта — python -X importtime.
+    """
+    timings = {}
+    imports = list(settings.WARMUP_IMPORTS)
+    if not settings.WARMUP_LAZY_IMPORTS:
+        imports += settings.WARMUP_IMAGE_IMPORTS
+    steps = (
+        ('imports', lambda: import_modules(imports)),
+        ('templates', compile_templates),
+        ('urls', populate_resolver),
+        ('pages', lambda: warm_pages(handler)),
+    )
+    for name, step in steps:
+        started = time.perf_counter()
+        try:
+            result = step()
+        except Exception:
+            # недоступная база не должна мешать воркеру стартовать
+            logger.exception('Прогрев %s не удался', name)
+            result = None
+        timings[name] = (time.perf_counter() - started) * 1000
+        if name == 'imports' and result:
+            for module, duration in sorted(
+                    result.items(), key=lambda item: -item[1]):
+                logger.info('Импорт %s: %.1f мс', module, duration)
+        logger.info('Прогрев %s: %.1f мс', name, timings[name])
+    return timings
@@ -14,3 +14,12 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+from django.conf import settings  # noqa: E402
+
+from posts.follow_graph import preload_follow_graph  # noqa: E402
+from yatube.warmup import warm_up  # noqa: E402
+
+preload_follow_graph()
+if settings.WARMUP_ENABLED:
+    warm_up(application)